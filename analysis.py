@@ -0,0 +1,204 @@
+"""Engine annotations for stored games.
+
+Each move is compared with every move its player could have made instead.
+A move is valued by the points it scores minus the most the opponent can
+score straight back, so a move that hands the opponent an SOS shows up
+even when it scored nothing itself. An annotation holds:
+
+    best_row, best_col, best_letter  the highest valued alternative
+    value, best_value                values of the played and best moves
+    swing                            value - best_value, 0 for a best move
+    handed_sos                       whether the opponent could score at once
+
+GameAnalyzer works out the annotations on a worker pool, a few moves per
+task, and saves them with the game so each game is analysed only once.
+"""
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+import threading
+
+from sos_game_logic import sos_patterns
+from storage import GameStorage
+
+ANALYSIS_CHUNK_MOVES = 8
+ANALYSIS_CACHE_GAMES = 32
+
+Move = Tuple[int, int, str, int]  # (row, col, letter, move_number)
+
+def _gain(cells: List[List[str]], patterns: Tuple, row: int, col: int, letter: str) -> int:
+    """Count the SOS lines letter would complete at an empty (row, col)"""
+    s_patterns, o_patterns = patterns[row][col]
+    if letter == 'S':
+        return sum(1 for r1, c1, r2, c2 in s_patterns if cells[r1][c1] == 'O' and cells[r2][c2] == 'S')
+    return sum(1 for r1, c1, r2, c2 in o_patterns if cells[r1][c1] == 'S' and cells[r2][c2] == 'S')
+
+def _candidates(cells: List[List[str]], patterns: Tuple, game_mode: str) -> Iterator[Tuple[int, int, str, int, int]]:
+    """Yield (row, col, letter, gain, best reply) for every legal move, row-major with 'S' before 'O'"""
+    size = len(cells)
+    empty = [(row, col) for row in range(size) for col in range(size) if cells[row][col] == '']
+    gains = {(row, col, letter): _gain(cells, patterns, row, col, letter)
+             for row, col in empty for letter in 'SO'}
+    # Replies are looked up best first; a letter only changes what cells within two steps can score
+    ranked = sorted(gains.items(), key=lambda item: item[1], reverse=True)
+    for row, col in empty:
+        for letter in 'SO':
+            gain = gains[(row, col, letter)]
+            if (game_mode == "Simple" and gain) or len(empty) == 1:
+                yield row, col, letter, gain, 0  # The game ends, so there is no reply
+                continue
+            cells[row][col] = letter
+            reply = 0
+            for (r, c, _), value in ranked:
+                if max(abs(r - row), abs(c - col)) > 2:
+                    reply = value
+                    break
+            for r in range(max(0, row - 2), min(size, row + 3)):
+                for c in range(max(0, col - 2), min(size, col + 3)):
+                    if cells[r][c] == '':
+                        reply = max(reply, _gain(cells, patterns, r, c, 'S'), _gain(cells, patterns, r, c, 'O'))
+            cells[row][col] = ''
+            yield row, col, letter, gain, reply
+
+def analyse_moves(board_size: int, game_mode: str, moves: List[Move],
+                  start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+    """Annotate moves[start:stop] of a game; the earlier moves only set up the board"""
+    patterns = sos_patterns(board_size)
+    cells = [['' for _ in range(board_size)] for _ in range(board_size)]
+    for row, col, letter, _ in moves[:start]:
+        cells[row][col] = letter
+
+    annotations = []
+    for row, col, letter, move_number in moves[start:stop]:
+        best = played = None
+        for candidate in _candidates(cells, patterns, game_mode):
+            value = candidate[3] - candidate[4]
+            if best is None or value > best[0]:
+                best = (value, candidate)
+            if candidate[:3] == (row, col, letter):
+                played = (value, candidate)
+        if played is None:
+            raise ValueError(f"Move {move_number} ({letter} at ({row}, {col})) is not legal")
+        best_value, (best_row, best_col, best_letter, _, _) = best
+        value, (_, _, _, _, reply) = played
+        annotations.append({'move_number': move_number, 'best_row': best_row, 'best_col': best_col,
+                            'best_letter': best_letter, 'value': value, 'best_value': best_value,
+                            'swing': value - best_value, 'handed_sos': reply > 0})
+        cells[row][col] = letter
+    return annotations
+
+class _Analysis:
+    """Progress of one requested game"""
+    def __init__(self):
+        self.annotations: Dict[int, Dict] = {}
+        self.pending = 0  # Chunks still running
+        self.done = threading.Event()
+
+class GameAnalyzer:
+    """Annotates games in the background and keeps the results in storage.
+
+    request returns at once: saved annotations are loaded, and missing ones
+    are worked out a chunk of moves at a time on the executor (a process
+    pool by default, so the analysis does not compete with the UI thread).
+    annotations returns whatever has been finished so far.
+    """
+    def __init__(self, db: GameStorage, executor: Optional[Executor] = None,
+                 chunk_moves: int = ANALYSIS_CHUNK_MOVES, max_games: int = ANALYSIS_CACHE_GAMES):
+        self.db = db
+        self.chunk_moves = max(1, chunk_moves)
+        self.max_games = max(1, max_games)
+        self._executor = executor
+        self._owns_executor = executor is None
+        # Storage reads happen here, off the caller's thread
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sos-analysis-loader")
+        self._games: 'OrderedDict[int, _Analysis]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor()
+        return self._executor
+
+    def request(self, game: Dict, moves: List[Dict]):
+        """Start annotating a game (with game_id, board_size and game_mode) unless already done or underway"""
+        game_id = game['game_id']
+        with self._lock:
+            if game_id in self._games:
+                self._games.move_to_end(game_id)
+                return
+            analysis = self._games[game_id] = _Analysis()
+            # Forget the least recently requested finished games beyond max_games
+            for old_id in list(self._games):
+                if len(self._games) <= self.max_games:
+                    break
+                if self._games[old_id].done.is_set():
+                    del self._games[old_id]
+        plain_moves = [(move['row'], move['col'], move['letter'], move['move_number']) for move in moves]
+        future = self._loader.submit(self._start, game_id, analysis, game['board_size'],
+                                     game['game_mode'], plain_moves)
+        future.add_done_callback(partial(self._failed, game_id, analysis))
+
+    def _start(self, game_id: int, analysis: _Analysis, board_size: int, game_mode: str, moves: List[Move]):
+        saved = self.db.get_move_annotations(game_id)
+        if saved is not None and len(saved) == len(moves):
+            with self._lock:
+                analysis.annotations.update((annotation['move_number'], annotation) for annotation in saved)
+            analysis.done.set()
+            return
+        starts = range(0, len(moves), self.chunk_moves)
+        if not starts:
+            analysis.done.set()
+            return
+        analysis.pending = len(starts)
+        for start in starts:
+            future = self.executor.submit(analyse_moves, board_size, game_mode, moves,
+                                          start, start + self.chunk_moves)
+            future.add_done_callback(partial(self._chunk_done, game_id, analysis))
+
+    def _chunk_done(self, game_id: int, analysis: _Analysis, future: Future):
+        if future.cancelled() or self._failed(game_id, analysis, future):
+            return
+        with self._lock:
+            for annotation in future.result():
+                analysis.annotations[annotation['move_number']] = annotation
+            analysis.pending -= 1
+            if analysis.pending or self._games.get(game_id) is not analysis:
+                return  # More chunks to come, or the game was discarded meanwhile
+            annotations = [analysis.annotations[number] for number in sorted(analysis.annotations)]
+        self.db.save_move_annotations(game_id, annotations)
+        analysis.done.set()
+
+    def _failed(self, game_id: int, analysis: _Analysis, future: Future) -> bool:
+        if future.cancelled() or future.exception() is None:
+            return False
+        logging.error(f"Failed to analyse game {game_id}: {future.exception()}")
+        analysis.done.set()  # Nothing more is coming; requesting again after discard retries
+        return True
+
+    def annotations(self, game_id: int) -> Dict[int, Dict]:
+        """Get the annotations finished so far, by move number"""
+        with self._lock:
+            analysis = self._games.get(game_id)
+            return dict(analysis.annotations) if analysis is not None else {}
+
+    def wait(self, game_id: int, timeout: Optional[float] = None) -> bool:
+        """Block until a requested game is fully annotated; False on timeout"""
+        with self._lock:
+            analysis = self._games.get(game_id)
+        return analysis is not None and analysis.done.wait(timeout)
+
+    def discard(self, game_id: int):
+        """Forget a game, e.g. because more moves were played since it was analysed"""
+        with self._lock:
+            analysis = self._games.pop(game_id, None)
+        if analysis is not None:
+            analysis.done.set()
+
+    def close(self):
+        """Stop the workers, dropping analysis that has not started"""
+        self._loader.shutdown(wait=False, cancel_futures=True)
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
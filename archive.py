@@ -0,0 +1,88 @@
+"""Streaming export and import of game archives.
+
+An archive is gzip-compressed JSON lines: a header line, then one line per
+game holding its result, moves and SOS lines. Export and import both work a
+game at a time, so memory use does not grow with the number of games.
+
+    python db_admin.py export games.jsonl.gz
+    python db_admin.py --db merged.db import worker1.jsonl.gz worker2.jsonl.gz
+"""
+from typing import Dict, Iterator, List, Tuple
+import gzip
+import json
+
+from database import GAME_COLUMNS, GameDatabase
+
+ARCHIVE_FORMAT = "sos-game-archive"
+ARCHIVE_VERSION = 1
+
+GameRecord = Tuple[Dict, List[Dict], List[Dict]]
+
+def _encode_game(game: Dict, moves: List[Dict], sos_lines: List[Dict]) -> str:
+    # Moves and lines are stored as positional lists, which keeps lines short
+    return json.dumps({
+        'game': {column: game[column] for column in GAME_COLUMNS + ('finished',) if column != 'game_id'},
+        'source_id': game['game_id'],
+        'moves': [[move['player'], move['row'], move['col'], move['letter'], move['move_number']]
+                  for move in moves],
+        'sos_lines': [[line['move_number'], *line['start_pos'], *line['end_pos'], line['player']]
+                      for line in sos_lines],
+    }, separators=(',', ':'))
+
+def _decode_game(line: str) -> GameRecord:
+    data = json.loads(line)
+    game = dict(data['game'], game_id=data.get('source_id'))
+    moves = [{'player': player, 'row': row, 'col': col, 'letter': letter, 'move_number': move_number}
+             for player, row, col, letter, move_number in data['moves']]
+    sos_lines = [{'move_number': move_number, 'start_pos': [start_row, start_col],
+                  'end_pos': [end_row, end_col], 'player': player}
+                 for move_number, start_row, start_col, end_row, end_col, player in data['sos_lines']]
+    return game, moves, sos_lines
+
+class ArchiveWriter:
+    """Writes games to an archive one at a time"""
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+        self._file.write(json.dumps({'format': ARCHIVE_FORMAT, 'version': ARCHIVE_VERSION}) + '\n')
+
+    def write(self, game: Dict, moves: List[Dict], sos_lines: List[Dict]):
+        self._file.write(_encode_game(game, moves, sos_lines) + '\n')
+        self.count += 1
+
+    def flush(self):
+        """Push everything written so far to the file"""
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def export_archive(db: GameDatabase, path: str, chunk_size: int = 500) -> int:
+    """Write every game in the database to an archive and return how many were written"""
+    with ArchiveWriter(path) as archive:
+        for game, moves, sos_lines in db.iter_game_records(chunk_size):
+            archive.write(game, moves, sos_lines)
+    return archive.count
+
+def read_archive(path: str) -> Iterator[GameRecord]:
+    """Stream (game, moves, sos_lines) from an archive; game_id is the ID in the source database"""
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        header = json.loads(archive.readline() or '{}')
+        if header.get('format') != ARCHIVE_FORMAT:
+            raise ValueError(f"{path} is not a game archive")
+        if header.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version: {header.get('version')}")
+        for line in archive:
+            if line.strip():
+                yield _decode_game(line)
+
+def import_archive(db: GameDatabase, path: str, batch_size: int = 1000) -> int:
+    """Add every game in an archive to the database under new IDs and return how many were added"""
+    return db.import_game_records(read_archive(path), batch_size)
@@ -1,152 +1,456 @@
-from typing import List, Dict, Optional, Tuple
+from typing import Any, Iterable, List, Dict, Iterator, Optional, Sequence, Set, Tuple
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+import atexit
+import logging
+import queue
 import sqlite3
+import threading
+import weakref
+
+from game_record import RECORD_VERSION, decode_moves, encode_move, encode_moves, replay_sos_lines
+from migrations import STATS_GROUP_COLUMNS, apply_migrations, current_version, rebuild_game_stats
+from storage import GAME_COLUMNS, GameRow, GameStorage, LogStorage, MemoryStorage, NullStorage, format_game_rows
 from datetime import datetime
 
-class GameDatabase:
-    def __init__(self, db_path: str = "sos_game.db"):
+# Statements are constant strings, so sqlite3 re-uses their prepared form from this cache
+STATEMENT_CACHE_SIZE = 256
+
+# Columns read for iter_game_records and get_game_records
+_RECORD_COLUMNS = ', '.join(GAME_COLUMNS + ('finished', 'moves_blob'))
+# Game IDs bound per IN (...) lookup, well under SQLite's variable limit
+_ID_CHUNK_SIZE = 500
+
+def _stats_upsert(table: str, source: str) -> str:
+    """Build a statement adding the totals from source (VALUES or SELECT) to a stats table"""
+    return f'''
+        INSERT INTO {table} (board_size, game_mode, blue_player_type, red_player_type,
+                             games, blue_wins, red_wins, draws, blue_score, red_score)
+        {source}
+        ON CONFLICT (board_size, game_mode, blue_player_type, red_player_type) DO UPDATE SET
+            games = games + excluded.games,
+            blue_wins = blue_wins + excluded.blue_wins,
+            red_wins = red_wins + excluded.red_wins,
+            draws = draws + excluded.draws,
+            blue_score = blue_score + excluded.blue_score,
+            red_score = red_score + excluded.red_score
+    '''
+
+# Columns query_games can filter on by equality
+_GAME_FILTERS = ('board_size', 'game_mode', 'winner', 'blue_player_type', 'red_player_type')
+
+class GameDatabase(GameStorage):
+    """SQLite storage for games, moves and SOS lines.
+
+    Each thread keeps one long-lived connection in WAL mode, so a write is a
+    single commit rather than a connect, commit and close. In-memory databases
+    share one connection guarded by a lock, since every connection to
+    ":memory:" would otherwise be a separate database.
+
+    With compact=True new games keep their whole move list in one
+    games.moves_blob value (see game_record) and SOS lines are recomputed
+    on read instead of stored. Reads handle both formats. A compact game's
+    record is built up in memory and written when the game ends, on flush
+    and close, and before reads through this handle, so saving a move is
+    an append rather than a rewrite of the whole record. Other connections
+    only see the moves of a game in progress once one of those happens.
+    """
+    def __init__(self, db_path: str = "sos_game.db", compact: bool = False):
         self.db_path = db_path
+        self.compact = compact
+        # Encoded records and board sizes of compact games still being played,
+        # and which of those records have moves not yet written
+        self._compact_records: Dict[int, bytearray] = {}
+        self._compact_sizes: Dict[int, int] = {}
+        self._unwritten_records: Set[int] = set()
+        self._compact_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._in_memory = db_path == ":memory:" or db_path.startswith("file::memory:")
+        self._shared_lock = threading.RLock() if self._in_memory else None
+        self._shared_conn: Optional[sqlite3.Connection] = None
+        self._closed = False
         self.init_database()
 
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE,
+                               check_same_thread=False, isolation_level=None,
+                               uri=self.db_path.startswith("file:"))
+        if not self._in_memory:
+            # Only takes effect on a new file, or at the next full VACUUM of an old one
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only syncs at checkpoints; a crash can lose the last
+        # commits but never corrupts the database
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        if self._in_memory:
+            if self._shared_conn is None:
+                self._shared_conn = self._open_connection()
+            return self._shared_conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Cursor]:
+        """Run the enclosed statements in one transaction.
+
+        Transactions nest: only the outermost one commits, so callers can group
+        many saves into a single commit. An immediate transaction takes the
+        write lock when it starts rather than at its first write. A rollback
+        also undoes the changes made to buffered compact records.
+        """
+        with self._shared_lock or nullcontext():
+            conn = self._connection()
+            depth = getattr(self._local, 'depth', 0)
+            if depth == 0:
+                conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+                self._local.compact_undo = {}
+            self._local.depth = depth + 1
+            try:
+                yield conn.cursor()
+            except BaseException:
+                self._local.depth = depth
+                if depth == 0:
+                    conn.rollback()
+                    self._restore_compact(self._local.compact_undo)
+                    self._local.compact_undo = None
+                raise
+            self._local.depth = depth
+            if depth == 0:
+                try:
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    self._restore_compact(self._local.compact_undo)
+                    raise
+                finally:
+                    self._local.compact_undo = None
+
+    @contextmanager
+    def _reading(self) -> Iterator[sqlite3.Cursor]:
+        if self._unwritten_records:
+            self._write_compact_records()  # Reads see every saved move
+        with self._shared_lock or nullcontext():
+            yield self._connection().cursor()
+
+    def close(self):
+        """Write buffered moves and close every connection this database opened"""
+        if not self._closed and self._unwritten_records:
+            self._write_compact_records()
+        self._closed = True
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._shared_conn = None
+
+    def flush(self):
+        """Write the buffered moves of compact games in progress; every other write is committed already"""
+        self._write_compact_records()
+
+    def __enter__(self) -> 'GameDatabase':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
     def init_database(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Create games table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS games (
-                game_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                board_size INTEGER NOT NULL,
-                game_mode TEXT NOT NULL,
-                blue_player_type TEXT NOT NULL,
-                red_player_type TEXT NOT NULL,
-                winner TEXT,
-                blue_score INTEGER DEFAULT 0,
-                red_score INTEGER DEFAULT 0,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Create moves table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS moves (
-                move_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                game_id INTEGER NOT NULL,
-                player TEXT NOT NULL,
-                row INTEGER NOT NULL,
-                col INTEGER NOT NULL,
-                letter TEXT NOT NULL,
-                move_number INTEGER NOT NULL,
-                FOREIGN KEY (game_id) REFERENCES games (game_id)
-            )
-        ''')
-
-        # Create SOS lines table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sos_lines (
-                line_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                game_id INTEGER NOT NULL,
-                move_number INTEGER NOT NULL,
-                start_row INTEGER NOT NULL,
-                start_col INTEGER NOT NULL,
-                end_row INTEGER NOT NULL,
-                end_col INTEGER NOT NULL,
-                player TEXT NOT NULL,
-                FOREIGN KEY (game_id) REFERENCES games (game_id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        """Initialize the database, applying any pending schema migrations"""
+        # IMMEDIATE takes the write lock up front, so concurrent openers migrate one at a time
+        with self.transaction(immediate=True) as cursor:
+            apply_migrations(cursor)
+
+    def get_schema_version(self) -> int:
+        """Get the version of the newest applied migration"""
+        with self._reading() as cursor:
+            return current_version(cursor)
 
     def start_new_game(self, board_size: int, game_mode: str, 
                       blue_player_type: str, red_player_type: str) -> int:
         """Start a new game and return its ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO games (board_size, game_mode, blue_player_type, red_player_type)
-            VALUES (?, ?, ?, ?)
-        ''', (board_size, game_mode, blue_player_type, red_player_type))
+        return self.start_new_games(1, board_size, game_mode, blue_player_type, red_player_type)[0]
 
-        game_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return game_id
+    def start_new_games(self, count: int, board_size: int, game_mode: str,
+                        blue_player_type: str, red_player_type: str) -> List[int]:
+        """Start several games in a single transaction and return their IDs"""
+        # Compact games start with an empty record, which also marks their format
+        moves_blob = bytes([RECORD_VERSION]) if self.compact else None
+        game_ids = []
+        with self.transaction() as cursor:
+            for _ in range(count):
+                cursor.execute('''
+                    INSERT INTO games (board_size, game_mode, blue_player_type, red_player_type, moves_blob)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (board_size, game_mode, blue_player_type, red_player_type, moves_blob))
+                game_ids.append(cursor.lastrowid)
+            if self.compact:
+                with self._compact_lock:
+                    for game_id in game_ids:
+                        self._remember_compact(game_id)
+                        self._compact_records[game_id] = bytearray(moves_blob)
+                        self._compact_sizes[game_id] = board_size
+        return game_ids
 
     def save_move(self, game_id: int, player: str, row: int, col: int, 
                   letter: str, move_number: int):
         """Save a move to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        if self.compact:
+            self._append_compact_move(game_id, player, row, col, letter)
+            return
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO moves (game_id, player, row, col, letter, move_number)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (game_id, player, row, col, letter, move_number))
+
+    def end_game(self, game_id: int, winner: str, blue_score: int, red_score: int):
+        """Update game record with final results and the game_stats summary"""
+        with self.transaction() as cursor:
+            # Dropped inside the transaction, so a failed commit puts the record back
+            with self._compact_lock:
+                self._remember_compact(game_id)
+                record = self._compact_records.pop(game_id, None)
+                self._compact_sizes.pop(game_id, None)
+                unwritten = game_id in self._unwritten_records
+                self._unwritten_records.discard(game_id)
+            if unwritten:
+                cursor.execute('UPDATE games SET moves_blob = ? WHERE game_id = ?', (bytes(record), game_id))
+            cursor.execute('''
+                SELECT board_size, game_mode, blue_player_type, red_player_type,
+                       finished, winner, blue_score, red_score
+                FROM games
+                WHERE game_id = ?
+            ''', (game_id,))
+            game = cursor.fetchone()
+            cursor.execute('''
+                UPDATE games 
+                SET winner = ?, blue_score = ?, red_score = ?, finished = 1
+                WHERE game_id = ?
+            ''', (winner, blue_score, red_score, game_id))
+            if game is None:
+                return
+            group = game[:4]
+            if game[4]:
+                # Ending a game again replaces its earlier result instead of counting it twice
+                self._count_result(cursor, group, -1, *game[5:])
+            self._count_result(cursor, group, 1, winner, blue_score, red_score)
 
-        cursor.execute('''
-            INSERT INTO moves (game_id, player, row, col, letter, move_number)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (game_id, player, row, col, letter, move_number))
+    def _count_result(self, cursor: sqlite3.Cursor, group: Tuple, sign: int,
+                      winner: Optional[str], blue_score: int, red_score: int):
+        draw = winner not in ('Blue', 'Red')
+        cursor.execute(_stats_upsert('game_stats', '''
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''), (
+            *group,
+            sign,
+            sign * (winner == 'Blue'),
+            sign * (winner == 'Red'),
+            sign * draw,
+            sign * (blue_score or 0),
+            sign * (red_score or 0),
+        ))
 
-        conn.commit()
-        conn.close()
+    def get_stats(self, group_by: Sequence[str] = (), board_size: Optional[int] = None,
+                  game_mode: Optional[str] = None, blue_player_type: Optional[str] = None,
+                  red_player_type: Optional[str] = None) -> List[Dict]:
+        """Get win counts and score totals of finished games from the game_stats summary.
 
-    def end_game(self, game_id: int, winner: str, blue_score: int, red_score: int):
-        """Update game record with final results"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        Totals are grouped by any of board_size, game_mode, blue_player_type and
+        red_player_type, after filtering on the given values. Blue always moves
+        first, so blue_wins are also the first mover's wins.
+        """
+        for column in group_by:
+            if column not in STATS_GROUP_COLUMNS:
+                raise ValueError(f"Cannot group statistics by {column}")
+        conditions = []
+        params = []
+        filters = {'board_size': board_size, 'game_mode': game_mode,
+                   'blue_player_type': blue_player_type, 'red_player_type': red_player_type}
+        for column in STATS_GROUP_COLUMNS:
+            if filters[column] is not None:
+                conditions.append(f'{column} = ?')
+                params.append(filters[column])
+
+        totals = ('games', 'blue_wins', 'red_wins', 'draws', 'blue_score', 'red_score')
+        query = 'SELECT ' + ', '.join(list(group_by) + [f'COALESCE(SUM({total}), 0)' for total in totals])
+        query += ' FROM game_stats'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        if group_by:
+            query += ' GROUP BY ' + ', '.join(group_by) + ' ORDER BY ' + ', '.join(group_by)
+
+        with self._reading() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        return [dict(zip(tuple(group_by) + totals, row)) for row in rows]
+
+    def rebuild_stats(self):
+        """Recount the game_stats summary from the games table and the retired games' totals"""
+        with self.transaction(immediate=True) as cursor:
+            rebuild_game_stats(cursor)
+            # WHERE true keeps the parser from reading ON CONFLICT as a join constraint
+            cursor.execute(_stats_upsert('game_stats', 'SELECT * FROM retired_stats WHERE true'))
+
+    def expired_game_ids(self, keep_games: Optional[int] = None, keep_days: Optional[float] = None,
+                         limit: int = 500) -> List[int]:
+        """Get up to limit finished games, oldest first, that fall outside the retention limits.
 
-        cursor.execute('''
-            UPDATE games 
-            SET winner = ?, blue_score = ?, red_score = ?
-            WHERE game_id = ?
-        ''', (winner, blue_score, red_score, game_id))
+        A game is kept while it is among the newest keep_games games or less
+        than keep_days old; with neither limit set nothing expires. Unfinished
+        games never expire.
+        """
+        if keep_games is None and keep_days is None:
+            return []
+        conditions = ['finished = 1']
+        params: List[Any] = []
+        with self._reading() as cursor:
+            if keep_games is not None:
+                cursor.execute('''
+                    SELECT timestamp, game_id FROM games
+                    ORDER BY timestamp DESC, game_id DESC
+                    LIMIT 1 OFFSET ?
+                ''', (keep_games,))
+                oldest_kept = cursor.fetchone()
+                if oldest_kept is None:
+                    return []
+                # Every game from the first one past the limit backwards
+                conditions.append('(timestamp, game_id) <= (?, ?)')
+                params.extend(oldest_kept)
+            if keep_days is not None:
+                conditions.append("timestamp < datetime('now', ?)")
+                params.append(f'-{keep_days} days')
+            cursor.execute(f'''
+                SELECT game_id FROM games
+                WHERE {' AND '.join(conditions)}
+                ORDER BY timestamp, game_id
+                LIMIT ?
+            ''', (*params, limit))
+            return [row[0] for row in cursor.fetchall()]
 
-        conn.commit()
-        conn.close()
+    def retire_games(self, game_ids: Sequence[int]) -> int:
+        """Delete games with their moves and lines, keeping their totals for the statistics summary.
+
+        game_stats already counts the games; their totals also go to
+        retired_stats so rebuild_stats still includes them. Returns the number
+        of games deleted.
+        """
+        if not game_ids:
+            return 0
+        placeholders = ", ".join("?" * len(game_ids))
+        with self.transaction(immediate=True) as cursor:
+            cursor.execute(_stats_upsert('retired_stats', f'''
+                SELECT board_size, game_mode, blue_player_type, red_player_type,
+                       COUNT(*),
+                       SUM(CASE WHEN winner = 'Blue' THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN winner = 'Red' THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN winner IN ('Blue', 'Red') THEN 0 ELSE 1 END),
+                       TOTAL(blue_score),
+                       TOTAL(red_score)
+                FROM games
+                WHERE finished = 1 AND game_id IN ({placeholders})
+                GROUP BY board_size, game_mode, blue_player_type, red_player_type
+            '''), tuple(game_ids))
+            cursor.execute(f'DELETE FROM move_annotations WHERE game_id IN ({placeholders})', tuple(game_ids))
+            cursor.execute(f'DELETE FROM sos_lines WHERE game_id IN ({placeholders})', tuple(game_ids))
+            cursor.execute(f'DELETE FROM moves WHERE game_id IN ({placeholders})', tuple(game_ids))
+            cursor.execute(f'DELETE FROM games WHERE game_id IN ({placeholders})', tuple(game_ids))
+            return cursor.rowcount
+
+    def incremental_vacuum(self, pages: Optional[int] = None) -> bool:
+        """Return up to pages free pages (all if None) to the OS, without a full VACUUM.
+
+        Returns False if the database was created before incremental
+        auto-vacuum was enabled; one full VACUUM converts it.
+        """
+        conn = self._connection()
+        with self._shared_lock or nullcontext():
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                return False
+            # The pragma frees pages as its result rows are stepped through
+            pragma = 'PRAGMA incremental_vacuum' if pages is None else f'PRAGMA incremental_vacuum({int(pages)})'
+            conn.execute(pragma).fetchall()
+        return True
 
     def get_recent_games(self, limit: int = 10) -> List[Dict]:
         """Get the most recent games"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT game_id, board_size, game_mode, blue_player_type, 
-                   red_player_type, winner, blue_score, red_score, timestamp
-            FROM games
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (limit,))
-
-        games = []
-        for row in cursor.fetchall():
-            games.append({
-                'game_id': row[0],
-                'board_size': row[1],
-                'game_mode': row[2],
-                'blue_player_type': row[3],
-                'red_player_type': row[4],
-                'winner': row[5],
-                'blue_score': row[6],
-                'red_score': row[7],
-                'timestamp': row[8]
-            })
+        return self.query_games(limit=limit)
+
+    def query_games(self, limit: int = 50, after: Optional[Tuple[str, int]] = None,
+                    board_size: Optional[int] = None, game_mode: Optional[str] = None,
+                    winner: Optional[str] = None, blue_player_type: Optional[str] = None,
+                    red_player_type: Optional[str] = None, since: Optional[str] = None,
+                    until: Optional[str] = None, row_format: str = "dict") -> List[Any]:
+        """Get one page of games, newest first, matching every given filter.
+
+        Pages are keyed rather than offset: pass the (timestamp, game_id) of the
+        last game of the previous page as after, so a deep page costs the same
+        as the first. since and until bound the timestamp ('YYYY-MM-DD HH:MM:SS',
+        since inclusive, until exclusive). row_format is "dict", "namedtuple"
+        (GameRow) or "tuple".
+        """
+        format_game_rows([], row_format)  # Reject an unknown format before querying
+
+        conditions = []
+        params: List[Any] = []
+        filters = {'board_size': board_size, 'game_mode': game_mode, 'winner': winner,
+                   'blue_player_type': blue_player_type, 'red_player_type': red_player_type}
+        for column in _GAME_FILTERS:
+            if filters[column] is not None:
+                conditions.append(f'{column} = ?')
+                params.append(filters[column])
+        if since is not None:
+            conditions.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('timestamp < ?')
+            params.append(until)
+        if after is not None:
+            conditions.append('(timestamp, game_id) < (?, ?)')
+            params.extend(after)
 
-        conn.close()
-        return games
+        query = f'SELECT {", ".join(GAME_COLUMNS)} FROM games'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY timestamp DESC, game_id DESC LIMIT ?'
+        params.append(limit)
+
+        with self._reading() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+        return format_game_rows(rows, row_format)
 
     def get_game_moves(self, game_id: int) -> List[Dict]:
         """Get all moves for a specific game"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        compact = self._load_compact_game(game_id)
+        if compact is not None:
+            board_size, record = compact
+            return decode_moves(record, board_size)
 
-        cursor.execute('''
-            SELECT player, row, col, letter, move_number
-            FROM moves
-            WHERE game_id = ?
-            ORDER BY move_number
-        ''', (game_id,))
+        with self._reading() as cursor:
+            cursor.execute('''
+                SELECT player, row, col, letter, move_number
+                FROM moves
+                WHERE game_id = ?
+                ORDER BY move_number
+            ''', (game_id,))
+            rows = cursor.fetchall()
 
         moves = []
-        for row in cursor.fetchall():
+        for row in rows:
             moves.append({
                 'player': row[0],
                 'row': row[1],
@@ -154,46 +458,626 @@ class GameDatabase:
                 'letter': row[3],
                 'move_number': row[4]
             })
-
-        conn.close()
         return moves
 
     def save_sos_line(self, game_id: int, move_number: int, start_pos: List[int], 
                       end_pos: List[int], player: str):
         """Save an SOS line to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO sos_lines (
-                game_id, move_number, start_row, start_col, end_row, end_col, player
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (game_id, move_number, start_pos[0], start_pos[1], 
-              end_pos[0], end_pos[1], player))
-
-        conn.commit()
-        conn.close()
+        if self.compact:
+            return  # Compact games recompute their lines from the moves
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO sos_lines (
+                    game_id, move_number, start_row, start_col, end_row, end_col, player
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (game_id, move_number, start_pos[0], start_pos[1], 
+                  end_pos[0], end_pos[1], player))
 
     def get_game_sos_lines(self, game_id: int) -> List[Dict]:
         """Get all SOS lines for a specific game"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        compact = self._load_compact_game(game_id)
+        if compact is not None:
+            board_size, record = compact
+            return replay_sos_lines(decode_moves(record, board_size), board_size)
 
-        cursor.execute('''
-            SELECT move_number, start_row, start_col, end_row, end_col, player
-            FROM sos_lines
-            WHERE game_id = ?
-            ORDER BY move_number
-        ''', (game_id,))
+        with self._reading() as cursor:
+            cursor.execute('''
+                SELECT move_number, start_row, start_col, end_row, end_col, player
+                FROM sos_lines
+                WHERE game_id = ?
+                ORDER BY move_number
+            ''', (game_id,))
+            rows = cursor.fetchall()
 
         sos_lines = []
-        for row in cursor.fetchall():
+        for row in rows:
             sos_lines.append({
                 'move_number': row[0],
                 'start_pos': [row[1], row[2]],
                 'end_pos': [row[3], row[4]],
                 'player': row[5]
             })
+        return sos_lines
+
+    def get_game_replay(self, game_id: int) -> Tuple[List[Dict], List[Dict]]:
+        """Get (moves, sos_lines) for a game in one query, whichever format it is stored in"""
+        with self._reading() as cursor:
+            # Kind 0 is the games row, 1 the moves and 2 the SOS lines
+            cursor.execute('''
+                SELECT 0, board_size, NULL, NULL, NULL, NULL, NULL, moves_blob FROM games WHERE game_id = ?
+                UNION ALL
+                SELECT 1, move_number, player, row, col, letter, NULL, NULL FROM moves WHERE game_id = ?
+                UNION ALL
+                SELECT 2, move_number, player, start_row, start_col, end_row, end_col, NULL
+                FROM sos_lines WHERE game_id = ?
+                ORDER BY 1, 2
+            ''', (game_id, game_id, game_id))
+            rows = cursor.fetchall()
+
+        if rows and rows[0][0] == 0 and rows[0][7] is not None:
+            board_size, record = rows[0][1], rows[0][7]
+            moves = decode_moves(record, board_size)
+            return moves, replay_sos_lines(moves, board_size)
+
+        moves = []
+        sos_lines = []
+        for kind, move_number, player, a, b, c, d, _ in rows:
+            if kind == 1:
+                moves.append({'player': player, 'row': a, 'col': b, 'letter': c, 'move_number': move_number})
+            elif kind == 2:
+                sos_lines.append({'move_number': move_number, 'start_pos': [a, b],
+                                  'end_pos': [c, d], 'player': player})
+        return moves, sos_lines
+
+    def save_move_annotations(self, game_id: int, annotations: List[Dict]):
+        """Save the engine annotations of a game, replacing any saved before"""
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM move_annotations WHERE game_id = ?', (game_id,))
+            cursor.executemany('''
+                INSERT INTO move_annotations (
+                    game_id, move_number, best_row, best_col, best_letter, value, best_value, handed_sos
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(game_id, a['move_number'], a['best_row'], a['best_col'], a['best_letter'],
+                   a['value'], a['best_value'], int(a['handed_sos'])) for a in annotations])
+
+    def get_move_annotations(self, game_id: int) -> Optional[List[Dict]]:
+        """Get the saved engine annotations of a game in move order, or None if it was never analysed"""
+        with self._reading() as cursor:
+            cursor.execute('''
+                SELECT move_number, best_row, best_col, best_letter, value, best_value, handed_sos
+                FROM move_annotations
+                WHERE game_id = ?
+                ORDER BY move_number
+            ''', (game_id,))
+            rows = cursor.fetchall()
+        if not rows:
+            return None
+        return [{'move_number': move_number, 'best_row': best_row, 'best_col': best_col,
+                 'best_letter': best_letter, 'value': value, 'best_value': best_value,
+                 'swing': value - best_value, 'handed_sos': bool(handed_sos)}
+                for move_number, best_row, best_col, best_letter, value, best_value, handed_sos in rows]
+
+    def iter_games_with_moves(self, board_size: Optional[int] = None,
+                              chunk_size: int = 1000) -> Iterator[Tuple[Dict, List[Tuple[int, int, str]]]]:
+        """Stream every game with its (row, col, letter) moves in play order.
+
+        Uses a single ordered join read in chunks, so memory stays bounded no
+        matter how many moves are stored. File databases stream on a dedicated
+        connection so the caller can keep writing while it iterates.
+        """
+        self._write_compact_records()  # The stream may use another connection
+        conn = self._connection() if self._in_memory else sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            query = '''
+                SELECT g.game_id, g.board_size, g.game_mode, g.winner, m.row, m.col, m.letter
+                FROM games g
+                JOIN moves m ON m.game_id = g.game_id
+                WHERE g.moves_blob IS NULL
+            '''
+            params: Tuple = ()
+            if board_size is not None:
+                query += ' AND g.board_size = ?'
+                params = (board_size,)
+            query += ' ORDER BY g.game_id, m.move_number'
+            cursor.execute(query, params)
+
+            game = None
+            moves: List[Tuple[int, int, str]] = []
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for game_id, size, game_mode, winner, row, col, letter in rows:
+                    if game is None or game['game_id'] != game_id:
+                        if game is not None:
+                            yield game, moves
+                        game = {'game_id': game_id, 'board_size': size,
+                                'game_mode': game_mode, 'winner': winner}
+                        moves = []
+                    moves.append((row, col, letter))
+            if game is not None:
+                yield game, moves
+
+            # Compact games keep their moves on the games row
+            query = '''
+                SELECT game_id, board_size, game_mode, winner, moves_blob
+                FROM games
+                WHERE moves_blob IS NOT NULL
+            '''
+            if board_size is not None:
+                query += ' AND board_size = ?'
+            cursor.execute(query + ' ORDER BY game_id', params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for game_id, size, game_mode, winner, record in rows:
+                    game = {'game_id': game_id, 'board_size': size, 'game_mode': game_mode, 'winner': winner}
+                    yield game, [(move['row'], move['col'], move['letter']) for move in decode_moves(record, size)]
+        finally:
+            if not self._in_memory:
+                conn.close()
+
+    def iter_game_records(self, chunk_size: int = 500) -> Iterator[Tuple[Dict, List[Dict], List[Dict]]]:
+        """Stream every game as (game, moves, sos_lines) in game ID order.
+
+        game holds the games columns plus finished; moves and sos_lines are
+        shaped like get_game_moves and get_game_sos_lines rows, whichever
+        format the game is stored in. Games are read chunk_size at a time, with
+        one query each for the moves and lines of those stored row by row, so
+        memory stays bounded.
+        """
+        self._write_compact_records()  # The stream may use another connection
+        conn = self._connection() if self._in_memory else sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            last_id = 0
+            while True:
+                cursor.execute(f'''
+                    SELECT {_RECORD_COLUMNS} FROM games
+                    WHERE game_id > ?
+                    ORDER BY game_id
+                    LIMIT ?
+                ''', (last_id, chunk_size))
+                games = cursor.fetchall()
+                if not games:
+                    return
+                last_id = games[-1][0]
+                yield from self._load_game_records(cursor, games)
+        finally:
+            if not self._in_memory:
+                conn.close()
+
+    def get_game_records(self, game_ids: Sequence[int]) -> List[Tuple[Dict, List[Dict], List[Dict]]]:
+        """Get (game, moves, sos_lines) for the given games, shaped as iter_game_records yields them"""
+        if not game_ids:
+            return []
+        with self._reading() as cursor:
+            cursor.execute(f'''
+                SELECT {_RECORD_COLUMNS} FROM games
+                WHERE game_id IN ({", ".join("?" * len(game_ids))})
+                ORDER BY game_id
+            ''', tuple(game_ids))
+            return list(self._load_game_records(cursor, cursor.fetchall()))
+
+    def _load_game_records(self, cursor: sqlite3.Cursor,
+                           games: List[Tuple]) -> Iterator[Tuple[Dict, List[Dict], List[Dict]]]:
+        # Look up exactly the row-stored games, however sparse their IDs are
+        for start in range(0, len(games), _ID_CHUNK_SIZE):
+            yield from self._load_game_chunk(cursor, games[start:start + _ID_CHUNK_SIZE])
+
+    def _load_game_chunk(self, cursor: sqlite3.Cursor,
+                         games: List[Tuple]) -> Iterator[Tuple[Dict, List[Dict], List[Dict]]]:
+        game_ids = tuple(row[0] for row in games if row[len(GAME_COLUMNS) + 1] is None)
+        placeholders = ", ".join("?" * len(game_ids))
+        moves = defaultdict(list)
+        sos_lines = defaultdict(list)
+        if game_ids:
+            cursor.execute(f'''
+                SELECT game_id, player, row, col, letter, move_number FROM moves
+                WHERE game_id IN ({placeholders})
+                ORDER BY game_id, move_number
+            ''', game_ids)
+            for game_id, player, row, col, letter, move_number in cursor.fetchall():
+                moves[game_id].append({'player': player, 'row': row, 'col': col,
+                                       'letter': letter, 'move_number': move_number})
+            cursor.execute(f'''
+                SELECT game_id, move_number, start_row, start_col, end_row, end_col, player FROM sos_lines
+                WHERE game_id IN ({placeholders})
+                ORDER BY game_id, move_number
+            ''', game_ids)
+            for game_id, move_number, start_row, start_col, end_row, end_col, player in cursor.fetchall():
+                sos_lines[game_id].append({'move_number': move_number, 'start_pos': [start_row, start_col],
+                                           'end_pos': [end_row, end_col], 'player': player})
+
+        for row in games:
+            game = dict(zip(GAME_COLUMNS, row))
+            game['finished'] = bool(row[len(GAME_COLUMNS)])
+            record = row[len(GAME_COLUMNS) + 1]
+            if record is not None:
+                game_moves = decode_moves(record, game['board_size'])
+                yield game, game_moves, replay_sos_lines(game_moves, game['board_size'])
+            else:
+                yield game, moves.pop(game['game_id'], []), sos_lines.pop(game['game_id'], [])
+
+    def import_game_records(self, records: Iterable[Tuple[Dict, List[Dict], List[Dict]]],
+                            batch_size: int = 1000) -> int:
+        """Insert games shaped like iter_game_records output and return how many were imported.
+
+        Games get new IDs, so archives from many databases can be merged; their
+        moves and lines follow them. Each batch of games is one transaction with
+        bulk inserts, and finished games are added to the statistics summary.
+        """
+        imported = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                imported += self._import_batch(batch)
+                batch = []
+        if batch:
+            imported += self._import_batch(batch)
+        return imported
+
+    def _import_batch(self, batch: List[Tuple[Dict, List[Dict], List[Dict]]]) -> int:
+        move_rows = []
+        line_rows = []
+        with self.transaction(immediate=True) as cursor:
+            for game, moves, sos_lines in batch:
+                moves_blob = encode_moves(moves, game['board_size']) if self.compact else None
+                cursor.execute('''
+                    INSERT INTO games (board_size, game_mode, blue_player_type, red_player_type, winner,
+                                       blue_score, red_score, timestamp, finished, moves_blob)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?)
+                ''', (game['board_size'], game['game_mode'], game['blue_player_type'], game['red_player_type'],
+                      game.get('winner'), game.get('blue_score', 0), game.get('red_score', 0),
+                      game.get('timestamp'), int(bool(game.get('finished'))), moves_blob))
+                game_id = cursor.lastrowid
+                if game.get('finished'):
+                    self._count_result(cursor, (game['board_size'], game['game_mode'], game['blue_player_type'],
+                                                game['red_player_type']),
+                                       1, game.get('winner'), game.get('blue_score', 0), game.get('red_score', 0))
+                if self.compact:
+                    continue
+                move_rows += [(game_id, move['player'], move['row'], move['col'], move['letter'], move['move_number'])
+                              for move in moves]
+                line_rows += [(game_id, line['move_number'], *line['start_pos'], *line['end_pos'], line['player'])
+                              for line in sos_lines]
+            cursor.executemany('''
+                INSERT INTO moves (game_id, player, row, col, letter, move_number)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', move_rows)
+            cursor.executemany('''
+                INSERT INTO sos_lines (game_id, move_number, start_row, start_col, end_row, end_col, player)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', line_rows)
+        return len(batch)
+
+    def _append_compact_move(self, game_id: int, player: str, row: int, col: int, letter: str):
+        if game_id not in self._compact_records:
+            # Resuming a game this handle did not start
+            board_size, stored = self._load_compact_game(game_id) or (None, None)
+            if board_size is None:
+                raise ValueError(f"Game {game_id} does not exist")
+            with self._compact_lock:
+                if game_id not in self._compact_records:
+                    self._compact_records[game_id] = bytearray(stored or bytes([RECORD_VERSION]))
+                    self._compact_sizes[game_id] = board_size
+        with self._compact_lock:
+            self._remember_compact(game_id)
+            self._compact_records[game_id] += encode_move(row, col, letter, player, self._compact_sizes[game_id])
+            self._unwritten_records.add(game_id)
+
+    def _remember_compact(self, game_id: int):
+        """Note a compact game's buffered state before the enclosing transaction first changes it"""
+        undo = getattr(self._local, 'compact_undo', None)
+        if undo is not None and game_id not in undo:
+            record = self._compact_records.get(game_id)
+            undo[game_id] = (None if record is None else bytes(record),
+                             self._compact_sizes.get(game_id), game_id in self._unwritten_records)
+
+    def _restore_compact(self, undo: Dict[int, Tuple[Optional[bytes], Optional[int], bool]]):
+        """Put back the buffered state of compact games changed by a rolled back transaction"""
+        with self._compact_lock:
+            for game_id, (record, board_size, unwritten) in undo.items():
+                if record is None:
+                    self._compact_records.pop(game_id, None)
+                    self._compact_sizes.pop(game_id, None)
+                else:
+                    self._compact_records[game_id] = bytearray(record)
+                    self._compact_sizes[game_id] = board_size
+                if unwritten:
+                    self._unwritten_records.add(game_id)
+                else:
+                    self._unwritten_records.discard(game_id)
+
+    def _write_compact_records(self):
+        """Write the records of compact games with moves saved since they were last written"""
+        with self._compact_lock:
+            pending = [(bytes(self._compact_records[game_id]), game_id) for game_id in self._unwritten_records]
+            for _, game_id in pending:
+                self._remember_compact(game_id)  # Only when inside a caller's transaction
+            self._unwritten_records.clear()
+        if not pending:
+            return
+        try:
+            with self.transaction() as cursor:
+                # Records only grow, so a newer snapshot another thread wrote is never replaced by an older one
+                cursor.executemany('''
+                    UPDATE games
+                    SET moves_blob = ?1
+                    WHERE game_id = ?2 AND length(moves_blob) < length(?1)
+                ''', pending)
+        except BaseException:
+            with self._compact_lock:
+                self._unwritten_records.update(game_id for _, game_id in pending
+                                               if game_id in self._compact_records)
+            raise
+
+    def _load_compact_game(self, game_id: int) -> Optional[Tuple[int, bytes]]:
+        """Get (board_size, record) of a compact game, or None for a row-format game"""
+        with self._reading() as cursor:
+            cursor.execute('SELECT board_size, moves_blob FROM games WHERE game_id = ?', (game_id,))
+            row = cursor.fetchone()
+        if row is None or row[1] is None:
+            return None
+        return row[0], row[1]
+
+    def compact_games(self, batch_size: int = 500) -> int:
+        """Convert finished row-format games to compact records and return how many were converted.
+
+        Each batch of games is converted in its own transaction: the moves are
+        packed into games.moves_blob and the games' moves and sos_lines rows are
+        deleted. Games in progress are left alone, since another process may
+        still be adding move rows that reads would then ignore in favour of the
+        record. Run VACUUM afterwards to give the freed pages back to the OS.
+        """
+        converted = 0
+        while True:
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    SELECT game_id, board_size FROM games
+                    WHERE moves_blob IS NULL AND finished = 1
+                    ORDER BY game_id
+                    LIMIT ?
+                ''', (batch_size,))
+                games = cursor.fetchall()
+                for game_id, board_size in games:
+                    cursor.execute('''
+                        SELECT player, row, col, letter FROM moves
+                        WHERE game_id = ?
+                        ORDER BY move_number
+                    ''', (game_id,))
+                    record = bytearray([RECORD_VERSION])
+                    for player, row, col, letter in cursor.fetchall():
+                        record += encode_move(row, col, letter, player, board_size)
+                    cursor.execute('UPDATE games SET moves_blob = ? WHERE game_id = ?', (bytes(record), game_id))
+                    cursor.execute('DELETE FROM moves WHERE game_id = ?', (game_id,))
+                    cursor.execute('DELETE FROM sos_lines WHERE game_id = ?', (game_id,))
+            converted += len(games)
+            if len(games) < batch_size:
+                return converted
+
+class WriteBehindDatabase(GameStorage):
+    """Queues move, SOS line and game-end writes for a background thread.
+
+    The writer drains the queue in batches, one transaction per batch, so
+    saving a move costs a queue put instead of a disk commit. A single FIFO
+    queue and a single writer keep every game's writes in order. The queue
+    is bounded: when the writer falls behind, saves block until it catches
+    up. Reads flush pending writes first, so they always see earlier saves.
+    Writes made inside transaction() are queued together and committed in
+    the same batch.
+    """
+    def __init__(self, db: GameStorage, max_pending: int = 10000, batch_size: int = 500):
+        self.db = db
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._local = threading.local()
+        self._closed = False
+        self._writer = threading.Thread(target=self._drain, name="sos-db-write-behind", daemon=True)
+        self._writer.start()
+        _live_writers.add(self)
+
+    def start_new_game(self, board_size: int, game_mode: str,
+                       blue_player_type: str, red_player_type: str) -> int:
+        """Start a new game and return its ID (written immediately, since the ID is needed)"""
+        return self.db.start_new_game(board_size, game_mode, blue_player_type, red_player_type)
+
+    def start_new_games(self, count: int, board_size: int, game_mode: str,
+                        blue_player_type: str, red_player_type: str) -> List[int]:
+        """Start several games in a single transaction and return their IDs"""
+        return self.db.start_new_games(count, board_size, game_mode, blue_player_type, red_player_type)
+
+    def save_move(self, game_id: int, player: str, row: int, col: int,
+                  letter: str, move_number: int):
+        """Queue a move to be saved"""
+        self._put('save_move', (game_id, player, row, col, letter, move_number))
+
+    def save_sos_line(self, game_id: int, move_number: int, start_pos: List[int],
+                      end_pos: List[int], player: str):
+        """Queue an SOS line to be saved"""
+        self._put('save_sos_line', (game_id, move_number, list(start_pos), list(end_pos), player))
+
+    def end_game(self, game_id: int, winner: str, blue_score: int, red_score: int):
+        """Queue the final result of a game"""
+        self._put('end_game', (game_id, winner, blue_score, red_score))
+
+    def get_recent_games(self, limit: int = 10) -> List[Dict]:
+        """Get the most recent games, including queued results"""
+        self.flush()
+        return self.db.get_recent_games(limit)
+
+    def get_game_moves(self, game_id: int) -> List[Dict]:
+        """Get all moves for a specific game, including queued ones"""
+        self.flush()
+        return self.db.get_game_moves(game_id)
+
+    def get_game_sos_lines(self, game_id: int) -> List[Dict]:
+        """Get all SOS lines for a specific game, including queued ones"""
+        self.flush()
+        return self.db.get_game_sos_lines(game_id)
+
+    def get_game_replay(self, game_id: int) -> Tuple[List[Dict], List[Dict]]:
+        """Get (moves, sos_lines) for a game, including queued ones"""
+        self.flush()
+        return self.db.get_game_replay(game_id)
+
+    def query_games(self, *args, **kwargs) -> List[Any]:
+        """Get one page of games, including queued results"""
+        self.flush()
+        return self.db.query_games(*args, **kwargs)
+
+    def save_move_annotations(self, game_id: int, annotations: List[Dict]):
+        """Save engine annotations straight away; they come from a background worker already"""
+        self.db.save_move_annotations(game_id, annotations)
+
+    def get_move_annotations(self, game_id: int) -> Optional[List[Dict]]:
+        return self.db.get_move_annotations(game_id)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Queue the enclosed writes as one item, which the writer commits in a single transaction.
+
+        Writes made on this thread are held until the outermost transaction
+        exits, and dropped if it raises. Reads inside it do not see them yet.
+        """
+        if getattr(self._local, 'group', None) is not None:
+            yield
+            return
+        self._local.group = []
+        try:
+            yield
+            writes = self._local.group
+        finally:
+            self._local.group = None
+        if writes:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+            self._queue.put(writes)
+
+    def flush(self):
+        """Block until every queued write has been committed"""
+        if self._writer.is_alive():
+            self._queue.join()
+        self.db.flush()
+
+    def close(self):
+        """Flush pending writes, stop the writer and close the database"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        _live_writers.discard(self)
+        self.db.close()
+
+    def __enter__(self) -> 'WriteBehindDatabase':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __getattr__(self, name: str):
+        # Reads and anything else go to the database once pending writes are in
+        if name == 'db':
+            raise AttributeError(name)
+        attr = getattr(self.db, name)
+        if callable(attr):
+            self.flush()
+        return attr
+
+    def _put(self, method: str, args: Tuple):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        group = getattr(self._local, 'group', None)
+        if group is not None:
+            group.append((method, args))
+        else:
+            self._queue.put((method, args))
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            writes = []
+            for item in batch:
+                # A transaction's writes arrive as one list
+                if isinstance(item, list):
+                    writes.extend(item)
+                elif item is not None:
+                    writes.append(item)
+            try:
+                self._apply(writes)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _apply(self, writes: List[Tuple[str, Tuple]]):
+        try:
+            with self.db.transaction():
+                for method, args in writes:
+                    getattr(self.db, method)(*args)
+        except Exception as e:
+            # Retry one by one so a single bad write does not lose the whole batch
+            logging.error(f"Batched write failed, retrying individually: {e}")
+            for method, args in writes:
+                try:
+                    getattr(self.db, method)(*args)
+                except Exception as e:
+                    logging.error(f"Failed to write {method}{args}: {e}")
+
+_live_writers: 'weakref.WeakSet[WriteBehindDatabase]' = weakref.WeakSet()
+_default_databases: Dict[str, GameStorage] = {}
+_default_databases_lock = threading.Lock()
+
+def open_storage(spec: str = "sos_game.db") -> GameStorage:
+    """Open a storage backend from a spec.
+
+    "memory" and "null" select MemoryStorage and NullStorage, "log:PATH" a
+    LogStorage, "shards:DIR" every shard in a directory and "shards:DIR:N"
+    shard N of it for writing, and "sqlite:PATH" or a bare path a GameDatabase.
+    """
+    if spec == "memory":
+        return MemoryStorage()
+    if spec == "null":
+        return NullStorage()
+    if spec.startswith("log:"):
+        return LogStorage(spec[len("log:"):])
+    if spec.startswith("shards:"):
+        # Imported here because the shards module builds on this one
+        from shards import ShardedDatabase
+        directory, _, shard = spec[len("shards:"):].rpartition(":")
+        if directory and shard.isdigit():
+            return ShardedDatabase(directory, int(shard))
+        return ShardedDatabase(spec[len("shards:"):])
+    if spec.startswith("sqlite:"):
+        spec = spec[len("sqlite:"):]
+    return GameDatabase(spec)
+
+def default_database(spec: str = "sos_game.db") -> GameStorage:
+    """Get the shared storage for a spec, creating it on first use.
+
+    Backends that write to disk sit behind a WriteBehindDatabase; the
+    in-process ones are already cheaper than a queue put and are used as is.
+    """
+    with _default_databases_lock:
+        if spec not in _default_databases:
+            storage = open_storage(spec)
+            if not isinstance(storage, (MemoryStorage, NullStorage)):
+                storage = WriteBehindDatabase(storage)
+            _default_databases[spec] = storage
+        return _default_databases[spec]
 
-        conn.close()
-        return sos_lines 
\ No newline at end of file
+@atexit.register
+def _flush_on_exit():
+    for writer in list(_live_writers):
+        writer.flush()
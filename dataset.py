@@ -0,0 +1,258 @@
+"""Compact binary position/outcome datasets for fitting evaluation functions.
+
+Each record holds one position (2 bits per cell: 0 empty, 1 'S', 2 'O',
+packed four cells per byte in row-major order, low bits first), the player
+to move, the move played, the scores before the move and the final outcome
+of the game. Files are standard ``.npy`` arrays of a fixed-width structured
+dtype, so ``numpy.load(path, mmap_mode='r')`` maps them without parsing.
+
+    python dataset.py positions.npy --size 3 --source db
+    python dataset.py positions.npy --size 5 --source simulate --games 10000
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import ast
+import logging
+import random
+import struct
+
+from database import GameDatabase
+from sos_game_logic import GameBoard, create_player, play_move
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+HEADER_ALIGNMENT = 64
+SHAPE_RESERVE = 20  # Digits kept free in the header so the final count can be patched in
+DEFAULT_CHUNK_RECORDS = 4096
+
+CELL_CODES = {'': 0, 'S': 1, 'O': 2}
+CELL_LETTERS = {0: '', 1: 'S', 2: 'O'}
+LETTER_CODES = {'S': 0, 'O': 1}
+PLAYER_CODES = {'Blue': 0, 'Red': 1}
+OUTCOME_CODES = {'Blue': 1, 'Red': -1}  # Anything else (draw, no winner) is 0
+
+# Fields after the packed board: player, row, col, letter, outcome, blue_score, red_score
+RECORD_TAIL = struct.Struct('<BBBBbHH')
+
+
+def packed_board_bytes(size: int) -> int:
+    """Number of bytes a packed board of this size occupies"""
+    return (size * size + 3) // 4
+
+
+def record_dtype(size: int) -> List[Tuple]:
+    """The numpy structured dtype description of one record"""
+    return [
+        ('board', '|u1', (packed_board_bytes(size),)),
+        ('player', '|u1'),
+        ('row', '|u1'),
+        ('col', '|u1'),
+        ('letter', '|u1'),
+        ('outcome', '|i1'),
+        ('blue_score', '<u2'),
+        ('red_score', '<u2')
+    ]
+
+
+def record_size(size: int) -> int:
+    """Number of bytes one record occupies"""
+    return packed_board_bytes(size) + RECORD_TAIL.size
+
+
+def unpack_board(packed: bytes, size: int) -> List[List[str]]:
+    """Decode a packed board back into rows of '', 'S' and 'O'"""
+    cells = [CELL_LETTERS[(packed[i >> 2] >> ((i & 3) * 2)) & 3] for i in range(size * size)]
+    return [cells[row * size:(row + 1) * size] for row in range(size)]
+
+
+def _npy_header(size: int, count: int) -> bytes:
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (record_dtype(size), count)
+    # Keep the header length independent of the count so it can be rewritten in place
+    header += ' ' * (SHAPE_RESERVE - len(str(count)))
+    # Pad so the data starts on an aligned offset, as numpy expects
+    total = len(NPY_MAGIC) + 2 + len(header) + 1
+    header += ' ' * (-total % HEADER_ALIGNMENT) + '\n'
+    return NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+class PositionDatasetWriter:
+    """Streams records for one board size into a ``.npy`` file.
+
+    Records are buffered and written in chunks, so memory is bounded by the
+    chunk size. The record count in the header is patched in on close.
+    """
+    def __init__(self, path: str, size: int, chunk_records: int = DEFAULT_CHUNK_RECORDS):
+        if not 3 <= size <= 255:
+            raise ValueError(f"Unsupported board size for datasets: {size}")
+        self.path = path
+        self.size = size
+        self.chunk_records = chunk_records
+        self.count = 0
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._file = open(path, 'wb')
+        self._header_length = len(_npy_header(size, 0))
+        self._file.write(_npy_header(size, 0))
+
+    def write_game(self, moves: Iterable[Tuple[int, int, str]], game_mode: str) -> int:
+        """Replay a game with the game rules and write one record per move.
+
+        Returns the number of records written. Games that hit an invalid move
+        or never finish are skipped, since they have no outcome.
+        """
+        board = GameBoard(self.size)
+        packed = bytearray(packed_board_bytes(self.size))
+        positions = []
+        winner = None
+        game_over = False
+        try:
+            for row, col, letter in moves:
+                if game_over:
+                    raise ValueError("Move after the end of the game")
+                positions.append((bytes(packed), PLAYER_CODES[board.current_player], row, col,
+                                  LETTER_CODES[letter], board.blue_score, board.red_score))
+                _, game_over, winner = play_move(board, game_mode, row, col, letter)
+                index = row * self.size + col
+                packed[index >> 2] |= CELL_CODES[letter] << ((index & 3) * 2)
+        except (ValueError, KeyError) as e:
+            logging.warning(f"Skipping game with an unplayable move: {e}")
+            return 0
+        if not game_over:
+            return 0
+
+        outcome = OUTCOME_CODES.get(winner, 0)
+        for position, player, row, col, letter, blue_score, red_score in positions:
+            self._buffer += position
+            self._buffer += RECORD_TAIL.pack(player, row, col, letter, outcome, blue_score, red_score)
+        self._buffered += len(positions)
+        if self._buffered >= self.chunk_records:
+            self.flush()
+        return len(positions)
+
+    def flush(self):
+        """Write buffered records to disk"""
+        if self._buffer:
+            self._file.write(self._buffer)
+            self.count += self._buffered
+            self._buffer = bytearray()
+            self._buffered = 0
+
+    def close(self):
+        """Flush remaining records and record the final count in the header"""
+        if self._file.closed:
+            return
+        self.flush()
+        header = _npy_header(self.size, self.count)
+        if len(header) != self._header_length:
+            raise RuntimeError("Dataset header outgrew its reserved space")
+        self._file.seek(0)
+        self._file.write(header)
+        self._file.close()
+
+    def __enter__(self) -> 'PositionDatasetWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def stored_games(db: GameDatabase, size: int, chunk_size: int = 1000) -> Iterator[Tuple[str, List]]:
+    """Yield (game_mode, moves) for every stored game of a board size"""
+    for game, moves in db.iter_games_with_moves(board_size=size, chunk_size=chunk_size):
+        yield game['game_mode'], moves
+
+
+def simulated_games(count: int, size: int, game_mode: str, blue_player_type: str = "simple_computer",
+                    red_player_type: str = "simple_computer", seed: Optional[int] = None) -> Iterator[Tuple[str, List]]:
+    """Yield (game_mode, moves) for freshly played computer games, without touching the database"""
+    rng = random.Random(seed)  # Our own generator, so seeding leaves the process-wide one alone
+    players = {'Blue': create_player('Blue', blue_player_type, rng),
+               'Red': create_player('Red', red_player_type, rng)}
+    for _ in range(count):
+        board = GameBoard(size)
+        moves = []
+        game_over = False
+        while not game_over:
+            move = players[board.current_player].make_move(board)
+            _, game_over, _ = play_move(board, game_mode, *move)
+            moves.append(move)
+        yield game_mode, moves
+
+
+def write_dataset(path: str, size: int, games: Iterable[Tuple[str, List]],
+                  chunk_records: int = DEFAULT_CHUNK_RECORDS) -> int:
+    """Write every position of the given games to a dataset file and return the record count"""
+    with PositionDatasetWriter(path, size, chunk_records) as writer:
+        for game_mode, moves in games:
+            writer.write_game(moves, game_mode)
+    logging.info(f"Wrote {writer.count} positions to {path}")
+    return writer.count
+
+
+def read_header(path: str) -> Tuple[int, int]:
+    """Return (board_size, record_count) of a dataset file"""
+    with open(path, 'rb') as f:
+        if f.read(len(NPY_MAGIC)) != NPY_MAGIC:
+            raise ValueError(f"{path} is not a version 1.0 .npy file")
+        header_length, = struct.unpack('<H', f.read(2))
+        header = ast.literal_eval(f.read(header_length).decode('latin1'))
+    descr = [tuple(field) for field in header['descr']]
+    for size in range(3, 256):
+        if record_dtype(size) == descr:
+            return size, header['shape'][0]
+    raise ValueError(f"{path} is not an SOS position dataset")
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """Read records back without numpy, mainly for inspection and tests"""
+    size, count = read_header(path)
+    board_bytes = packed_board_bytes(size)
+    with open(path, 'rb') as f:
+        f.seek(len(_npy_header(size, 0)))
+        for _ in range(count):
+            data = f.read(record_size(size))
+            player, row, col, letter, outcome, blue_score, red_score = RECORD_TAIL.unpack(data[board_bytes:])
+            yield {
+                'board': unpack_board(data[:board_bytes], size),
+                'player': 'Blue' if player == 0 else 'Red',
+                'row': row,
+                'col': col,
+                'letter': 'S' if letter == 0 else 'O',
+                'outcome': outcome,
+                'blue_score': blue_score,
+                'red_score': red_score
+            }
+
+
+def load_dataset(path: str, mmap: bool = True):
+    """Load a dataset as a numpy structured array, memory-mapped by default"""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Loading datasets as arrays requires numpy; use iter_records() without it")
+    return numpy.load(path, mmap_mode='r' if mmap else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write SOS positions, moves and outcomes to a .npy dataset")
+    parser.add_argument("output", help="Path of the .npy file to write")
+    parser.add_argument("--size", type=int, required=True, help="Board size to export")
+    parser.add_argument("--source", choices=("db", "simulate"), default="db", help="Replay stored games or play new ones")
+    parser.add_argument("--db", default="sos_game.db", help="Database to read stored games from")
+    parser.add_argument("--games", type=int, default=1000, help="Number of games to simulate")
+    parser.add_argument("--mode", choices=("Simple", "General"), default="General", help="Mode of simulated games")
+    parser.add_argument("--blue", default="simple_computer", help="Player type for Blue in simulated games")
+    parser.add_argument("--red", default="simple_computer", help="Player type for Red in simulated games")
+    parser.add_argument("--seed", type=int, help="Random seed for simulated games")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_RECORDS, help="Records buffered per write")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.source == "db":
+        games = stored_games(GameDatabase(args.db), args.size)
+    else:
+        games = simulated_games(args.games, args.size, args.mode, args.blue, args.red, args.seed)
+    write_dataset(args.output, args.size, games, args.chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Maintenance commands for the SOS game database.
+
+    python db_admin.py --db sos_game.db compact --vacuum
+    python db_admin.py rebuild-stats
+    python db_admin.py export games.jsonl.gz
+    python db_admin.py import worker1.jsonl.gz worker2.jsonl.gz
+    python db_admin.py retain --keep-days 30 --archive old_games.jsonl.gz
+"""
+import argparse
+import time
+
+import archive
+from database import GameDatabase
+from retention import apply_retention
+
+def compact(args):
+    with GameDatabase(args.db) as db:
+        start = time.perf_counter()
+        converted = db.compact_games(args.batch_size)
+        print(f"Converted {converted} games to compact records in {time.perf_counter() - start:.2f}s")
+        if args.vacuum:
+            # VACUUM cannot run inside a transaction, and rewrites the whole file
+            db._connection().execute('VACUUM')
+            print("Vacuumed database")
+
+def rebuild_stats(args):
+    with GameDatabase(args.db) as db:
+        start = time.perf_counter()
+        db.rebuild_stats()
+        totals = db.get_stats()[0]
+        print(f"Recounted statistics for {totals['games']} finished games in {time.perf_counter() - start:.2f}s")
+
+def export(args):
+    with GameDatabase(args.db) as db:
+        start = time.perf_counter()
+        count = archive.export_archive(db, args.archive, args.chunk_size)
+        print(f"Exported {count} games to {args.archive} in {time.perf_counter() - start:.2f}s")
+
+def import_archives(args):
+    with GameDatabase(args.db, compact=args.compact) as db:
+        for path in args.archives:
+            start = time.perf_counter()
+            count = archive.import_archive(db, path, args.batch_size)
+            print(f"Imported {count} games from {path} in {time.perf_counter() - start:.2f}s")
+
+def retain(args):
+    if args.keep_games is None and args.keep_days is None:
+        raise SystemExit("retain needs --keep-games and/or --keep-days")
+    with GameDatabase(args.db) as db:
+        report = apply_retention(db, args.keep_games, args.keep_days, args.archive,
+                                 args.batch_size, args.pause, vacuum=not args.no_vacuum)
+        print(f"Retired {report.retired} games in {report.elapsed:.2f}s")
+        if args.archive:
+            print(f"Archived {report.archived} games to {args.archive}")
+        if not args.no_vacuum and not report.vacuumed:
+            print("Database predates incremental vacuum; run 'compact --vacuum' once to enable it")
+
+def main():
+    parser = argparse.ArgumentParser(description="SOS game database maintenance")
+    parser.add_argument("--db", default="sos_game.db", help="Database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = commands.add_parser("compact", help="Convert finished row-format games to compact records")
+    compact_parser.add_argument("--batch-size", type=int, default=500, help="Games converted per transaction")
+    compact_parser.add_argument("--vacuum", action="store_true", help="Reclaim the freed space afterwards")
+    compact_parser.set_defaults(handler=compact)
+
+    stats_parser = commands.add_parser("rebuild-stats", help="Recount the statistics summary from all games")
+    stats_parser.set_defaults(handler=rebuild_stats)
+
+    export_parser = commands.add_parser("export", help="Write every game to a compressed archive")
+    export_parser.add_argument("archive", help="Archive file to write (gzip JSON lines)")
+    export_parser.add_argument("--chunk-size", type=int, default=500, help="Games read per query")
+    export_parser.set_defaults(handler=export)
+
+    import_parser = commands.add_parser("import", help="Add the games in archives under new IDs")
+    import_parser.add_argument("archives", nargs="+", help="Archive files to read")
+    import_parser.add_argument("--batch-size", type=int, default=1000, help="Games inserted per transaction")
+    import_parser.add_argument("--compact", action="store_true", help="Store imported games as compact records")
+    import_parser.set_defaults(handler=import_archives)
+
+    retain_parser = commands.add_parser("retain", help="Retire finished games outside the retention limits")
+    retain_parser.add_argument("--keep-games", type=int, default=None, help="Keep the newest N games")
+    retain_parser.add_argument("--keep-days", type=float, default=None, help="Keep games from the last N days")
+    retain_parser.add_argument("--archive", default=None, help="Write retired games to this archive first")
+    retain_parser.add_argument("--batch-size", type=int, default=500, help="Games retired per transaction")
+    retain_parser.add_argument("--pause", type=float, default=0.0, help="Seconds to wait between batches")
+    retain_parser.add_argument("--no-vacuum", action="store_true", help="Skip the incremental vacuum")
+    retain_parser.set_defaults(handler=retain)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
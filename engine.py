@@ -0,0 +1,80 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple, Type
+import importlib
+
+from sos_game_logic import GameBoard, play_move
+
+class Engine(ABC):
+    """Interface for board engines that play by the SOS rules.
+
+    The reference engine wraps GameBoard; faster engines implement the same
+    interface so perft counts and the differential fuzzer can check them.
+    """
+    def __init__(self, size: int, game_mode: str):
+        self.size = size
+        self.game_mode = game_mode
+
+    @abstractmethod
+    def legal_moves(self) -> List[Tuple[int, int, str]]:
+        """Return every legal (row, col, letter), row-major with 'S' before 'O'"""
+        pass
+
+    @abstractmethod
+    def play(self, row: int, col: int, letter: str) -> Tuple[bool, bool, Optional[str]]:
+        """Play a move and return (sos_formed, game_over, winner)"""
+        pass
+
+    @abstractmethod
+    def copy(self) -> 'Engine':
+        """Return an independent copy of the engine"""
+        pass
+
+    @abstractmethod
+    def snapshot(self) -> Tuple:
+        """Return the observable state as a hashable tuple.
+
+        The tuple is (board rows, current player, blue score, red score,
+        frozenset of SOS lines). SOS lines are ((row, col), (row, col), player)
+        with the ends ordered as GameBoard.add_sos_line stores them.
+        """
+        pass
+
+class ReferenceEngine(Engine):
+    """Engine backed by GameBoard and the GameLogic turn rules"""
+    def __init__(self, size: int, game_mode: str):
+        super().__init__(size, game_mode)
+        self.board = GameBoard(size)
+
+    def legal_moves(self) -> List[Tuple[int, int, str]]:
+        return [(row, col, letter)
+                for row in range(self.size)
+                for col in range(self.size)
+                if self.board.is_empty(row, col)
+                for letter in ('S', 'O')]
+
+    def play(self, row: int, col: int, letter: str) -> Tuple[bool, bool, Optional[str]]:
+        return play_move(self.board, self.game_mode, row, col, letter)
+
+    def copy(self) -> 'ReferenceEngine':
+        engine = ReferenceEngine.__new__(ReferenceEngine)
+        engine.size = self.size
+        engine.game_mode = self.game_mode
+        engine.board = self.board.copy()
+        return engine
+
+    def snapshot(self) -> Tuple:
+        return (tuple(tuple(row) for row in self.board.board),
+                self.board.current_player,
+                self.board.blue_score,
+                self.board.red_score,
+                frozenset(self.board.sos_lines))
+
+def load_engine(spec: str) -> Type[Engine]:
+    """Load an engine class from a 'module:Class' spec"""
+    module_name, _, class_name = spec.partition(':')
+    if not class_name:
+        raise ValueError(f"Engine spec must look like 'module:Class', got {spec!r}")
+    engine_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(engine_class, type) and issubclass(engine_class, Engine)):
+        raise ValueError(f"{spec} is not an Engine subclass")
+    return engine_class
@@ -0,0 +1,185 @@
+"""Differential fuzzing of board engines against the reference GameBoard.
+
+Random games are played through the reference engine and a candidate
+engine in lockstep. After every move the move results, the observable
+state (board, turn, scores, SOS lines) and the legal moves must match. The
+first divergence stops the run and is shrunk to a minimal move sequence.
+
+    python fuzz.py my_engine:FastEngine --games 200000 --workers 8
+"""
+from typing import Iterator, List, Optional, Tuple, Type
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from engine import Engine, ReferenceEngine, load_engine
+
+DEFAULT_SIZES = (3, 4, 5, 6, 8)
+DEFAULT_MODES = ("Simple", "General")
+GAMES_PER_TASK = 200
+
+Move = Tuple[int, int, str]
+
+class Divergence:
+    """A move sequence on which a candidate engine disagrees with the reference"""
+    def __init__(self, size: int, game_mode: str, moves: List[Move], detail: str,
+                 seed: Optional[int] = None):
+        self.size = size
+        self.game_mode = game_mode
+        self.moves = moves
+        self.detail = detail
+        self.seed = seed
+
+    def format(self) -> str:
+        lines = [f"Divergence on {self.size}x{self.size} {self.game_mode} (game seed {self.seed}):",
+                 f"  {self.detail}",
+                 f"  Minimal sequence ({len(self.moves)} moves):"]
+        lines += [f"    {i + 1}. {letter} at ({row}, {col})" for i, (row, col, letter) in enumerate(self.moves)]
+        return "\n".join(lines)
+
+def first_divergence(candidate_class: Type[Engine], reference_class: Type[Engine], size: int,
+                     game_mode: str, moves: List[Move]) -> Optional[Tuple[int, str]]:
+    """Replay moves through both engines and return (move index, detail) of the first mismatch.
+
+    Returns None if the engines agree, or if the sequence stops being playable
+    under the reference rules before any mismatch.
+    """
+    reference = reference_class(size, game_mode)
+    try:
+        candidate = candidate_class(size, game_mode)
+    except Exception as e:
+        return -1, f"Candidate failed to start: {e!r}"
+
+    for index, move in enumerate(moves):
+        try:
+            expected = reference.play(*move)
+        except ValueError:
+            return None
+        try:
+            actual = candidate.play(*move)
+        except Exception as e:
+            return index, f"Candidate raised {e!r} on move {move}"
+        if tuple(actual) != tuple(expected):
+            return index, f"Move {move} returned {actual}, expected {expected}"
+
+        expected_state = reference.snapshot()
+        actual_state = candidate.snapshot()
+        if actual_state != expected_state:
+            fields = ('board', 'current player', 'blue score', 'red score', 'SOS lines')
+            diffs = [f"{name}: {a!r} != {e!r}"
+                     for name, a, e in zip(fields, actual_state, expected_state) if a != e]
+            return index, f"State after {move} differs: " + "; ".join(diffs)
+
+        if expected[1]:
+            # Nothing after the end of the game is playable
+            return None
+        if sorted(candidate.legal_moves()) != sorted(reference.legal_moves()):
+            return index, f"Legal moves after {move} differ"
+    return None
+
+def minimize(candidate_class: Type[Engine], reference_class: Type[Engine], size: int,
+             game_mode: str, moves: List[Move]) -> Tuple[List[Move], str]:
+    """Shrink a diverging move sequence by removing chunks of moves while it still diverges"""
+    index, detail = first_divergence(candidate_class, reference_class, size, game_mode, moves)
+    moves = moves[:index + 1]
+    chunk = max(1, len(moves) // 2)
+    while True:
+        removed = False
+        start = 0
+        while start < len(moves):
+            trial = moves[:start] + moves[start + chunk:]
+            found = first_divergence(candidate_class, reference_class, size, game_mode, trial) if trial else None
+            if found is not None:
+                index, detail = found
+                moves = trial[:index + 1]
+                removed = True
+            else:
+                start += chunk
+        if chunk == 1 and not removed:
+            return moves, detail
+        if not removed:
+            chunk = max(1, chunk // 2)
+
+def random_game(rng: random.Random, reference_class: Type[Engine], size: int, game_mode: str) -> Iterator[Move]:
+    """Yield the moves of a random game played under the reference rules"""
+    engine = reference_class(size, game_mode)
+    while True:
+        move = rng.choice(engine.legal_moves())
+        yield move
+        if engine.play(*move)[1]:
+            return
+
+def _fuzz_games(task: Tuple) -> Tuple[int, int, Optional[Divergence]]:
+    """Worker entry point: fuzz a batch of games and return (games, moves, divergence)"""
+    candidate_class, reference_class, first_seed, count, sizes, modes = task
+    moves_played = 0
+    for seed in range(first_seed, first_seed + count):
+        rng = random.Random(seed)
+        size = rng.choice(sizes)
+        game_mode = rng.choice(modes)
+        moves = list(random_game(rng, reference_class, size, game_mode))
+        moves_played += len(moves)
+        if first_divergence(candidate_class, reference_class, size, game_mode, moves) is not None:
+            minimal, detail = minimize(candidate_class, reference_class, size, game_mode, moves)
+            return seed - first_seed + 1, moves_played, Divergence(size, game_mode, minimal, detail, seed)
+    return count, moves_played, None
+
+class FuzzReport:
+    """Outcome of a fuzzing run"""
+    def __init__(self, games: int, moves: int, elapsed: float, divergence: Optional[Divergence]):
+        self.games = games
+        self.moves = moves
+        self.elapsed = elapsed
+        self.divergence = divergence
+
+def fuzz(candidate_class: Type[Engine], games: int = 10000, reference_class: Type[Engine] = ReferenceEngine,
+         sizes=DEFAULT_SIZES, modes=DEFAULT_MODES, seed: int = 0, workers: Optional[int] = None) -> FuzzReport:
+    """Play random games through both engines until one diverges or all games are played"""
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    tasks = [(candidate_class, reference_class, seed + start, min(GAMES_PER_TASK, games - start),
+              tuple(sizes), tuple(modes))
+             for start in range(0, games, GAMES_PER_TASK)]
+
+    start_time = time.perf_counter()
+    played_games = played_moves = 0
+    divergence = None
+    if workers <= 1:
+        for task_games, task_moves, divergence in map(_fuzz_games, tasks):
+            played_games += task_games
+            played_moves += task_moves
+            if divergence is not None:
+                break
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for task_games, task_moves, divergence in pool.imap_unordered(_fuzz_games, tasks):
+                played_games += task_games
+                played_moves += task_moves
+                if divergence is not None:
+                    pool.terminate()
+                    break
+    return FuzzReport(played_games, played_moves, time.perf_counter() - start_time, divergence)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz a board engine against the reference GameBoard")
+    parser.add_argument("engine", help="Candidate engine class as module:Class")
+    parser.add_argument("--reference", default="engine:ReferenceEngine", help="Reference engine as module:Class")
+    parser.add_argument("--games", type=int, default=10000, help="Random games to play")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Board sizes to draw from")
+    parser.add_argument("--modes", nargs="+", choices=DEFAULT_MODES, default=list(DEFAULT_MODES), help="Game modes")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    report = fuzz(load_engine(args.engine), args.games, load_engine(args.reference),
+                  args.sizes, args.modes, args.seed, args.workers)
+    print(f"{report.games} games, {report.moves} moves in {report.elapsed:.2f}s")
+    if report.divergence is not None:
+        print(report.divergence.format())
+        sys.exit(1)
+    print("No divergence found")
+
+if __name__ == "__main__":
+    main()
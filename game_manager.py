@@ -0,0 +1,152 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+import logging
+import os
+
+from database import default_database
+from player import Player
+from sos_game_logic import GameLogic, GameBoard, create_player, sos_patterns
+from storage import GameStorage
+
+
+def _choose_moves(players: List[Player], boards: List[GameBoard]) -> List[Optional[Tuple[int, int, str]]]:
+    """Ask each computer player for a move, isolating failures per game"""
+    moves = []
+    for player, board in zip(players, boards):
+        try:
+            moves.append(player.make_move(board))
+        except Exception as e:
+            logging.error(f"Computer player {player.symbol} failed to choose a move: {e}")
+            moves.append(None)
+    return moves
+
+
+class GameManager:
+    """Creates and drives many games in one process.
+
+    All games share a single database handle, one player object per
+    (colour, type) and the per-size SOS pattern tables, so a new game costs
+    little more than its board. Computer players search in a process pool,
+    since their moves are pure Python and would take turns on the GIL in
+    threads.
+    """
+    def __init__(self, db: Optional[GameStorage] = None, ai_executor: Optional[Executor] = None):
+        self.db = db if db is not None else default_database()
+        self._ai_executor = ai_executor
+        self._owns_executor = ai_executor is None
+        self.games: Dict[int, GameLogic] = {}
+        self._players: Dict[Tuple[str, str], Player] = {}
+
+    @property
+    def ai_executor(self) -> Executor:
+        """The computer player pool, created on first use"""
+        if self._ai_executor is None:
+            self._ai_executor = ProcessPoolExecutor()
+        return self._ai_executor
+
+    def _shared_players(self, blue_player_type: str, red_player_type: str) -> Dict[str, Player]:
+        players = {}
+        for symbol, player_type in (('Blue', blue_player_type), ('Red', red_player_type)):
+            key = (symbol, player_type.lower())
+            if key not in self._players:
+                self._players[key] = create_player(symbol, player_type)
+            players[symbol] = self._players[key]
+        return players
+
+    def create_game(self, size: int, game_mode: str, blue_player_type: str = "human",
+                    red_player_type: str = "human") -> GameLogic:
+        """Create a single managed game"""
+        return self.create_games(1, size, game_mode, blue_player_type, red_player_type)[0]
+
+    def create_games(self, count: int, size: int, game_mode: str, blue_player_type: str = "human",
+                     red_player_type: str = "human") -> List[GameLogic]:
+        """Create many games with the same settings, reserving their IDs in one transaction"""
+        players = self._shared_players(blue_player_type, red_player_type)
+        sos_patterns(size)  # Build the shared table once, before any game needs it
+        game_ids = self.db.start_new_games(count, size, game_mode, blue_player_type, red_player_type)
+
+        games = []
+        for game_id in game_ids:
+            game = GameLogic(size, game_mode, blue_player_type, red_player_type,
+                             db=self.db, game_id=game_id, players=players)
+            self.games[game_id] = game
+            games.append(game)
+        return games
+
+    def get_game(self, game_id: int) -> Optional[GameLogic]:
+        """Get a managed game by ID"""
+        return self.games.get(game_id)
+
+    def remove_game(self, game_id: int):
+        """Stop a game and stop managing it"""
+        game = self.games.pop(game_id, None)
+        if game is not None:
+            game.stop()
+
+    def pending_games(self) -> List[GameLogic]:
+        """Get the games waiting on a computer move"""
+        return [game for game in self.games.values()
+                if game.pending_computer_move and not game.game_over and not game.stopped]
+
+    def step(self) -> int:
+        """Advance every game waiting on a computer move by one move.
+
+        Moves for all pending games are chosen in chunks across the worker
+        processes and then applied in game order, in one transaction.
+        Returns the number of moves made.
+        """
+        games = []
+        for game in self.pending_games():
+            if game.board.is_full():
+                game.game_over = True
+                game._determine_winner()
+                game.pending_computer_move = False
+            else:
+                games.append(game)
+        if not games:
+            return 0
+
+        players = [game.players[game.board.current_player] for game in games]
+        boards = [game.board for game in games]
+        moves = []
+        for chunk in self._chunks(len(games)):
+            moves.append(self.ai_executor.submit(_choose_moves, players[chunk], boards[chunk]))
+        moves = [move for future in moves for move in future.result()]
+
+        made = 0
+        with self.db.transaction():
+            for game, move in zip(games, moves):
+                if move is not None and game.make_move(*move):
+                    made += 1
+                else:
+                    logging.error(f"Computer move {move} failed in game {game.game_id}")
+                    game.pending_computer_move = False
+        return made
+
+    def run(self, max_steps: Optional[int] = None) -> int:
+        """Step until no computer moves are pending and return the moves made"""
+        total = 0
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            made = self.step()
+            if not made:
+                break
+            total += made
+            steps += 1
+        return total
+
+    def close(self):
+        """Stop all games and shut down the worker pool if the manager created it"""
+        for game in self.games.values():
+            game.stop()
+        self.games.clear()
+        if self._owns_executor and self._ai_executor is not None:
+            self._ai_executor.shutdown(wait=True)
+            self._ai_executor = None
+
+    @staticmethod
+    def _chunks(count: int) -> Iterable[slice]:
+        # A few chunks per worker process keeps them all busy without one task per game
+        chunk_size = max(1, -(-count // ((os.cpu_count() or 1) * 4)))
+        for start in range(0, count, chunk_size):
+            yield slice(start, start + chunk_size)
@@ -0,0 +1,72 @@
+"""Compact single-value encoding of a game's move list.
+
+A record is one version byte followed by two little-endian bytes per move:
+bits 0-13 hold the cell index (row * board_size + col), bit 14 the letter
+(0 'S', 1 'O') and bit 15 the player (0 Blue, 1 Red). SOS lines are not
+stored; they are recomputed from the moves when needed.
+"""
+from typing import Dict, Iterable, List
+import struct
+from sos_game_logic import GameBoard
+
+RECORD_VERSION = 1
+MAX_CELLS = 1 << 14
+LETTER_BIT = 1 << 14
+PLAYER_BIT = 1 << 15
+
+_MOVE = struct.Struct('<H')
+
+def encode_move(row: int, col: int, letter: str, player: str, board_size: int) -> bytes:
+    """Encode a single move as two bytes"""
+    index = row * board_size + col
+    if not 0 <= index < MAX_CELLS or not 0 <= col < board_size:
+        raise ValueError(f"Cell ({row}, {col}) cannot be encoded for board size {board_size}")
+    value = index
+    if letter == 'O':
+        value |= LETTER_BIT
+    if player == 'Red':
+        value |= PLAYER_BIT
+    return _MOVE.pack(value)
+
+def encode_moves(moves: Iterable[Dict], board_size: int) -> bytes:
+    """Encode moves (dicts with row, col, letter and player) in play order"""
+    record = bytearray([RECORD_VERSION])
+    for move in moves:
+        record += encode_move(move['row'], move['col'], move['letter'], move['player'], board_size)
+    return bytes(record)
+
+def decode_moves(record: bytes, board_size: int) -> List[Dict]:
+    """Decode a record into move dicts shaped like GameDatabase.get_game_moves rows"""
+    if not record:
+        return []
+    if record[0] != RECORD_VERSION:
+        raise ValueError(f"Unknown game record version: {record[0]}")
+    moves = []
+    for number, (value,) in enumerate(_MOVE.iter_unpack(record[1:]), start=1):
+        index = value & (MAX_CELLS - 1)
+        moves.append({
+            'player': 'Red' if value & PLAYER_BIT else 'Blue',
+            'row': index // board_size,
+            'col': index % board_size,
+            'letter': 'O' if value & LETTER_BIT else 'S',
+            'move_number': number
+        })
+    return moves
+
+def replay_sos_lines(moves: List[Dict], board_size: int) -> List[Dict]:
+    """Recompute the SOS lines a game formed, shaped like GameDatabase.get_game_sos_lines rows"""
+    board = GameBoard(board_size)
+    sos_lines = []
+    for move in moves:
+        board.make_move(move['row'], move['col'], move['letter'])
+        board.current_player = move['player']
+        previous_count = len(board.sos_lines)
+        board.check_sos(move['row'], move['col'])
+        for start_pos, end_pos, player in board.sos_lines[previous_count:]:
+            sos_lines.append({
+                'move_number': move['move_number'],
+                'start_pos': list(start_pos),
+                'end_pos': list(end_pos),
+                'player': player
+            })
+    return sos_lines
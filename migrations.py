@@ -0,0 +1,192 @@
+"""Versioned schema migrations for the game database.
+
+Each migration has a version number and runs once, in order, when a
+GameDatabase is opened. Applied versions are recorded in schema_version.
+To change the schema, append a new migration; never edit one that has
+already shipped.
+"""
+from typing import Callable, List, Tuple
+import logging
+import sqlite3
+
+Migration = Tuple[int, str, Callable[[sqlite3.Cursor], None]]
+
+def _create_tables(cursor: sqlite3.Cursor):
+    # Create games table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS games (
+            game_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            board_size INTEGER NOT NULL,
+            game_mode TEXT NOT NULL,
+            blue_player_type TEXT NOT NULL,
+            red_player_type TEXT NOT NULL,
+            winner TEXT,
+            blue_score INTEGER DEFAULT 0,
+            red_score INTEGER DEFAULT 0,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create moves table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS moves (
+            move_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id INTEGER NOT NULL,
+            player TEXT NOT NULL,
+            row INTEGER NOT NULL,
+            col INTEGER NOT NULL,
+            letter TEXT NOT NULL,
+            move_number INTEGER NOT NULL,
+            FOREIGN KEY (game_id) REFERENCES games (game_id)
+        )
+    ''')
+
+    # Create SOS lines table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sos_lines (
+            line_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id INTEGER NOT NULL,
+            move_number INTEGER NOT NULL,
+            start_row INTEGER NOT NULL,
+            start_col INTEGER NOT NULL,
+            end_row INTEGER NOT NULL,
+            end_col INTEGER NOT NULL,
+            player TEXT NOT NULL,
+            FOREIGN KEY (game_id) REFERENCES games (game_id)
+        )
+    ''')
+
+def _add_lookup_indexes(cursor: sqlite3.Cursor):
+    # Replays load one game's moves and lines in order
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_moves_game ON moves (game_id, move_number)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sos_lines_game ON sos_lines (game_id, move_number)')
+    # The replay list shows the most recent games first
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_timestamp ON games (timestamp)')
+
+def _add_moves_blob(cursor: sqlite3.Cursor):
+    # Compact storage keeps a whole game's moves in one value on the games row
+    cursor.execute('ALTER TABLE games ADD COLUMN moves_blob BLOB')
+
+def _add_history_indexes(cursor: sqlite3.Cursor):
+    # History browsing filters on these columns and pages by (timestamp, game_id);
+    # game_id is the rowid, so every index already ends with it
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_size_mode ON games (board_size, game_mode, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_players ON games (blue_player_type, red_player_type, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_winner ON games (winner, timestamp)')
+
+STATS_GROUP_COLUMNS = ('board_size', 'game_mode', 'blue_player_type', 'red_player_type')
+
+def rebuild_game_stats(cursor: sqlite3.Cursor):
+    """Recount game_stats from every finished game"""
+    cursor.execute('DELETE FROM game_stats')
+    cursor.execute('''
+        INSERT INTO game_stats (board_size, game_mode, blue_player_type, red_player_type,
+                                games, blue_wins, red_wins, draws, blue_score, red_score)
+        SELECT board_size, game_mode, blue_player_type, red_player_type,
+               COUNT(*),
+               SUM(CASE WHEN winner = 'Blue' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN winner = 'Red' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN winner IN ('Blue', 'Red') THEN 0 ELSE 1 END),
+               TOTAL(blue_score),
+               TOTAL(red_score)
+        FROM games
+        WHERE finished = 1
+        GROUP BY board_size, game_mode, blue_player_type, red_player_type
+    ''')
+
+def _add_game_stats(cursor: sqlite3.Cursor):
+    # A finished flag lets end_game count each game once, even when it is called again;
+    # older games only recorded a result, so a winner is the best sign they finished
+    cursor.execute('ALTER TABLE games ADD COLUMN finished INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('UPDATE games SET finished = 1 WHERE winner IS NOT NULL')
+    cursor.execute('''
+        CREATE TABLE game_stats (
+            board_size INTEGER NOT NULL,
+            game_mode TEXT NOT NULL,
+            blue_player_type TEXT NOT NULL,
+            red_player_type TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            blue_wins INTEGER NOT NULL DEFAULT 0,
+            red_wins INTEGER NOT NULL DEFAULT 0,
+            draws INTEGER NOT NULL DEFAULT 0,
+            blue_score INTEGER NOT NULL DEFAULT 0,
+            red_score INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (board_size, game_mode, blue_player_type, red_player_type)
+        ) WITHOUT ROWID
+    ''')
+    rebuild_game_stats(cursor)
+
+def _add_retired_stats(cursor: sqlite3.Cursor):
+    # Totals of games deleted by retention, which rebuilds add back to game_stats
+    cursor.execute('''
+        CREATE TABLE retired_stats (
+            board_size INTEGER NOT NULL,
+            game_mode TEXT NOT NULL,
+            blue_player_type TEXT NOT NULL,
+            red_player_type TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            blue_wins INTEGER NOT NULL DEFAULT 0,
+            red_wins INTEGER NOT NULL DEFAULT 0,
+            draws INTEGER NOT NULL DEFAULT 0,
+            blue_score INTEGER NOT NULL DEFAULT 0,
+            red_score INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (board_size, game_mode, blue_player_type, red_player_type)
+        ) WITHOUT ROWID
+    ''')
+
+def _add_move_annotations(cursor: sqlite3.Cursor):
+    # Engine analysis of each move, saved so a game is only analysed once
+    cursor.execute('''
+        CREATE TABLE move_annotations (
+            game_id INTEGER NOT NULL,
+            move_number INTEGER NOT NULL,
+            best_row INTEGER NOT NULL,
+            best_col INTEGER NOT NULL,
+            best_letter TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            best_value INTEGER NOT NULL,
+            handed_sos INTEGER NOT NULL,
+            PRIMARY KEY (game_id, move_number)
+        ) WITHOUT ROWID
+    ''')
+
+MIGRATIONS: List[Migration] = [
+    (1, "Create games, moves and sos_lines tables", _create_tables),
+    (2, "Index moves and SOS lines by game, and games by timestamp", _add_lookup_indexes),
+    (3, "Add compact moves_blob column to games", _add_moves_blob),
+    (4, "Index games by the history query filters", _add_history_indexes),
+    (5, "Add finished flag and game_stats summary table", _add_game_stats),
+    (6, "Add retired_stats table for games removed by retention", _add_retired_stats),
+    (7, "Add move_annotations table for engine analysis", _add_move_annotations),
+]
+
+def current_version(cursor: sqlite3.Cursor) -> int:
+    """Get the newest applied migration version, 0 for a new database"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if cursor.fetchone() is None:
+        return 0
+    cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+    return cursor.fetchone()[0]
+
+def apply_migrations(cursor: sqlite3.Cursor, migrations: List[Migration] = MIGRATIONS) -> int:
+    """Apply every migration newer than the database, in order, and return the new version.
+
+    Run inside a transaction so a failed migration leaves the schema untouched.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    version = current_version(cursor)
+    for migration_version, description, migrate in migrations:
+        if migration_version <= version:
+            continue
+        logging.info(f"Applying database migration {migration_version}: {description}")
+        migrate(cursor)
+        cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                       (migration_version, description))
+        version = migration_version
+    return version
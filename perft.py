@@ -0,0 +1,146 @@
+"""Perft-style enumeration of the SOS game tree.
+
+Counts the positions reached at every ply, the terminal positions and how
+finished games split between Blue, Red and draws, for one board size and
+mode up to a given depth. Positions are counted per path, as in chess perft,
+so any engine playing by the same rules must produce identical counts.
+
+    python perft.py --size 3 --mode Simple --depth 5 --workers 8
+    python perft.py --size 4 --mode General --depth 3 --engine my_engine:FastEngine
+"""
+from typing import Dict, List, Optional, Tuple, Type
+import argparse
+import multiprocessing
+import os
+import time
+
+from engine import Engine, ReferenceEngine, load_engine
+
+class PerftResult:
+    """Counters gathered by a perft run"""
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.nodes = [0] * (depth + 1)
+        self.terminals = [0] * (depth + 1)
+        self.outcomes = {'Blue': 0, 'Red': 0, 'Draw': 0}
+
+    def add_terminal(self, ply: int, winner: Optional[str]):
+        self.terminals[ply] += 1
+        # A Simple game that fills the board without an SOS has no winner
+        self.outcomes[winner if winner in ('Blue', 'Red') else 'Draw'] += 1
+
+    def merge(self, other: 'PerftResult'):
+        for ply in range(self.depth + 1):
+            self.nodes[ply] += other.nodes[ply]
+            self.terminals[ply] += other.terminals[ply]
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] += count
+
+    def as_dict(self) -> Dict:
+        return {'nodes': self.nodes[:], 'terminals': self.terminals[:], 'outcomes': dict(self.outcomes)}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PerftResult) and self.as_dict() == other.as_dict()
+
+def _search(engine: Engine, ply: int, depth: int, result: PerftResult,
+            game_over: bool = False, winner: Optional[str] = None):
+    result.nodes[ply] += 1
+    if game_over:
+        result.add_terminal(ply, winner)
+        return
+    if ply == depth:
+        return
+    for move in engine.legal_moves():
+        child = engine.copy()
+        _, child_over, child_winner = child.play(*move)
+        _search(child, ply + 1, depth, result, child_over, child_winner)
+
+def _search_subtree(task: Tuple[Type[Engine], int, str, List[Tuple[int, int, str]], int]) -> PerftResult:
+    """Worker entry point: rebuild a subtree root from its move prefix and search it"""
+    engine_class, size, game_mode, prefix, depth = task
+    engine = engine_class(size, game_mode)
+    for move in prefix:
+        engine.play(*move)
+    result = PerftResult(depth)
+    # The subtree root itself was already counted while splitting
+    for move in engine.legal_moves():
+        child = engine.copy()
+        _, child_over, child_winner = child.play(*move)
+        _search(child, len(prefix) + 1, depth, result, child_over, child_winner)
+    return result
+
+def _split(engine_class: Type[Engine], size: int, game_mode: str, depth: int,
+           split_depth: int, result: PerftResult) -> List[List[Tuple[int, int, str]]]:
+    """Expand the tree to split_depth, counting those plies, and return the open subtree prefixes"""
+    frontier = [([], engine_class(size, game_mode))]
+    result.nodes[0] += 1
+    for ply in range(1, split_depth + 1):
+        next_frontier = []
+        for prefix, engine in frontier:
+            for move in engine.legal_moves():
+                child = engine.copy()
+                _, game_over, winner = child.play(*move)
+                result.nodes[ply] += 1
+                if game_over:
+                    result.add_terminal(ply, winner)
+                else:
+                    next_frontier.append((prefix + [move], child))
+        frontier = next_frontier
+    return [prefix for prefix, _ in frontier]
+
+def perft(size: int, game_mode: str, depth: int, engine_class: Type[Engine] = ReferenceEngine,
+          workers: Optional[int] = None, split_depth: Optional[int] = None) -> PerftResult:
+    """Enumerate the game tree to depth plies.
+
+    With more than one worker the tree is split into subtrees a few plies
+    down, and a process pool hands them out one at a time, so workers that
+    finish small subtrees take the next one instead of idling.
+    """
+    depth = min(depth, size * size)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    result = PerftResult(depth)
+    if workers <= 1 or depth < 2:
+        _search(engine_class(size, game_mode), 0, depth, result)
+        return result
+
+    if split_depth is None:
+        # Enough subtrees per worker to balance uneven subtree sizes
+        split_depth, subtrees = 1, 2 * size * size
+        while split_depth < depth - 1 and subtrees < workers * 16:
+            split_depth += 1
+            subtrees *= 2 * (size * size - split_depth + 1)
+    split_depth = max(1, min(split_depth, depth - 1))
+
+    prefixes = _split(engine_class, size, game_mode, depth, split_depth, result)
+    tasks = [(engine_class, size, game_mode, prefix, depth) for prefix in prefixes]
+    with multiprocessing.Pool(workers) as pool:
+        for subtree_result in pool.imap_unordered(_search_subtree, tasks, chunksize=1):
+            result.merge(subtree_result)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Count SOS positions, terminals and outcomes to a given depth")
+    parser.add_argument("--size", type=int, default=3, help="Board size")
+    parser.add_argument("--mode", choices=("Simple", "General"), default="Simple", help="Game mode")
+    parser.add_argument("--depth", type=int, default=4, help="Plies to enumerate")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--split-depth", type=int, default=None, help="Ply at which the tree is split into tasks")
+    parser.add_argument("--engine", default="engine:ReferenceEngine", help="Engine class as module:Class")
+    args = parser.parse_args()
+
+    engine_class = load_engine(args.engine)
+    start = time.perf_counter()
+    result = perft(args.size, args.mode, args.depth, engine_class, args.workers, args.split_depth)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.size}x{args.size} {args.mode}, engine {engine_class.__name__}")
+    print(f"{'ply':>4} {'nodes':>14} {'terminals':>12}")
+    for ply in range(result.depth + 1):
+        print(f"{ply:>4} {result.nodes[ply]:>14} {result.terminals[ply]:>12}")
+    outcomes = result.outcomes
+    print(f"Outcomes: Blue {outcomes['Blue']}, Red {outcomes['Red']}, Draw {outcomes['Draw']}")
+    total = sum(result.nodes)
+    print(f"{total} nodes in {elapsed:.2f}s ({total / elapsed:,.0f} nodes/s)")
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,9 @@ if TYPE_CHECKING:
 
 class Player(ABC):
     """Abstract base class for all players (human and computer)"""
-    def __init__(self, symbol: str):
+    def __init__(self, symbol: str, rng: Optional[random.Random] = None):
         self.symbol = symbol  # 'Blue' or 'Red'
+        self.rng = rng  # Source of random choices; None uses the random module's
     
     @abstractmethod
     def make_move(self, board: 'GameBoard') -> Tuple[int, int, str]:
@@ -33,8 +34,9 @@ class SimpleComputerPlayer(Player):
                     valid_moves.append((row, col))
         
         # Make a random move
-        row, col = random.choice(valid_moves)
-        letter = random.choice(['S', 'O'])
+        rng = self.rng or random
+        row, col = rng.choice(valid_moves)
+        letter = rng.choice(['S', 'O'])
         return (row, col, letter)
 
 class AdvancedComputerPlayer(Player):
@@ -69,8 +71,9 @@ class AdvancedComputerPlayer(Player):
             return setup_move
             
         # Random move as last resort
-        row, col = random.choice(valid_moves)
-        letter = random.choice(['S', 'O'])
+        rng = self.rng or random
+        row, col = rng.choice(valid_moves)
+        letter = rng.choice(['S', 'O'])
         print(f"Making random move: {(row, col, letter)}")
         return (row, col, letter)
 
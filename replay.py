@@ -0,0 +1,243 @@
+"""Random-access replay positions and the cache of loaded replays.
+
+A ReplayTimeline is built once per loaded game. It keeps a snapshot of the
+board and scores every SNAPSHOT_INTERVAL moves, so the position after any
+move is rebuilt from the nearest earlier snapshot in at most that many
+moves instead of replaying the game from the start.
+
+A ReplayCache keeps recently used timelines within a memory budget and
+loads games in the background before they are opened. A GamePager serves
+the replay list a window of rows at a time from keyset-paginated queries.
+"""
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import threading
+
+from sos_game_logic import GameBoard
+from storage import GameRow, GameStorage
+
+SNAPSHOT_INTERVAL = 16
+REPLAY_CACHE_BYTES = 32 * 1024 * 1024
+LIST_PAGE_SIZE = 50
+LIST_MAX_PAGES = 8
+
+SosLine = Tuple[List[int], List[int], str]
+
+class ReplayPosition:
+    """The board, SOS lines and scores after a given number of moves"""
+    def __init__(self, move_index: int, board: GameBoard, sos_lines: List[SosLine],
+                 blue_score: int, red_score: int):
+        self.move_index = move_index
+        self.board = board
+        self.sos_lines = sos_lines
+        self.blue_score = blue_score
+        self.red_score = red_score
+
+class ReplayTimeline:
+    """Seekable positions of a stored game"""
+    def __init__(self, board_size: int, moves: List[Dict], sos_lines: List[Dict],
+                 snapshot_interval: int = SNAPSHOT_INTERVAL):
+        self.board_size = board_size
+        self.moves = moves
+        self.snapshot_interval = max(1, snapshot_interval)
+        self._lines = [(line['start_pos'], line['end_pos'], line['player']) for line in sos_lines]
+        # SOS lines are stored in move order, so the lines visible after a move are a prefix
+        self._line_moves = [line['move_number'] for line in sos_lines]
+
+        # Snapshot i holds (cells, blue score, red score) after i * snapshot_interval moves
+        board = GameBoard(board_size)
+        self._snapshots = [self._snapshot(board, 0)]
+        for index, move in enumerate(moves, start=1):
+            board.make_move(move['row'], move['col'], move['letter'])
+            if index % self.snapshot_interval == 0:
+                self._snapshots.append(self._snapshot(board, index))
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def memory_estimate(self) -> int:
+        """Rough number of bytes the timeline keeps alive"""
+        # A move or line dict with its small values is a few hundred bytes; a
+        # snapshot cell is one tuple slot pointing at a shared string
+        return (300 * (len(self.moves) + len(self._lines))
+                + len(self._snapshots) * (64 + 8 * self.board_size * (self.board_size + 1)))
+
+    def _visible_lines(self, move_index: int) -> int:
+        return bisect_right(self._line_moves, move_index)
+
+    def _snapshot(self, board: GameBoard, move_index: int) -> Tuple[Tuple[Tuple[str, ...], ...], int, int]:
+        lines = self._lines[:self._visible_lines(move_index)]
+        blue_score = sum(1 for _, _, player in lines if player == 'Blue')
+        return tuple(tuple(row) for row in board.board), blue_score, len(lines) - blue_score
+
+    def position(self, move_index: int) -> ReplayPosition:
+        """Get the position after move_index moves (0 is the empty board), clamped to the game"""
+        move_index = max(0, min(move_index, len(self.moves)))
+        snapshot_index = move_index // self.snapshot_interval
+        cells, blue_score, red_score = self._snapshots[snapshot_index]
+
+        board = GameBoard(self.board_size)
+        board.board = [list(row) for row in cells]
+        start = snapshot_index * self.snapshot_interval
+        for move in self.moves[start:move_index]:
+            board.make_move(move['row'], move['col'], move['letter'])
+
+        first_line = self._visible_lines(start)
+        visible = self._visible_lines(move_index)
+        for _, _, player in self._lines[first_line:visible]:
+            if player == 'Blue':
+                blue_score += 1
+            else:
+                red_score += 1
+        board.blue_score = blue_score
+        board.red_score = red_score
+        return ReplayPosition(move_index, board, self._lines[:visible], blue_score, red_score)
+
+class ReplayCache:
+    """LRU cache of ReplayTimelines with background prefetch.
+
+    Timelines are evicted least recently used first once their estimated
+    size passes max_bytes. prefetch queues games on a single loader thread;
+    get returns a cached timeline, waits for one already loading, or loads
+    it on the spot.
+    """
+    def __init__(self, db: GameStorage, max_bytes: int = REPLAY_CACHE_BYTES):
+        self.db = db
+        self.max_bytes = max_bytes
+        self._timelines: 'OrderedDict[int, ReplayTimeline]' = OrderedDict()
+        self._sizes: Dict[int, int] = {}
+        self._bytes = 0
+        self._loading: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sos-replay-prefetch")
+
+    def __contains__(self, game_id: int) -> bool:
+        with self._lock:
+            return game_id in self._timelines
+
+    def _load(self, game_id: int, board_size: int) -> ReplayTimeline:
+        try:
+            moves, sos_lines = self.db.get_game_replay(game_id)
+            timeline = ReplayTimeline(board_size, moves, sos_lines)
+        except Exception:
+            with self._lock:
+                self._loading.pop(game_id, None)
+            raise
+        with self._lock:
+            self._loading.pop(game_id, None)
+            self._store(game_id, timeline)
+        return timeline
+
+    def _store(self, game_id: int, timeline: ReplayTimeline):
+        if game_id in self._timelines:
+            self._bytes -= self._sizes[game_id]
+        self._timelines[game_id] = timeline
+        self._timelines.move_to_end(game_id)
+        self._sizes[game_id] = timeline.memory_estimate()
+        self._bytes += self._sizes[game_id]
+        # Always keep the newest entry, even when it alone is over budget
+        while self._bytes > self.max_bytes and len(self._timelines) > 1:
+            evicted, _ = self._timelines.popitem(last=False)
+            self._bytes -= self._sizes.pop(evicted)
+
+    def get(self, game: Dict) -> ReplayTimeline:
+        """Get the timeline of a game row (with game_id and board_size)"""
+        game_id = game['game_id']
+        with self._lock:
+            timeline = self._timelines.get(game_id)
+            if timeline is not None:
+                self._timelines.move_to_end(game_id)
+                return timeline
+            future = self._loading.get(game_id)
+        # A prefetch still queued behind others is taken over rather than waited for
+        if future is not None and not future.cancel():
+            return future.result()  # Already loading, so nearly done
+        return self._load(game_id, game['board_size'])
+
+    def prefetch(self, games: Iterable[Dict]):
+        """Load games in the background, most important first"""
+        with self._lock:
+            for game in games:
+                game_id = game['game_id']
+                if game_id in self._timelines or game_id in self._loading:
+                    continue
+                future = self._loader.submit(self._load, game_id, game['board_size'])
+                future.add_done_callback(self._log_failure)
+                self._loading[game_id] = future
+
+    def _log_failure(self, future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"Failed to prefetch replay: {future.exception()}")
+
+    def discard(self, game_id: int):
+        """Forget a game, e.g. because it was still being played when it was loaded"""
+        with self._lock:
+            if game_id in self._timelines:
+                del self._timelines[game_id]
+                self._bytes -= self._sizes.pop(game_id)
+
+    def close(self):
+        """Stop the loader, dropping prefetches that have not started"""
+        self._loader.shutdown(wait=False, cancel_futures=True)
+
+class GamePager:
+    """Random access to the filtered game history, loaded a page at a time.
+
+    Pages come from query_games keyed on the last row of the page before, so
+    a page deep in the history costs the same query as the first. Only the
+    keys of pages already reached and the rows of the last max_pages pages
+    used are kept, so memory does not grow with the size of the history.
+    """
+    def __init__(self, db: GameStorage, page_size: int = LIST_PAGE_SIZE,
+                 max_pages: int = LIST_MAX_PAGES, filters: Optional[Dict[str, Any]] = None):
+        self.db = db
+        self.page_size = page_size
+        self.max_pages = max(1, max_pages)
+        self.filters = filters or {}
+        self.reset()
+
+    def reset(self, filters: Optional[Dict[str, Any]] = None):
+        """Forget every loaded page, optionally switching to new query_games filters"""
+        if filters is not None:
+            self.filters = filters
+        # _keys[i] is the after key that fetches page i
+        self._keys: List[Optional[Tuple[str, int]]] = [None]
+        self._pages: 'OrderedDict[int, List[GameRow]]' = OrderedDict()
+        self.total: Optional[int] = None  # Known once the last page has been read
+
+    def _page(self, index: int) -> List[GameRow]:
+        page = self._pages.get(index)
+        if page is not None:
+            self._pages.move_to_end(index)
+            return page
+        # Pages are only reachable through the key of the page before them
+        while len(self._keys) <= index:
+            if self.total is not None or not self._page(len(self._keys) - 1):
+                return []  # Past the end of the history
+        page = [row for row in self.db.query_games(limit=self.page_size, after=self._keys[index],
+                                                   row_format="namedtuple", **self.filters)]
+        if len(page) < self.page_size:
+            self.total = index * self.page_size + len(page)
+        elif len(self._keys) == index + 1:
+            self._keys.append((page[-1].timestamp, page[-1].game_id))
+        self._pages[index] = page
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def rows(self, start: int, count: int) -> List[GameRow]:
+        """Get up to count rows from position start, newest game first"""
+        rows: List[GameRow] = []
+        position = max(0, start)
+        while len(rows) < count:
+            index, offset = divmod(position, self.page_size)
+            page = self._page(index)
+            chunk = page[offset:offset + count - len(rows)]
+            if not chunk:
+                break
+            rows += chunk
+            position += len(chunk)
+        return rows
@@ -0,0 +1,58 @@
+"""Retention for the game database.
+
+Keeps the newest games, or the games of the last few days, in full detail.
+Older finished games are optionally written to an archive, then deleted;
+their results stay in the statistics summary. Work is done in small
+batches, each its own short transaction, so games being played against the
+same database only ever wait for one batch.
+
+    python db_admin.py retain --keep-games 100000 --archive old_games.jsonl.gz
+"""
+from typing import Optional
+import logging
+import time
+
+from archive import ArchiveWriter
+from database import GameDatabase
+
+class RetentionReport:
+    """Outcome of a retention run"""
+    def __init__(self, retired: int, archived: int, vacuumed: bool, elapsed: float):
+        self.retired = retired
+        self.archived = archived
+        self.vacuumed = vacuumed
+        self.elapsed = elapsed
+
+def apply_retention(db: GameDatabase, keep_games: Optional[int] = None, keep_days: Optional[float] = None,
+                    archive_path: Optional[str] = None, batch_size: int = 500, pause: float = 0.0,
+                    vacuum: bool = True) -> RetentionReport:
+    """Retire finished games outside the retention limits, batch by batch.
+
+    With archive_path, each batch is written to the archive before it is
+    deleted. pause sleeps between batches to leave the write lock free for
+    active games. Finally the freed pages are returned with an incremental
+    vacuum.
+    """
+    start = time.perf_counter()
+    retired = 0
+    archive = ArchiveWriter(archive_path) if archive_path else None
+    try:
+        while True:
+            game_ids = db.expired_game_ids(keep_games, keep_days, batch_size)
+            if not game_ids:
+                break
+            if archive is not None:
+                for game, moves, sos_lines in db.get_game_records(game_ids):
+                    archive.write(game, moves, sos_lines)
+                # Never delete a game before its archived copy has left the process
+                archive.flush()
+            retired += db.retire_games(game_ids)
+            logging.info(f"Retired {retired} games so far")
+            if pause:
+                time.sleep(pause)
+    finally:
+        if archive is not None:
+            archive.close()
+    vacuumed = db.incremental_vacuum() if vacuum else False
+    return RetentionReport(retired, archive.count if archive is not None else 0, vacuumed,
+                           time.perf_counter() - start)
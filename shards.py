@@ -0,0 +1,187 @@
+"""Sharded game storage for many writer processes.
+
+Each worker writes to its own shard file in a shared directory, so workers
+never wait on each other's SQLite write lock. Every shard hands out game IDs
+from its own range (shard * SHARD_ID_SPAN upwards, seeded in
+sqlite_sequence), which keeps IDs unique across shards and lets a reader
+find a game's shard from its ID alone. A ShardedDatabase opened without a
+shard number reads across every shard in the directory.
+
+    db = ShardedDatabase("games/", shard=worker_index)   # in each worker
+    db = ShardedDatabase("games/")                        # to read them all
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import glob
+import heapq
+import itertools
+import os
+import re
+import threading
+
+from database import GameDatabase
+from storage import GAME_COLUMNS, GameStorage, format_game_rows
+
+SHARD_ID_SPAN = 1 << 32
+
+_SHARD_FILE = re.compile(r'shard-(\d+)\.db$')
+
+def shard_path(directory: str, shard: int) -> str:
+    """Get the file of a shard"""
+    return os.path.join(directory, f"shard-{shard:04d}.db")
+
+def shard_of(game_id: int) -> int:
+    """Get the shard a game ID was handed out by"""
+    return game_id // SHARD_ID_SPAN
+
+class ShardedDatabase(GameStorage):
+    """Game storage split across one SQLite file per writer"""
+    def __init__(self, directory: str, shard: Optional[int] = None, compact: bool = False):
+        if shard is not None and not 0 <= shard < (1 << 30):
+            raise ValueError(f"Shard number out of range: {shard}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard = shard
+        self.compact = compact
+        self._shards: Dict[int, GameDatabase] = {}
+        self._lock = threading.Lock()
+        if shard is not None:
+            self._open_shard(shard, create=True)
+
+    def _open_shard(self, shard: int, create: bool = False) -> Optional[GameDatabase]:
+        with self._lock:
+            db = self._shards.get(shard)
+            if db is not None:
+                return db
+            path = shard_path(self.directory, shard)
+            if not create and not os.path.exists(path):
+                return None
+            db = GameDatabase(path, compact=self.compact)
+            with db.transaction(immediate=True) as cursor:
+                # AUTOINCREMENT continues from sqlite_sequence, so seed it at the shard's range
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'games'")
+                if cursor.fetchone() is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('games', ?)",
+                                   (shard * SHARD_ID_SPAN,))
+            self._shards[shard] = db
+            return db
+
+    def shards(self) -> List[GameDatabase]:
+        """Open every shard in the directory, including ones other workers created since, in shard order"""
+        for path in glob.glob(os.path.join(self.directory, "shard-*.db")):
+            match = _SHARD_FILE.search(path)
+            if match:
+                self._open_shard(int(match.group(1)))
+        with self._lock:
+            return [self._shards[shard] for shard in sorted(self._shards)]
+
+    @property
+    def writer(self) -> GameDatabase:
+        """This worker's own shard"""
+        if self.shard is None:
+            raise ValueError("Open the ShardedDatabase with a shard number to write games")
+        return self._shards[self.shard]
+
+    def _game_shard(self, game_id: int) -> Optional[GameDatabase]:
+        return self._open_shard(shard_of(game_id))
+
+    def _writable_shard(self, game_id: int) -> GameDatabase:
+        db = self._game_shard(game_id)
+        if db is None:
+            raise ValueError(f"Game {game_id} belongs to shard {shard_of(game_id)}, which does not exist")
+        return db
+
+    def start_new_game(self, board_size: int, game_mode: str,
+                       blue_player_type: str, red_player_type: str) -> int:
+        return self.writer.start_new_game(board_size, game_mode, blue_player_type, red_player_type)
+
+    def start_new_games(self, count: int, board_size: int, game_mode: str,
+                        blue_player_type: str, red_player_type: str) -> List[int]:
+        return self.writer.start_new_games(count, board_size, game_mode, blue_player_type, red_player_type)
+
+    def save_move(self, game_id: int, player: str, row: int, col: int,
+                  letter: str, move_number: int):
+        self._writable_shard(game_id).save_move(game_id, player, row, col, letter, move_number)
+
+    def save_sos_line(self, game_id: int, move_number: int, start_pos: List[int],
+                      end_pos: List[int], player: str):
+        self._writable_shard(game_id).save_sos_line(game_id, move_number, start_pos, end_pos, player)
+
+    def end_game(self, game_id: int, winner: str, blue_score: int, red_score: int):
+        self._writable_shard(game_id).end_game(game_id, winner, blue_score, red_score)
+
+    def get_game_moves(self, game_id: int) -> List[Dict]:
+        db = self._game_shard(game_id)
+        return db.get_game_moves(game_id) if db is not None else []
+
+    def get_game_sos_lines(self, game_id: int) -> List[Dict]:
+        db = self._game_shard(game_id)
+        return db.get_game_sos_lines(game_id) if db is not None else []
+
+    def get_game_replay(self, game_id: int) -> Tuple[List[Dict], List[Dict]]:
+        db = self._game_shard(game_id)
+        return db.get_game_replay(game_id) if db is not None else ([], [])
+
+    def save_move_annotations(self, game_id: int, annotations: List[Dict]):
+        self._writable_shard(game_id).save_move_annotations(game_id, annotations)
+
+    def get_move_annotations(self, game_id: int) -> Optional[List[Dict]]:
+        db = self._game_shard(game_id)
+        return db.get_move_annotations(game_id) if db is not None else None
+
+    def get_recent_games(self, limit: int = 10) -> List[Dict]:
+        return self.query_games(limit=limit)
+
+    def query_games(self, limit: int = 50, row_format: str = "dict", **filters) -> List[Any]:
+        """Get one page of games across all shards; takes the same arguments as GameDatabase.query_games.
+
+        Each shard returns its own first page after the same key, and the
+        pages are merged newest first, so a page costs one indexed query per shard.
+        """
+        format_game_rows([], row_format)  # Reject an unknown format before querying
+        pages = [db.query_games(limit=limit, row_format="tuple", **filters) for db in self.shards()]
+        timestamp = GAME_COLUMNS.index('timestamp')
+        merged = heapq.merge(*pages, key=lambda row: (row[timestamp], row[0]), reverse=True)
+        return format_game_rows(list(itertools.islice(merged, limit)), row_format)
+
+    def get_stats(self, group_by: Sequence[str] = (), **filters) -> List[Dict]:
+        """Get statistics summed across shards; takes the same arguments as GameDatabase.get_stats"""
+        totals: Dict[Tuple, Dict] = {}
+        for db in self.shards():
+            for row in db.get_stats(group_by, **filters):
+                key = tuple(row[column] for column in group_by)
+                if key not in totals:
+                    totals[key] = row
+                else:
+                    for name, value in row.items():
+                        if name not in group_by:
+                            totals[key][name] += value
+        if not totals and not group_by:
+            return [dict.fromkeys(('games', 'blue_wins', 'red_wins', 'draws', 'blue_score', 'red_score'), 0)]
+        return [totals[key] for key in sorted(totals)]
+
+    def rebuild_stats(self):
+        """Recount the statistics summary of every shard"""
+        for db in self.shards():
+            db.rebuild_stats()
+
+    def iter_games_with_moves(self, board_size: Optional[int] = None,
+                              chunk_size: int = 1000) -> Iterator[Tuple[Dict, List[Tuple[int, int, str]]]]:
+        """Stream every game with its moves, one shard after another"""
+        for db in self.shards():
+            yield from db.iter_games_with_moves(board_size, chunk_size)
+
+    def iter_game_records(self, chunk_size: int = 500) -> Iterator[Tuple[Dict, List[Dict], List[Dict]]]:
+        """Stream every game record in game ID order, one shard after another"""
+        for db in self.shards():
+            yield from db.iter_game_records(chunk_size)
+
+    def flush(self):
+        for db in self.shards():
+            db.flush()
+
+    def close(self):
+        with self._lock:
+            shards = list(self._shards.values())
+            self._shards.clear()
+        for db in shards:
+            db.close()
@@ -1,8 +1,63 @@
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
+from concurrent.futures import Executor, Future, wait
 from player import Player, HumanPlayer, SimpleComputerPlayer, AdvancedComputerPlayer
-import pygame
-from database import GameDatabase
+from storage import GameStorage
 import logging
+import random
+import time
+from functools import lru_cache
+
+COMPUTER_MOVE_DELAY = 500  # Milliseconds a computer player waits before moving
+
+def get_ticks() -> int:
+    """Get milliseconds on a monotonic clock, for timing computer moves without pygame"""
+    return time.monotonic_ns() // 1_000_000
+
+# Offsets of the other two cells of an S-O-S line, relative to a placed letter
+S_PATTERNS = [
+    [(0, 1), (0, 2)],    # Horizontal right
+    [(0, -1), (0, -2)],  # Horizontal left
+    [(1, 0), (2, 0)],    # Vertical down
+    [(-1, 0), (-2, 0)],  # Vertical up
+    [(1, 1), (2, 2)],    # Diagonal down-right
+    [(-1, -1), (-2, -2)], # Diagonal up-left
+    [(1, -1), (2, -2)],  # Diagonal down-left
+    [(-1, 1), (-2, 2)]   # Diagonal up-right
+]
+O_PATTERNS = [
+    [(-1, 0), (1, 0)],   # Vertical
+    [(0, -1), (0, 1)],   # Horizontal
+    [(-1, -1), (1, 1)],  # Diagonal \
+    [(-1, 1), (1, -1)]   # Diagonal /
+]
+
+@lru_cache(maxsize=None)
+def sos_patterns(size: int) -> Tuple:
+    """Precompute, for every cell of a board size, the in-bounds SOS patterns.
+
+    Each cell maps to a pair (s_patterns, o_patterns) of (r1, c1, r2, c2)
+    tuples, in the same order as S_PATTERNS and O_PATTERNS. The table is
+    shared by every board of the same size.
+    """
+    def in_bounds(r, c):
+        return 0 <= r < size and 0 <= c < size
+
+    table = []
+    for row in range(size):
+        cells = []
+        for col in range(size):
+            per_letter = []
+            for patterns in (S_PATTERNS, O_PATTERNS):
+                cell_patterns = []
+                for (dr1, dc1), (dr2, dc2) in patterns:
+                    r1, c1 = row + dr1, col + dc1
+                    r2, c2 = row + dr2, col + dc2
+                    if in_bounds(r1, c1) and in_bounds(r2, c2):
+                        cell_patterns.append((r1, c1, r2, c2))
+                per_letter.append(tuple(cell_patterns))
+            cells.append(tuple(per_letter))
+        table.append(tuple(cells))
+    return tuple(table)
 
 class GameBoard:
     def __init__(self, size):
@@ -61,45 +116,19 @@ class GameBoard:
             return False
 
         found_sos = False
+        s_patterns, o_patterns = sos_patterns(self.size)[row][col]
 
-        # Define all possible SOS patterns
         if letter == 'S':
             # Check for S-O-S patterns starting with this S
-            patterns = [
-                [(0, 1), (0, 2)],    # Horizontal right
-                [(0, -1), (0, -2)],  # Horizontal left
-                [(1, 0), (2, 0)],    # Vertical down
-                [(-1, 0), (-2, 0)],  # Vertical up
-                [(1, 1), (2, 2)],    # Diagonal down-right
-                [(-1, -1), (-2, -2)], # Diagonal up-left
-                [(1, -1), (2, -2)],  # Diagonal down-left
-                [(-1, 1), (-2, 2)]   # Diagonal up-right
-            ]
-            for pattern in patterns:
-                (dr1, dc1), (dr2, dc2) = pattern
-                r1, c1 = row + dr1, col + dc1
-                r2, c2 = row + dr2, col + dc2
-                if (0 <= r1 < self.size and 0 <= c1 < self.size and
-                    0 <= r2 < self.size and 0 <= c2 < self.size and
-                    self.board[r1][c1] == 'O' and self.board[r2][c2] == 'S'):
+            for r1, c1, r2, c2 in s_patterns:
+                if self.board[r1][c1] == 'O' and self.board[r2][c2] == 'S':
                     self.add_sos_line([row, col], [r2, c2])
                     found_sos = True
 
         elif letter == 'O':
             # Check for S-O-S patterns with this O in the middle
-            patterns = [
-                [(-1, 0), (1, 0)],   # Vertical
-                [(0, -1), (0, 1)],   # Horizontal
-                [(-1, -1), (1, 1)],  # Diagonal \
-                [(-1, 1), (1, -1)]   # Diagonal /
-            ]
-            for pattern in patterns:
-                (dr1, dc1), (dr2, dc2) = pattern
-                r1, c1 = row + dr1, col + dc1
-                r2, c2 = row + dr2, col + dc2
-                if (0 <= r1 < self.size and 0 <= c1 < self.size and
-                    0 <= r2 < self.size and 0 <= c2 < self.size and
-                    self.board[r1][c1] == 'S' and self.board[r2][c2] == 'S'):
+            for r1, c1, r2, c2 in o_patterns:
+                if self.board[r1][c1] == 'S' and self.board[r2][c2] == 'S':
                     self.add_sos_line([r1, c1], [r2, c2])
                     found_sos = True
 
@@ -128,22 +157,84 @@ class GameBoard:
             else:
                 self.red_score += 1
 
+def create_player(symbol: str, player_type: str, rng: Optional[random.Random] = None) -> Player:
+    """Create appropriate player based on type, drawing random moves from rng if given"""
+    if player_type.lower() == "human":
+        return HumanPlayer(symbol)
+    elif player_type.lower() == "simple_computer":
+        return SimpleComputerPlayer(symbol, rng)
+    elif player_type.lower() == "smart_computer":
+        return AdvancedComputerPlayer(symbol, rng)
+    else:
+        raise ValueError(f"Invalid player type: {player_type}")
+
+def resolve_turn(board: GameBoard, game_mode: str, sos_formed: bool) -> Tuple[bool, Optional[str]]:
+    """Apply the end-of-move rules to a board and return (game_over, winner).
+
+    A Simple game ends on the first SOS. Otherwise the game ends when the
+    board is full, and a General game is won on score. The turn passes unless
+    an SOS was formed in a Simple game.
+    """
+    game_over = False
+    winner = None
+    if game_mode == "Simple" and sos_formed:
+        game_over = True
+        winner = board.current_player
+    elif board.is_full():
+        game_over = True
+        if game_mode == "General":
+            if board.blue_score > board.red_score:
+                winner = 'Blue'
+            elif board.red_score > board.blue_score:
+                winner = 'Red'
+            else:
+                winner = 'Draw'
+
+    # Switch player if no SOS was formed OR if in General mode
+    # This ensures the game continues in General mode even after an SOS is formed
+    if not sos_formed or game_mode == "General":
+        board.switch_player()
+    return game_over, winner
+
+def play_move(board: GameBoard, game_mode: str, row: int, col: int, letter: str) -> Tuple[bool, bool, Optional[str]]:
+    """Play a move with the full game rules but no persistence.
+
+    Returns (sos_formed, game_over, winner). Raises ValueError for an invalid move.
+    """
+    if not board.make_move(row, col, letter):
+        raise ValueError(f"Invalid move: {letter} at ({row}, {col})")
+    sos_formed = board.check_sos(row, col)
+    game_over, winner = resolve_turn(board, game_mode, sos_formed)
+    return sos_formed, game_over, winner
+
 class GameLogic:
-    def __init__(self, size: int, game_mode: str, blue_player_type: str = "human", red_player_type: str = "human"):
+    def __init__(self, size: int, game_mode: str, blue_player_type: str = "human", red_player_type: str = "human",
+                 db: Union[GameStorage, str, None] = None, game_id: Optional[int] = None,
+                 players: Optional[Dict[str, Player]] = None, move_delay: int = COMPUTER_MOVE_DELAY):
         self.board = GameBoard(size)
         self.game_mode = game_mode
         self.game_over = False
         self.winner = None
         self.computer_move_timer = None
         self.pending_computer_move = False
-        self.db = GameDatabase()
-        self.game_id = self.db.start_new_game(size, game_mode, blue_player_type, red_player_type)
+        self.move_delay = move_delay  # Milliseconds computer players wait, 0 to move at once
+        self._move_future: Optional[Future] = None  # A computer move being chosen in an executor
+        # Games share one storage per spec ("null", "memory", a path, ...) unless the caller brings its own
+        if isinstance(db, GameStorage):
+            self.db = db
+        else:
+            from database import default_database  # Only once a game needs it, so importing stays cheap
+            self.db = default_database(db or "sos_game.db")
+        # A caller creating games in bulk may have reserved the ID already
+        if game_id is None:
+            game_id = self.db.start_new_game(size, game_mode, blue_player_type, red_player_type)
+        self.game_id = game_id
         logging.info(f"Started new game with ID: {self.game_id}")
         self.move_count = 0
         self.stopped = False  # Add this flag to control game state
         
-        # Initialize players
-        self.players = {
+        # Initialize players (players are stateless, so they may be shared between games)
+        self.players = players if players is not None else {
             'Blue': self._create_player('Blue', blue_player_type),
             'Red': self._create_player('Red', red_player_type)
         }
@@ -151,22 +242,16 @@ class GameLogic:
         # Add this line to track if both players are AI
         self.is_ai_vs_ai = (blue_player_type != "human" and red_player_type != "human")
         
-        # If it's AI vs AI and Blue is AI, schedule first move
+        # If Blue is a computer, schedule the first move
         if self.is_ai_vs_ai:
             logging.info("Starting AI vs AI game")
+        if self.is_computer_turn():
             self.pending_computer_move = True
-            self.computer_move_timer = pygame.time.get_ticks()
+            self.computer_move_timer = get_ticks()
 
     def _create_player(self, symbol: str, player_type: str) -> Player:
         """Create appropriate player based on type"""
-        if player_type.lower() == "human":
-            return HumanPlayer(symbol)
-        elif player_type.lower() == "simple_computer":
-            return SimpleComputerPlayer(symbol)
-        elif player_type.lower() == "smart_computer":
-            return AdvancedComputerPlayer(symbol)
-        else:
-            raise ValueError(f"Invalid player type: {player_type}")
+        return create_player(symbol, player_type)
 
     def make_move(self, row: int, col: int, letter: str) -> bool:
         """Make a move and handle game logic"""
@@ -217,32 +302,65 @@ class GameLogic:
         if isinstance(self.players[next_player], (SimpleComputerPlayer, AdvancedComputerPlayer)):
             logging.info(f"Scheduling computer move for {next_player}")
             self.pending_computer_move = True
-            self.computer_move_timer = pygame.time.get_ticks()
+            self.computer_move_timer = get_ticks()
+        else:
+            self.pending_computer_move = False
 
         return True
 
-    def update(self):
-        """Update game state - call this in your game loop"""
+    def update(self, time_budget: int = 0, executor: Optional[Executor] = None) -> int:
+        """Update game state - call this in your game loop.
+
+        Plays the computer move that is due, if any. Given a time_budget in
+        milliseconds, keeps playing due moves until the budget is spent, so
+        with no move delay a computer-only game runs many moves per call.
+        With an executor, moves are chosen there on a copy of the board and
+        update waits for one only until the budget is spent; a move still
+        being chosen is played by a later call. Returns the number of moves played.
+        """
         if self.game_over or self.stopped:
-            return
+            return 0
 
-        current_time = pygame.time.get_ticks()
-        if self.pending_computer_move and current_time - self.computer_move_timer >= 500:
-            if not self.board.is_full():
-                self._make_computer_move()
-            else:
+        deadline = time.perf_counter() + time_budget / 1000
+        played = 0
+        while self.pending_computer_move and self.computer_move_due_in() == 0:
+            if self.board.is_full():
                 self.game_over = True
                 self._determine_winner()
                 self.pending_computer_move = False
+                break
+            move_count = self.move_count
+            if executor is None:
+                self._make_computer_move()
+            else:
+                if self._move_future is None:
+                    computer = self.players[self.board.current_player]
+                    self._move_future = executor.submit(computer.make_move, self.board.copy())
+                if not wait([self._move_future], max(0, deadline - time.perf_counter())).done:
+                    break  # Still thinking; the next call picks it up
+                chosen, self._move_future = self._move_future, None
+                self._make_computer_move(chosen)
+            if self.move_count == move_count:
+                break  # The move failed and was logged
+            played += 1
+            if time.perf_counter() >= deadline:
+                break
+        return played
+
+    def computer_move_due_in(self) -> Optional[int]:
+        """Get the milliseconds until update plays the pending computer move, or None if none is pending"""
+        if self.game_over or self.stopped or not self.pending_computer_move:
+            return None
+        return max(0, self.move_delay - (get_ticks() - self.computer_move_timer))
 
     def _process_move(self, row: int, col: int):
         """Process a move and update game state"""
+        previous_lines_count = len(self.board.sos_lines)
         sos_formed = self.board.check_sos(row, col)
         
         # Save any new SOS lines to the database
-        current_lines_count = len(self.board.sos_lines)
-        if current_lines_count > 0:
-            for line in self.board.sos_lines[-1:]:  # Only process new lines
+        if len(self.board.sos_lines) > previous_lines_count:
+            for line in self.board.sos_lines[previous_lines_count:]:  # Only process new lines
                 start_pos, end_pos, player = line
                 try:
                     self.db.save_sos_line(
@@ -256,27 +374,14 @@ class GameLogic:
                 except Exception as e:
                     logging.error(f"Failed to save SOS line: {e}")
 
-        # Handle game over conditions
-        if self.game_mode == "Simple" and sos_formed:
-            self.game_over = True
-            self.winner = self.board.current_player
-        elif self.board.is_full():
+        # Handle game over conditions and pass the turn
+        game_over, winner = resolve_turn(self.board, self.game_mode, sos_formed)
+        if game_over:
             self.game_over = True
-            if self.game_mode == "General":
-                if self.board.blue_score > self.board.red_score:
-                    self.winner = 'Blue'
-                elif self.board.red_score > self.board.blue_score:
-                    self.winner = 'Red'
-                else:
-                    self.winner = 'Draw'
-
-        # Switch player if no SOS was formed OR if in General mode
-        # This ensures the game continues in General mode even after an SOS is formed
-        if not sos_formed or self.game_mode == "General":
-            self.board.switch_player()
-
-    def _make_computer_move(self):
-        """Handle computer move"""
+            self.winner = winner
+
+    def _make_computer_move(self, chosen: Optional[Future] = None):
+        """Handle computer move, choosing it here unless it was chosen in an executor"""
         if self.game_over:
             self.pending_computer_move = False
             return
@@ -293,7 +398,7 @@ class GameLogic:
                 return
 
             # Get the computer's move
-            move = computer.make_move(self.board)
+            move = chosen.result() if chosen is not None else computer.make_move(self.board)
             if move is None:
                 logging.error(f"Computer player {current_player} returned None for move")
                 self.pending_computer_move = False
@@ -345,6 +450,10 @@ class GameLogic:
         """Get the current player"""
         return self.board.current_player
 
+    def is_computer_turn(self) -> bool:
+        """Check if the current player is a computer"""
+        return not isinstance(self.players[self.board.current_player], HumanPlayer)
+
     def is_game_over(self) -> bool:
         """Check if the game is over"""
         return self.game_over
@@ -372,15 +481,23 @@ class GameLogic:
         self.move_count = 0
         self.stopped = False  # Reset stopped flag
         
-        # If it's AI vs AI, schedule first move
-        if self.is_ai_vs_ai:
-            logging.info("Starting new AI vs AI game")
+        # If Blue is a computer, schedule the first move
+        if self.is_computer_turn():
+            logging.info("Starting new game with a computer move")
             self.pending_computer_move = True
-            self.computer_move_timer = pygame.time.get_ticks()
+            self.computer_move_timer = get_ticks()
 
     def stop(self):
         """Stop the game completely"""
         self.stopped = True
         self.game_over = True
         self.pending_computer_move = False
+        if self._move_future is not None:
+            self._move_future.cancel()
+            self._move_future = None
+        # Make sure every queued write for this game reaches the disk
+        try:
+            self.db.flush()
+        except Exception as e:
+            logging.error(f"Failed to flush game writes: {e}")
         logging.info("Game stopped")
@@ -1,15 +1,17 @@
 import pygame
 import sys
-from sos_game_logic import GameLogic, GameBoard
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from sos_game_logic import COMPUTER_MOVE_DELAY, GameLogic, GameBoard
 from typing import Optional, List, Dict, Tuple
-from database import GameDatabase
+from database import default_database
+from storage import GameStorage
+from replay import GamePager, ReplayCache, ReplayTimeline
+from analysis import GameAnalyzer
+from text_cache import render_text
+from viewport import ZOOM_STEP, BoardViewport
 import logging
 
-pygame.init()
-
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 # Colors
 BACKGROUND = (24, 24, 27)  # zinc-900
 TEXT = (161, 161, 170)  # zinc-400
@@ -19,15 +21,30 @@ LINE = (113, 113, 122)  # zinc-500
 BOARD_BG = (39, 39, 42)  # zinc-800
 TITLE_COLOR = (244, 244, 245)  # zinc-100
 
-# Screen setup
+# Screen setup; the window opens when main starts, not on import
 WIDTH, HEIGHT = 900, 700
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("SOS Game")
+screen: Optional[pygame.Surface] = None
+
+def init_display() -> pygame.Surface:
+    """Start pygame and open the window"""
+    global screen
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("SOS Game")
+    return screen
+
+# Fonts, loaded on first use
+@lru_cache(maxsize=1)
+def font() -> pygame.font.Font:
+    return pygame.font.Font(None, 32)
+
+@lru_cache(maxsize=1)
+def small_font() -> pygame.font.Font:
+    return pygame.font.Font(None, 24)
 
-# Fonts
-font = pygame.font.Font(None, 32)
-small_font = pygame.font.Font(None, 24)
-title_font = pygame.font.Font(None, 64)
+@lru_cache(maxsize=1)
+def title_font() -> pygame.font.Font:
+    return pygame.font.Font(None, 64)
 
 class Button:
     def __init__(self, x, y, width, height, text, action):
@@ -40,7 +57,7 @@ class Button:
         color = BUTTON_HOVER if self.hovered else BUTTON
         pygame.draw.rect(screen, color, self.rect, border_radius=15)
         pygame.draw.rect(screen, TEXT, self.rect, border_radius=15, width=2)
-        text_surf = font.render(self.text, True, (255, 255, 255))
+        text_surf = render_text(font(), self.text, (255, 255, 255))
         text_rect = text_surf.get_rect(center=self.rect.center)
         screen.blit(text_surf, text_rect)
 
@@ -61,7 +78,7 @@ class Checkbox:
         pygame.draw.rect(screen, TEXT, self.rect, 2, border_radius=5)
         if self.checked:
             pygame.draw.rect(screen, TEXT, self.rect.inflate(-8, -8), border_radius=3)
-        text_surf = small_font.render(self.text, True, TEXT)
+        text_surf = render_text(small_font(), self.text, TEXT)
         screen.blit(text_surf, (self.rect.right + 10, self.rect.centery - text_surf.get_height() // 2))
 
     def handle_event(self, event):
@@ -70,9 +87,10 @@ class Checkbox:
                 self.checked = not self.checked
 
 class RadioButton:
-    def __init__(self, x, y, text, group):
+    def __init__(self, x, y, text, group, value=None):
         self.rect = pygame.Rect(x, y, 24, 24)
         self.text = text
+        self.value = value if value is not None else text  # What choosing this button means
         self.group = group
         self.selected = False
 
@@ -80,7 +98,7 @@ class RadioButton:
         pygame.draw.circle(screen, TEXT, self.rect.center, 12, 2)
         if self.selected:
             pygame.draw.circle(screen, TEXT, self.rect.center, 8)
-        text_surf = small_font.render(self.text, True, TEXT)
+        text_surf = render_text(small_font(), self.text, TEXT)
         screen.blit(text_surf, (self.rect.right + 10, self.rect.centery - text_surf.get_height() // 2))
 
     def handle_event(self, event):
@@ -101,6 +119,10 @@ class RadioGroup:
         for button in self.buttons:
             button.selected = (button == selected)
 
+# Computer move pacing: the delay before each computer move, in milliseconds.
+# Turbo plays as many moves as fit in AI_FRAME_BUDGET each frame.
+AI_PACES = (("Real-time", COMPUTER_MOVE_DELAY), ("Fast", 100), ("Turbo", 0))
+
 class AIControls:
     def __init__(self):
         self.enabled = Checkbox(50, 120, "Enable AI players")
@@ -123,27 +145,30 @@ class AIControls:
         self.red_group.add(self.red_simple)
         self.red_group.add(self.red_advanced)
 
+        # Pacing controls
+        self.pace_group = RadioGroup()
+        for i, (name, delay) in enumerate(AI_PACES):
+            self.pace_group.add(RadioButton(680, 190 + i * 30, name, self.pace_group, value=delay))
+
     def draw(self):
         self.enabled.draw()
         
         if self.enabled.checked:
             # Draw player labels with better spacing
-            blue_label = font.render("Blue Player:", True, (0, 0, 255))
-            red_label = font.render("Red Player:", True, (255, 0, 0))
+            blue_label = render_text(font(), "Blue Player:", (0, 0, 255))
+            red_label = render_text(font(), "Red Player:", (255, 0, 0))
+            pace_label = render_text(font(), "AI Speed:", TEXT)
             screen.blit(blue_label, (80, 160))
             screen.blit(red_label, (400, 160))
+            screen.blit(pace_label, (680, 160))
             
-            for button in self.blue_group.buttons:
-                button.draw()
-            for button in self.red_group.buttons:
+            for button in self.blue_group.buttons + self.red_group.buttons + self.pace_group.buttons:
                 button.draw()
 
     def handle_event(self, event):
         self.enabled.handle_event(event)
         if self.enabled.checked:
-            for button in self.blue_group.buttons:
-                button.handle_event(event)
-            for button in self.red_group.buttons:
+            for button in self.blue_group.buttons + self.red_group.buttons + self.pace_group.buttons:
                 button.handle_event(event)
 
     def get_player_types(self) -> Tuple[str, str]:
@@ -165,18 +190,24 @@ class AIControls:
             
         return blue_type, red_type
 
+    def get_move_delay(self) -> int:
+        """Get the selected delay before computer moves, 0 for turbo"""
+        return next(button.value for button in self.pace_group.buttons if button.selected)
+
 # Replace the old AI controls with the new class
 ai_controls = AIControls()
 
-# Board size options (moved down)
+BOARD_SIZES = (3, 4, 5, 6, 8, 12, 20, 30)
+
+# Board size options (moved down), four to a row
 board_size_group = RadioGroup()
-board_size_group.add(RadioButton(50, 310, "3x3", board_size_group))
-board_size_group.add(RadioButton(50, 350, "4x4", board_size_group))
-board_size_group.add(RadioButton(50, 390, "5x5", board_size_group))
+for i, size in enumerate(BOARD_SIZES):
+    board_size_group.add(RadioButton(50 + (i % 4) * 130, 375 + (i // 4) * 40, f"{size}x{size}",
+                                     board_size_group, value=size))
 
 def start_game():
     global game_logic, game_started, game_over
-    board_size = int(next(btn.text[0] for btn in board_size_group.buttons if btn.selected))
+    board_size = next(btn.value for btn in board_size_group.buttons if btn.selected)
     game_mode = "Simple" if simple_mode_radio.selected else "General"
     
     # Get player types from AI controls
@@ -186,7 +217,8 @@ def start_game():
         size=board_size, 
         game_mode=game_mode,
         blue_player_type=blue_player_type,
-        red_player_type=red_player_type
+        red_player_type=red_player_type,
+        move_delay=ai_controls.get_move_delay()
     )
     
     game_started = True
@@ -216,18 +248,17 @@ def new_game():
         # Stop the game completely
         game_logic.stop()
     
-    # Refresh the replay screen if it exists
+    # The replay list and this game's replay are out of date
     if replay_screen:
-        replay_screen.refresh_games()
+        replay_screen.mark_stale(game_logic.game_id if game_logic else None)
 
 # Create UI elements
-title = title_font.render("SOS Game", True, TITLE_COLOR)
 start_button = Button(WIDTH // 2 - 80, HEIGHT - 100, 160, 50, "Start Game", start_game)
 new_game_button = Button(WIDTH - 180, 20, 160, 50, "New Game", new_game)
 
 mode_group = RadioGroup()
-simple_mode_radio = RadioButton(50, 480, "Simple Game", mode_group)
-general_mode_radio = RadioButton(50, 520, "General Game", mode_group)
+simple_mode_radio = RadioButton(50, 520, "Simple Game", mode_group)
+general_mode_radio = RadioButton(50, 550, "General Game", mode_group)
 mode_group.add(simple_mode_radio)
 mode_group.add(general_mode_radio)
 
@@ -241,54 +272,288 @@ game_logic = None
 game_started = False
 game_over = False
 
-REPLAY_MOVE_DELAY = 1000  # 1 second between moves
+# The board is drawn inside BOARD_AREA, with its frame reaching into BOARD_VIEW around it
+BOARD_AREA = pygame.Rect(300, 150, 500, 450)
+BOARD_VIEW = BOARD_AREA.inflate(20, 20)
+MIN_TEXT_CELL = 8  # Smaller cells show a dot instead of a letter
+
+@lru_cache(maxsize=16)
+def cell_tile(cell_size: int) -> pygame.Surface:
+    """Get an empty cell with its grid lines, drawn once per cell size"""
+    tile = pygame.Surface((cell_size, cell_size))
+    tile.fill(BOARD_BG)
+    if cell_size >= 4:
+        pygame.draw.rect(tile, LINE, tile.get_rect(), 1)
+    return tile
+
+@lru_cache(maxsize=16)
+def letter_font(cell_size: int) -> pygame.font.Font:
+    """Get the font for letters in cells of a size, the usual board font at most"""
+    return pygame.font.Font(None, max(12, min(32, cell_size * 2 // 3)))
+
+def draw_board_frame(viewport: BoardViewport):
+    """Clear the board view and draw the board's background and border"""
+    screen.fill(BACKGROUND, BOARD_VIEW)
+    frame = viewport.board_rect.inflate(20, 20)
+    pygame.draw.rect(screen, BOARD_BG, frame, border_radius=15)
+    pygame.draw.rect(screen, LINE, frame, 3, border_radius=15)
+
+def draw_cell(viewport: BoardViewport, row: int, col: int, letter: str) -> pygame.Rect:
+    """Draw one cell and its letter, and return its rect"""
+    rect = viewport.cell_rect(row, col)
+    screen.blit(cell_tile(viewport.cell_size), rect)
+    if letter:
+        if viewport.cell_size >= MIN_TEXT_CELL:
+            text = render_text(letter_font(viewport.cell_size), letter, TEXT)
+            screen.blit(text, text.get_rect(center=rect.center))
+        else:
+            dot = max(1, viewport.cell_size // 2)
+            pygame.draw.rect(screen, TEXT if letter == 'S' else LINE,
+                             (rect.centerx - dot // 2, rect.centery - dot // 2, dot, dot))
+    return rect
+
+@lru_cache(maxsize=64)
+def line_sprite(dx: int, dy: int, width: int, color: Tuple[int, int, int]) -> Tuple[pygame.Surface, Tuple[int, int]]:
+    """Get a line from (0, 0) to (dx, dy) and the offset of its start in the sprite.
+
+    A clipped pygame.draw.line shifts the pixels it does draw, so lines are
+    drawn whole on a sprite and the sprite is blitted, which clips exactly.
+    """
+    sprite = pygame.Surface((abs(dx) + 2 * width + 1, abs(dy) + 2 * width + 1))
+    sprite.set_colorkey((0, 0, 0))
+    start = (width + max(0, -dx), width + max(0, -dy))
+    pygame.draw.line(sprite, color, start, (start[0] + dx, start[1] + dy), width)
+    return sprite, start
+
+def draw_sos_line(viewport: BoardViewport, start_pos, end_pos, player: str) -> pygame.Rect:
+    """Draw an SOS line and return the rect it covers"""
+    color = (0, 0, 255) if player == 'Blue' else (255, 0, 0)  # Blue or Red
+    width = 3 if viewport.cell_size >= MIN_TEXT_CELL else 1
+    start_x, start_y = viewport.cell_center(*start_pos)
+    end_x, end_y = viewport.cell_center(*end_pos)
+    sprite, (offset_x, offset_y) = line_sprite(end_x - start_x, end_y - start_y, width, color)
+    return screen.blit(sprite, (start_x - offset_x, start_y - offset_y))
+
+def line_is_visible(viewport: BoardViewport, rows: range, cols: range, start_pos, end_pos) -> bool:
+    """Check whether an SOS line crosses the visible rows and columns"""
+    return (min(start_pos[0], end_pos[0]) < rows.stop and max(start_pos[0], end_pos[0]) >= rows.start and
+            min(start_pos[1], end_pos[1]) < cols.stop and max(start_pos[1], end_pos[1]) >= cols.start)
+
+def draw_board(viewport: BoardViewport, cells: List[List[str]], sos_lines) -> pygame.Rect:
+    """Draw the visible part of a board with its SOS lines, and return the area drawn"""
+    screen.set_clip(BOARD_VIEW)
+    draw_board_frame(viewport)
+    rows, cols = viewport.visible_cells()
+    screen.set_clip(BOARD_AREA)
+    for row in rows:
+        row_cells = cells[row]
+        for col in cols:
+            draw_cell(viewport, row, col, row_cells[col])
+    for start_pos, end_pos, player in sos_lines:
+        if line_is_visible(viewport, rows, cols, start_pos, end_pos):
+            draw_sos_line(viewport, start_pos, end_pos, player)
+    screen.set_clip(None)
+    return BOARD_VIEW
+
+def handle_board_view_event(viewport: BoardViewport, event) -> bool:
+    """Zoom with the wheel over the board and pan by dragging with the right button; returns whether the view changed"""
+    if event.type == pygame.MOUSEWHEEL:
+        mouse = pygame.mouse.get_pos()
+        if BOARD_AREA.collidepoint(mouse) and event.y:
+            return viewport.zoom(ZOOM_STEP ** event.y, mouse)
+    elif event.type == pygame.MOUSEMOTION and event.buttons[2]:
+        return viewport.pan(*event.rel)
+    elif event.type == pygame.KEYDOWN:
+        if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            return viewport.zoom(ZOOM_STEP)
+        if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            return viewport.zoom(1 / ZOOM_STEP)
+        if event.key == pygame.K_0:
+            zoomed = viewport.zoomed
+            viewport.reset()
+            return zoomed
+    return False
+
+FPS = 60
+FRAME_MS = 1000 // FPS
+AI_FRAME_BUDGET = FRAME_MS // 2  # Time each frame may spend on due computer moves, leaving the rest for drawing
+
+@lru_cache(maxsize=1)
+def ai_executor() -> ProcessPoolExecutor:
+    """Get the worker process computer players think in, so a slow move never freezes the window"""
+    return ProcessPoolExecutor(max_workers=1)
+ANALYSIS_POLL_MS = 250  # How often an idle replay checks for new annotations
+REPLAY_MOVE_DELAY = 1000  # 1 second between moves at 1x speed
+REPLAY_SPEEDS = (0.5, 1, 2, 4, 8, 16, None)  # None jumps straight to the final position
+
+# Replay list layout: only the rows that fit are fetched and turned into buttons
+LIST_TOP = 150
+LIST_ROW_HEIGHT = 60
+LIST_VISIBLE_ROWS = (HEIGHT - LIST_TOP - 40) // LIST_ROW_HEIGHT
 
 class ReplayScreen:
-    def __init__(self, screen, db: GameDatabase):
+    def __init__(self, screen, db: GameStorage):
         self.screen = screen
         self.db = db
+        self.replays = ReplayCache(db)
+        self.analyzer = GameAnalyzer(db)
+        self.games_stale = True
+        self.pager = GamePager(db)
+        self.scroll = 0  # Position of the top visible row
+        self.games: List[Dict] = []
+        self.game_buttons: List[Button] = []
+
+        # Each filter button cycles through its options; None shows every game
+        self.filter_options = {
+            'game_mode': (None, "Simple", "General"),
+            'board_size': (None,) + BOARD_SIZES,
+            'winner': (None, "Blue", "Red", "Draw"),
+        }
+        self.filter_values = {name: None for name in self.filter_options}
+        self.filter_buttons = {
+            name: Button(140 + i * 250, 90, 230, 40, "", lambda name=name: self.cycle_filter(name))
+            for i, name in enumerate(self.filter_options)
+        }
+        self._label_filters()
+
         self.selected_game: Optional[Dict] = None
         self.moves: List[Dict] = []
+        self.timeline: Optional[ReplayTimeline] = None
+        self.viewport: Optional[BoardViewport] = None
         self.current_move_index = 0
         self.replay_board: Optional[GameBoard] = None
         self.last_move_time = 0
         self.is_playing = False
+        self.speed_index = REPLAY_SPEEDS.index(1)
         self.back_button = Button(20, 20, 100, 40, "Back", self.go_back)
-        self.refresh_games()  # Initial load of games
-        self.sos_lines = []
-        self.current_sos_index = 0
+        self.visible_sos_lines = []
         self.blue_score = 0
         self.red_score = 0
+
+        # Playback controls along the bottom, right of the scores
+        controls_y = HEIGHT - 90
+        self.play_button = Button(330, controls_y, 100, 40, "Pause", self.toggle_play)
+        self.speed_button = Button(660, controls_y, 120, 40, self._speed_label(), self.cycle_speed)
+        self.control_buttons = [
+            Button(210, controls_y, 50, 40, "|<", lambda: self.seek(0)),
+            Button(270, controls_y, 50, 40, "<", lambda: self.step(-1)),
+            self.play_button,
+            Button(440, controls_y, 50, 40, ">", lambda: self.step(1)),
+            Button(500, controls_y, 50, 40, ">|", lambda: self.seek(len(self.moves))),
+            self.speed_button,
+        ]
+        self.scrubber = pygame.Rect(210, HEIGHT - 35, WIDTH - 250, 12)
+        self.scrubbing = False
+        self._drawn_state: Optional[Tuple] = None
         
+    def mark_stale(self, game_id: Optional[int] = None):
+        """Re-query the list next time the screen opens; game_id's cached replay is out of date"""
+        self.games_stale = True
+        if game_id is not None:
+            self.replays.discard(game_id)
+            self.analyzer.discard(game_id)
+
+    def close(self):
+        """Stop the background loaders and analysis"""
+        self.replays.close()
+        self.analyzer.close()
+
     def refresh_games(self):
-        """Refresh the list of games from the database"""
-        self.games = self.db.get_recent_games()
-        logging.info(f"Refreshed games list - Found {len(self.games)} recent games")
-        for game in self.games:
-            logging.info(f"Game ID: {game['game_id']}, Mode: {game['game_mode']}, Winner: {game['winner']}")
-        
-        # Recreate game list buttons
+        """Refresh the list of games from the database if it may have changed"""
+        if not self.games_stale:
+            return
+        self.games_stale = False
+        self.pager.reset({name: value for name, value in self.filter_values.items() if value is not None})
+        self.scroll = 0
+        self._show_rows()
+        logging.info("Refreshed games list")
+
+    def _show_rows(self):
+        """Fetch the visible rows and build buttons for just those"""
+        self.games = [row._asdict() for row in self.pager.rows(self.scroll, LIST_VISIBLE_ROWS)]
         self.game_buttons = []
         for i, game in enumerate(self.games):
-            y_pos = 100 + i * 60
-            button_text = f"Game {game['game_id']} - {game['game_mode']} - Winner: {game['winner']}"
+            y_pos = LIST_TOP + i * LIST_ROW_HEIGHT
+            button_text = (f"Game {game['game_id']} - {game['game_mode']} {game['board_size']}x{game['board_size']}"
+                           f" - Winner: {game['winner']}")
             self.game_buttons.append(
-                Button(50, y_pos, 400, 50, button_text, lambda g=game: self.select_game(g))
+                Button(140, y_pos, 720, 50, button_text, lambda g=game: self.select_game(g))
             )
+        # Load the visible replays in the background so opening one is instant
+        self.replays.prefetch(self.games)
+
+    def scroll_by(self, rows: int):
+        start = max(0, self.scroll + rows)
+        if self.pager.total is None:
+            self.pager.rows(start, LIST_VISIBLE_ROWS)  # May reach the end of the history
+        if self.pager.total is not None:
+            start = min(start, max(0, self.pager.total - LIST_VISIBLE_ROWS))
+        if start != self.scroll:
+            self.scroll = start
+            self._show_rows()
+
+    def _label_filters(self):
+        names = {'game_mode': "Mode", 'board_size': "Size", 'winner': "Winner"}
+        for name, button in self.filter_buttons.items():
+            value = self.filter_values[name]
+            button.text = f"{names[name]}: {'All' if value is None else value}"
+
+    def cycle_filter(self, name: str):
+        options = self.filter_options[name]
+        self.filter_values[name] = options[(options.index(self.filter_values[name]) + 1) % len(options)]
+        self._label_filters()
+        self.mark_stale()
+        self.refresh_games()
 
     def select_game(self, game: Dict):
         self.selected_game = game
-        self.moves = self.db.get_game_moves(game['game_id'])
-        self.sos_lines = self.db.get_game_sos_lines(game['game_id'])
-        logging.info(f"Selected game {game['game_id']}, found {len(self.moves)} moves and {len(self.sos_lines)} SOS lines")
-        self.current_move_index = 0
-        self.current_sos_index = 0
-        self.replay_board = GameBoard(game['board_size'])
-        self.is_playing = True
+        self.timeline = self.replays.get(game)
+        self.moves = self.timeline.moves
+        self.viewport = BoardViewport(game['board_size'], BOARD_AREA)
+        # Annotations fill in as the analysis finishes; playback never waits for them
+        self.analyzer.request(game, self.moves)
+        logging.info(f"Selected game {game['game_id']} with {len(self.moves)} moves")
+        self.seek(0)
+        self.set_playing(True)
+
+    def seek(self, move_index: int):
+        """Show the position after move_index moves"""
+        if self.timeline is None:
+            return
+        position = self.timeline.position(move_index)
+        self.current_move_index = position.move_index
+        self.replay_board = position.board
+        self.visible_sos_lines = position.sos_lines
+        self.blue_score = position.blue_score
+        self.red_score = position.red_score
+
+    def step(self, delta: int):
+        """Pause and move delta moves forward or back"""
+        self.set_playing(False)
+        self.seek(self.current_move_index + delta)
+
+    def set_playing(self, playing: bool):
+        if playing and self.current_move_index >= len(self.moves):
+            self.seek(0)  # Play from the start again once the end is reached
+        self.is_playing = playing
+        self.play_button.text = "Pause" if playing else "Play"
         self.last_move_time = pygame.time.get_ticks()
-        self.visible_sos_lines = []
-        self.blue_score = 0
-        self.red_score = 0
+
+    def toggle_play(self):
+        self.set_playing(not self.is_playing)
+
+    def _speed_label(self) -> str:
+        speed = REPLAY_SPEEDS[self.speed_index]
+        return "Instant" if speed is None else f"{speed:g}x"
+
+    def cycle_speed(self):
+        self.speed_index = (self.speed_index + 1) % len(REPLAY_SPEEDS)
+        self.speed_button.text = self._speed_label()
+        self.last_move_time = pygame.time.get_ticks()
+
+    def _scrub_to(self, x: int):
+        fraction = (x - self.scrubber.left) / self.scrubber.width
+        self.seek(round(max(0.0, min(1.0, fraction)) * len(self.moves)))
 
     def go_back(self):
         global game_started, viewing_replays  # Add viewing_replays
@@ -296,86 +561,86 @@ class ReplayScreen:
         viewing_replays = False  # Set this to False instead of game_started
         self.selected_game = None
 
-    def update(self):
-        if self.is_playing and self.selected_game:
-            current_time = pygame.time.get_ticks()
-            if current_time - self.last_move_time >= REPLAY_MOVE_DELAY:
-                if self.current_move_index < len(self.moves):
-                    move = self.moves[self.current_move_index]
-                    self.replay_board.make_move(move['row'], move['col'], move['letter'])
-                    
-                    # Update SOS lines and scores based on move number
-                    while (self.current_sos_index < len(self.sos_lines) and 
-                           self.sos_lines[self.current_sos_index]['move_number'] <= self.current_move_index + 1):
-                        sos_line = self.sos_lines[self.current_sos_index]
-                        self.visible_sos_lines.append((
-                            sos_line['start_pos'],
-                            sos_line['end_pos'],
-                            sos_line['player']
-                        ))
-                        if sos_line['player'] == 'Blue':
-                            self.blue_score += 1
-                        else:
-                            self.red_score += 1
-                        self.current_sos_index += 1
-                        logging.info(f"Added SOS line for {sos_line['player']}, scores now Blue: {self.blue_score}, Red: {self.red_score}")
-                    
-                    self.current_move_index += 1
-                    self.last_move_time = current_time
-                else:
-                    self.is_playing = False
+    def next_update_in(self) -> Optional[int]:
+        """Get the milliseconds until the screen changes without input, or None if only input changes it"""
+        if not self.selected_game:
+            return None
+        if self.is_playing:
+            speed = REPLAY_SPEEDS[self.speed_index]
+            if speed is None:
+                return 0
+            return max(0, int(self.last_move_time + REPLAY_MOVE_DELAY / speed) - pygame.time.get_ticks())
+        if not self.analyzer.wait(self.selected_game['game_id'], timeout=0):
+            return ANALYSIS_POLL_MS  # Annotations are still filling in
+        return None
 
-    def draw(self):
+    def update(self):
+        if not (self.is_playing and self.selected_game):
+            return
+        speed = REPLAY_SPEEDS[self.speed_index]
+        if speed is None:
+            self.seek(len(self.moves))
+        else:
+            delay = REPLAY_MOVE_DELAY / speed
+            elapsed = pygame.time.get_ticks() - self.last_move_time
+            if elapsed < delay:
+                return
+            # Catch up on every move that was due, however long the frame took
+            moves_due = int(elapsed // delay)
+            self.seek(self.current_move_index + moves_due)
+            self.last_move_time += moves_due * delay
+        if self.current_move_index >= len(self.moves):
+            self.set_playing(False)
+
+    def _view_state(self) -> Tuple:
+        """Everything the screen shows, to tell whether a frame would differ from the last one"""
+        buttons = [self.back_button, *self.filter_buttons.values(), *self.game_buttons, *self.control_buttons]
+        state = (tuple(button.hovered for button in buttons), tuple(button.text for button in buttons),
+                 self.scroll, self.pager.total)
+        if self.selected_game:
+            annotations = len(self.analyzer.annotations(self.selected_game['game_id']))
+            state += (self.selected_game['game_id'], self.current_move_index, annotations,
+                      self.viewport.cell_size, self.viewport.left, self.viewport.top)
+        return state
+
+    def draw(self, force: bool = False) -> bool:
+        """Draw the screen if anything on it changed; returns whether it did"""
+        state = self._view_state()
+        if not force and state == self._drawn_state:
+            return False
+        self._drawn_state = state
         self.screen.fill(BACKGROUND)
         self.back_button.draw()
 
         if not self.selected_game:
             # Draw game list
-            title = title_font.render("Recent Games", True, TITLE_COLOR)
+            title = render_text(title_font(), "Recent Games", TITLE_COLOR)
             self.screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 30))
-            
+
+            for button in self.filter_buttons.values():
+                button.draw()
             for button in self.game_buttons:
                 button.draw()
+
+            # Where the visible rows sit in the history; the total is known once the end was reached
+            if self.games:
+                total = self.pager.total
+                shown = f"Games {self.scroll + 1}-{self.scroll + len(self.games)}"
+                shown += f" of {total}" if total is not None else " (scroll for more)"
+            else:
+                shown = "No games match the filters"
+            position_text = render_text(small_font(), shown, TEXT)
+            self.screen.blit(position_text, (140, HEIGHT - 30))
+            if self.pager.total:
+                track = pygame.Rect(WIDTH - 25, LIST_TOP, 8, LIST_VISIBLE_ROWS * LIST_ROW_HEIGHT)
+                thumb_height = max(20, track.height * min(1.0, LIST_VISIBLE_ROWS / self.pager.total))
+                thumb_top = track.top + (track.height - thumb_height) * (
+                    self.scroll / max(1, self.pager.total - LIST_VISIBLE_ROWS))
+                pygame.draw.rect(self.screen, BUTTON, track, border_radius=4)
+                pygame.draw.rect(self.screen, LINE, (track.left, thumb_top, track.width, thumb_height), border_radius=4)
         else:
-            # Draw replay board
-            board_size = self.replay_board.size
-            cell_size = min((WIDTH - 400) // board_size, (HEIGHT - 250) // board_size)
-            board_width = cell_size * board_size
-            board_height = cell_size * board_size
-            board_left = (WIDTH - board_width) // 2 + 100
-            board_top = 150
-
-            # Draw board background
-            pygame.draw.rect(self.screen, BOARD_BG, 
-                           (board_left - 10, board_top - 10, 
-                            board_width + 20, board_height + 20), 
-                           border_radius=15)
-            
-            # Draw grid and moves
-            for row in range(board_size):
-                for col in range(board_size):
-                    rect = pygame.Rect(
-                        board_left + col * cell_size,
-                        board_top + row * cell_size,
-                        cell_size,
-                        cell_size
-                    )
-                    pygame.draw.rect(self.screen, LINE, rect, 1)
-                    
-                    cell_value = self.replay_board.get_cell(row, col)
-                    if cell_value:
-                        text = font.render(cell_value, True, TEXT)
-                        text_rect = text.get_rect(center=rect.center)
-                        self.screen.blit(text, text_rect)
-
-            # Draw SOS lines
-            for start_pos, end_pos, player in self.visible_sos_lines:
-                start_x = board_left + start_pos[1] * cell_size + cell_size // 2
-                start_y = board_top + start_pos[0] * cell_size + cell_size // 2
-                end_x = board_left + end_pos[1] * cell_size + cell_size // 2
-                end_y = board_top + end_pos[0] * cell_size + cell_size // 2
-                color = (0, 0, 255) if player == 'Blue' else (255, 0, 0)
-                pygame.draw.line(self.screen, color, (start_x, start_y), (end_x, end_y), 3)
+            # Draw the visible part of the replay board
+            draw_board(self.viewport, self.replay_board.board, self.visible_sos_lines)
 
             # Draw game info
             info_text = [
@@ -386,46 +651,168 @@ class ReplayScreen:
             ]
             
             for i, text in enumerate(info_text):
-                surf = font.render(text, True, TEXT)
+                surf = render_text(font(), text, TEXT)
                 self.screen.blit(surf, (20, 100 + i * 30))
 
+            annotations = self.analyzer.annotations(self.selected_game['game_id'])
+            self._draw_annotation(annotations)
+
             # Draw scores
-            blue_score_text = font.render(f"Blue Score: {self.blue_score}", True, (0, 0, 255))
-            red_score_text = font.render(f"Red Score: {self.red_score}", True, (255, 0, 0))
+            blue_score_text = render_text(font(), f"Blue Score: {self.blue_score}", (0, 0, 255))
+            red_score_text = render_text(font(), f"Red Score: {self.red_score}", (255, 0, 0))
             self.screen.blit(blue_score_text, (20, HEIGHT - 80))
             self.screen.blit(red_score_text, (20, HEIGHT - 40))
 
+            # Draw playback controls and the scrubber
+            for button in self.control_buttons:
+                button.draw()
+            pygame.draw.rect(self.screen, BUTTON, self.scrubber, border_radius=6)
+            if self.moves:
+                progress = self.current_move_index / len(self.moves)
+                knob_x = self.scrubber.left + int(progress * self.scrubber.width)
+                filled = pygame.Rect(self.scrubber.left, self.scrubber.top, knob_x - self.scrubber.left,
+                                     self.scrubber.height)
+                pygame.draw.rect(self.screen, LINE, filled, border_radius=6)
+                # Tick the moves that gave points away, as far as the analysis has got
+                for move_number, annotation in annotations.items():
+                    if annotation['swing'] < 0:
+                        tick_x = self.scrubber.left + int(move_number / len(self.moves) * self.scrubber.width)
+                        pygame.draw.line(self.screen, (255, 0, 0), (tick_x, self.scrubber.top - 8),
+                                         (tick_x, self.scrubber.top - 2), 2)
+                pygame.draw.circle(self.screen, TITLE_COLOR, (knob_x, self.scrubber.centery), 9)
+        return True
+
+    def _draw_annotation(self, annotations: Dict[int, Dict]):
+        """Show the engine's view of the move just played"""
+        lines = [f"Analysis: {len(annotations)}/{len(self.moves)} moves"]
+        if self.current_move_index == 0:
+            lines.append("Start of game")
+        else:
+            move = self.moves[self.current_move_index - 1]
+            annotation = annotations.get(move['move_number'])
+            lines.append(f"{move['player']} {move['letter']} at ({move['row']}, {move['col']})")
+            if annotation is None:
+                lines.append("Analysing...")
+            elif annotation['swing'] == 0:
+                lines.append("Best move")
+            else:
+                lines.append(f"Best: {annotation['best_letter']} at "
+                             f"({annotation['best_row']}, {annotation['best_col']})")
+                lines.append(f"Swing: {annotation['swing']:+d}")
+            if annotation is not None and annotation['handed_sos']:
+                lines.append("Handed the opponent an SOS")
+        for i, text in enumerate(lines):
+            surf = render_text(small_font(), text, TEXT)
+            self.screen.blit(surf, (20, 240 + i * 26))
+
     def handle_event(self, event):
         self.back_button.handle_event(event)
         if not self.selected_game:
-            for button in self.game_buttons:
+            for button in list(self.filter_buttons.values()) + self.game_buttons:
                 button.handle_event(event)
+            if event.type == pygame.MOUSEWHEEL:
+                self.scroll_by(-event.y)
+            elif event.type == pygame.KEYDOWN:
+                steps = {pygame.K_UP: -1, pygame.K_DOWN: 1,
+                         pygame.K_PAGEUP: -LIST_VISIBLE_ROWS, pygame.K_PAGEDOWN: LIST_VISIBLE_ROWS}
+                if event.key in steps:
+                    self.scroll_by(steps[event.key])
+            return
+
+        for button in self.control_buttons:
+            button.handle_event(event)
+        if handle_board_view_event(self.viewport, event):
+            return
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.scrubber.inflate(0, 16).collidepoint(event.pos):
+                self.scrubbing = True
+                self.set_playing(False)
+                self._scrub_to(event.pos[0])
+        elif event.type == pygame.MOUSEMOTION and self.scrubbing:
+            self._scrub_to(event.pos[0])
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            self.scrubbing = False
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_LEFT:
+                self.step(-1)
+            elif event.key == pygame.K_RIGHT:
+                self.step(1)
+            elif event.key == pygame.K_SPACE:
+                self.toggle_play()
+            elif event.key == pygame.K_HOME:
+                self.seek(0)
+            elif event.key == pygame.K_END:
+                self.seek(len(self.moves))
 
 # Add after other global variables
 replay_screen = None
 viewing_replays = False
 
+def get_replay_screen() -> 'ReplayScreen':
+    """Get the replay screen, creating it (and opening the database) the first time replays are shown"""
+    global replay_screen
+    if replay_screen is None:
+        # Share the games' write-behind database so replays see moves still queued
+        replay_screen = ReplayScreen(screen, default_database())
+    return replay_screen
+
+def show_replays():
+    global viewing_replays
+    get_replay_screen().refresh_games()
+    viewing_replays = True
+    logging.info("Entering replay screen")
+
+replay_button = Button(WIDTH // 2 - 80, HEIGHT - 160, 160, 50, "View Replays", show_replays)
+
+def next_update_in() -> Optional[int]:
+    """Get the milliseconds until the current screen changes without input, or None if only input changes it"""
+    if viewing_replays:
+        return replay_screen.next_update_in()
+    if game_started and game_logic:
+        return game_logic.computer_move_due_in()
+    return None
+
+def wait_for_events(clock: pygame.time.Clock, timeout: Optional[int]) -> List[pygame.event.Event]:
+    """Sleep until input arrives or timeout milliseconds pass (None waits for input alone).
+
+    Timeouts within a frame are paced by the clock instead, so animations
+    and playback run at the frame rate while idle screens use no CPU.
+    """
+    if timeout is not None and timeout <= FRAME_MS:
+        clock.tick(FPS)
+        return pygame.event.get()
+    event = pygame.event.wait() if timeout is None else pygame.event.wait(timeout)
+    events = [] if event.type == pygame.NOEVENT else [event]
+    return events + pygame.event.get()
+
 def main():
-    global game_logic, game_started, replay_screen, viewing_replays, game_over
+    global game_logic, game_started, viewing_replays, game_over
+
+    # Set up logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-    # Initialize replay screen
-    replay_screen = ReplayScreen(screen, GameDatabase())
+    # Only the window opens up front; fonts, the database and the replay list load on first use
+    init_display()
     logging.info("Game started")
     clock = pygame.time.Clock()  # Add this for consistent frame rate
+    drawn_screen = None  # Which screen the display shows; any other needs a full redraw
+    menu_changed = False
 
     running = True
     while running:
-        clock.tick(60)  # Limit to 60 FPS
+        # Block until there is input or something is due, at most FPS times a second;
+        # the first frame shows the menu straight away
+        events = wait_for_events(clock, 0 if drawn_screen is None else next_update_in())
+        force_redraw = False
         
-        # Only update game logic if game is started and not viewing replays
+        # Only update game logic if game is started and not viewing replays. With
+        # no move delay this plays every move that fits in the budget, and the
+        # frame then shows only the latest position. Moves are chosen in a worker
+        # process, so a slow one spans frames instead of stalling them.
         if game_logic and not game_over and not viewing_replays:
-            game_logic.update()
-            if game_logic.game_over and not game_over:
-                game_over = True
-                logging.info("Game ended - Refreshing replay list")
-                replay_screen.refresh_games()
+            game_logic.update(AI_FRAME_BUDGET, ai_executor())
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 # Stop game before quitting
                 if game_logic:
@@ -441,17 +828,17 @@ def main():
                         except Exception as e:
                             logging.error(f"Error saving game end state: {e}")
                 running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                force_redraw = True  # The window contents were lost
 
             if viewing_replays:
                 replay_screen.handle_event(event)
             elif not game_started:
                 # Handle menu events
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                    replay_button_rect = pygame.Rect(WIDTH // 2 - 80, HEIGHT - 160, 160, 50)
-                    if replay_button_rect.collidepoint(event.pos):
-                        replay_screen.refresh_games()
-                        viewing_replays = True
-                        logging.info("Entering replay screen")
+                    menu_changed = True
+                    replay_button.handle_event(event)
+                    if viewing_replays:
                         continue
                     
                     # Handle menu buttons
@@ -463,6 +850,7 @@ def main():
                     general_mode_radio.handle_event(event)
             else:
                 # Handle game events
+                handle_board_view_event(game_view.viewport_for(game_logic), event)
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                     new_game_button.handle_event(event)
                     
@@ -476,140 +864,227 @@ def main():
 
                         # Handle board clicks
                         if not game_logic.game_over and not game_logic.pending_computer_move:
-                            board_size = game_logic.board.size
-                            cell_size = min((WIDTH - 400) // board_size, (HEIGHT - 250) // board_size)
-                            board_left = (WIDTH - board_size * cell_size) // 2 + 100
-                            board_top = 150
-
-                            mouse_x, mouse_y = event.pos
-                            if (board_left <= mouse_x <= board_left + board_size * cell_size and
-                                board_top <= mouse_y <= board_top + board_size * cell_size):
-                                col = (mouse_x - board_left) // cell_size
-                                row = (mouse_y - board_top) // cell_size
+                            cell = game_view.viewport_for(game_logic).cell_at(event.pos)
+                            if cell is not None:
                                 letter = 'S' if s_radio.selected else 'O'
-                                game_logic.make_move(int(row), int(col), letter)
+                                game_logic.make_move(*cell, letter)
 
-        # Draw current screen
-        screen.fill(BACKGROUND)
+        if game_logic and game_logic.game_over and not game_over:
+            game_over = True
+            logging.info("Game ended - Marking replay list for refresh")
+            if replay_screen:
+                replay_screen.mark_stale(game_logic.game_id)
+
+        # Draw current screen, sending only what changed to the display
+        current_screen = "replays" if viewing_replays else ("game" if game_started else "menu")
+        force_redraw = force_redraw or current_screen != drawn_screen
+        drawn_screen = current_screen
 
         if viewing_replays:
             replay_screen.update()
-            replay_screen.draw()
+            if replay_screen.draw(force_redraw):
+                pygame.display.flip()
         elif not game_started:
-            draw_menu()
-            replay_button = Button(WIDTH // 2 - 80, HEIGHT - 160, 160, 50, "View Replays", lambda: None)
-            replay_button.draw()
+            if force_redraw or menu_changed:
+                draw_menu()
+                pygame.display.flip()
         else:
-            draw_game()
-
-        pygame.display.flip()
+            dirty = draw_game(force_redraw)
+            if dirty:
+                pygame.display.update(dirty)
+        menu_changed = False
 
+    if replay_screen:
+        replay_screen.close()
+    if ai_executor.cache_info().currsize:
+        ai_executor().shutdown(cancel_futures=True)
     pygame.quit()
     sys.exit()
 
-def draw_menu():
-    screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 30))
+@lru_cache(maxsize=1)
+def menu_layer() -> pygame.Surface:
+    """Get the menu's title, dividers and labels, drawn once"""
+    layer = pygame.Surface((WIDTH, HEIGHT))
+    layer.fill(BACKGROUND)
+    title = render_text(title_font(), "SOS Game", TITLE_COLOR)
+    layer.blit(title, (WIDTH // 2 - title.get_width() // 2, 30))
     
     # Adjust spacing of horizontal lines
-    pygame.draw.line(screen, LINE, (30, 90), (WIDTH - 30, 90), 3)     # Below title
-    pygame.draw.line(screen, LINE, (30, 300), (WIDTH - 30, 300), 3)   # Below AI controls
-    pygame.draw.line(screen, LINE, (30, 460), (WIDTH - 30, 460), 3)   # Below board size
+    pygame.draw.line(layer, LINE, (30, 90), (WIDTH - 30, 90), 3)     # Below title
+    pygame.draw.line(layer, LINE, (30, 300), (WIDTH - 30, 300), 3)   # Below AI controls
+    pygame.draw.line(layer, LINE, (30, 460), (WIDTH - 30, 460), 3)   # Below board size
+
+    board_size_label = render_text(font(), "Select board size:", TEXT)
+    layer.blit(board_size_label, (50, 330))
+    mode_label = render_text(font(), "Select game mode:", TEXT)
+    layer.blit(mode_label, (50, 490))
+    return layer
+
+def draw_menu():
+    screen.blit(menu_layer(), (0, 0))
 
     # Draw AI controls
     ai_controls.draw()
 
-    # Draw board size options with adjusted spacing
-    board_size_label = font.render("Select board size:", True, TEXT)
-    screen.blit(board_size_label, (50, 330))  # Moved down
-    
-    # Adjust board size radio buttons
-    board_size_group.buttons[0].rect.y = 370  # 3x3
-    board_size_group.buttons[1].rect.y = 400  # 4x4
-    board_size_group.buttons[2].rect.y = 430  # 5x5
-    
     for btn in board_size_group.buttons:
         btn.draw()
 
     # Draw game mode options
-    mode_label = font.render("Select game mode:", True, TEXT)
-    screen.blit(mode_label, (50, 490))  # Moved down
-    
-    # Adjust game mode radio buttons
-    simple_mode_radio.rect.y = 520
-    general_mode_radio.rect.y = 550
     simple_mode_radio.draw()
     general_mode_radio.draw()
 
     # Draw buttons at the bottom
-    replay_button = Button(WIDTH // 2 - 80, HEIGHT - 160, 160, 50, "View Replays", lambda: None)
     replay_button.draw()
     start_button.draw()  # Already positioned at HEIGHT - 100
 
-def draw_game():
-    # Draw game board
-    board_size = game_logic.board.size
-    cell_size = min((WIDTH - 400) // board_size, (HEIGHT - 250) // board_size)
-    board_width = cell_size * board_size
-    board_height = cell_size * board_size
-    board_left = (WIDTH - board_width) // 2 + 100
-    board_top = 150
-
-    # Draw board background
-    pygame.draw.rect(screen, BOARD_BG, (board_left - 10, board_top - 10, board_width + 20, board_height + 20), border_radius=15)
-    pygame.draw.rect(screen, LINE, (board_left - 10, board_top - 10, board_width + 20, board_height + 20), 3, border_radius=15)
-
-    for row in range(board_size):
-        for col in range(board_size):
-            rect = pygame.Rect(board_left + col * cell_size, board_top + row * cell_size, cell_size, cell_size)
-            pygame.draw.rect(screen, LINE, rect, 1)
-            if game_logic.board.board[row][col]:
-                text = font.render(game_logic.board.board[row][col], True, TEXT)
-                text_rect = text.get_rect(center=rect.center)
-                screen.blit(text, text_rect)
-
-    current_player_text = font.render(f"Current player: {game_logic.board.current_player}", True, TEXT)
-    screen.blit(current_player_text, (20, HEIGHT - 60))
-
-    game_mode_text = font.render(f"Game Mode: {game_logic.game_mode}", True, TEXT)
-    screen.blit(game_mode_text, (WIDTH - game_mode_text.get_width() - 20, HEIGHT - 60))
-
-    new_game_button.draw()
-
-    # Only show letter selection for human players
-    current_player = game_logic.board.current_player
-    current_player_type = (game_logic.players[current_player].__class__.__name__)
-    
-    if current_player_type == "HumanPlayer":
-        # Draw S and O radio buttons
-        letter_label = font.render("Select letter:", True, TEXT)
-        screen.blit(letter_label, (50, HEIGHT - 180))
-        s_radio.draw()
-        o_radio.draw()
-
-    # Draw SOS lines
-    for start_pos, end_pos, player in game_logic.get_sos_lines():
-        start_x = board_left + start_pos[1] * cell_size + cell_size // 2
-        start_y = board_top + start_pos[0] * cell_size + cell_size // 2
-        end_x = board_left + end_pos[1] * cell_size + cell_size // 2
-        end_y = board_top + end_pos[0] * cell_size + cell_size // 2
-        color = (0, 0, 255) if player == 'Blue' else (255, 0, 0)  # Blue or Red
-        pygame.draw.line(screen, color, (start_x, start_y), (end_x, end_y), 3)
-
-    # Draw scores for General game mode
-    if game_logic.game_mode == "General":
-        scores = game_logic.get_scores()
-        blue_score = font.render(f"Blue: {scores['Blue']}", True, (0, 0, 255))
-        red_score = font.render(f"Red: {scores['Red']}", True, (255, 0, 0))
-        screen.blit(blue_score, (20, 20))
-        screen.blit(red_score, (20, 60))
-
-    # Show winner if game is over
-    if game_logic.game_over:
-        winner_text = font.render(
-            f"Winner: {game_logic.winner}" if game_logic.winner != 'Draw' else "Game Draw!",
-            True, TEXT
-        )
-        screen.blit(winner_text, (WIDTH // 2 - winner_text.get_width() // 2, 20))
+class GameView:
+    """Draws the game screen, redrawing only what changed since the last frame.
+
+    Cells come from a cached tile, so a changed cell is one blit plus its
+    letter. Only the cells and lines inside the viewport are drawn, and
+    lines are indexed by the cells they cross so a changed cell only redraws
+    the lines near it. Everything around the board is redrawn only when
+    the text or controls shown there change.
+    """
+    def __init__(self):
+        self.game: Optional[GameLogic] = None
+        self.viewport: Optional[BoardViewport] = None
+        self.view: Optional[Tuple] = None  # Zoom and pan the board was last drawn at
+        self.cells: List[List[str]] = []
+        self.line_count = 0
+        self.lines_by_cell: Dict[Tuple[int, int], List] = {}
+        self.status: Optional[Tuple] = None
+
+    def viewport_for(self, game: GameLogic) -> BoardViewport:
+        """Get the viewport of a game, starting a fitted one for a new game"""
+        if game is not self.game:
+            self.game = game
+            self.viewport = BoardViewport(game.board.size, BOARD_AREA)
+            self.view = None
+            self.line_count = 0
+            self.lines_by_cell = {}
+        return self.viewport
+
+    def draw(self, game: GameLogic, force: bool = False) -> List[pygame.Rect]:
+        """Bring the screen up to date and return the areas that changed"""
+        board = game.board
+        viewport = self.viewport_for(game)
+        dirty = []
+        if force:
+            screen.fill(BACKGROUND)
+            self.status = None
+            self.view = None
+            dirty.append(screen.get_rect())
+
+        # Index new lines, with their position in the game, by the three cells each one crosses
+        sos_lines = game.get_sos_lines()
+        new_lines = list(enumerate(sos_lines[self.line_count:], start=self.line_count))
+        for index, line in new_lines:
+            (start_row, start_col), (end_row, end_col), _ = line
+            middle = ((start_row + end_row) // 2, (start_col + end_col) // 2)
+            for cell in ((start_row, start_col), middle, (end_row, end_col)):
+                self.lines_by_cell.setdefault(cell, []).append((index, line))
+        self.line_count = len(sos_lines)
+
+        view = (viewport.cell_size, viewport.left, viewport.top)
+        if view != self.view:
+            self.view = view
+            self.cells = [row[:] for row in board.board]
+            dirty.append(draw_board(viewport, self.cells, sos_lines))
+        else:
+            dirty += self._draw_changes(board, viewport, new_lines)
+
+        status = self._status(game)
+        if status != self.status:
+            self.status = status
+            regions = [
+                pygame.Rect(0, 0, WIDTH, BOARD_VIEW.top),
+                pygame.Rect(0, BOARD_VIEW.bottom, WIDTH, HEIGHT - BOARD_VIEW.bottom),
+                pygame.Rect(0, BOARD_VIEW.top, BOARD_VIEW.left, BOARD_VIEW.height),
+                pygame.Rect(BOARD_VIEW.right, BOARD_VIEW.top, WIDTH - BOARD_VIEW.right, BOARD_VIEW.height),
+            ]
+            for rect in regions:
+                screen.fill(BACKGROUND, rect)
+            self._draw_status(game)
+            dirty += regions
+        return dirty
+
+    def _draw_changes(self, board: GameBoard, viewport: BoardViewport,
+                      new_lines: List[Tuple[int, Tuple]]) -> List[pygame.Rect]:
+        rows, cols = viewport.visible_cells()
+        screen.set_clip(BOARD_AREA)
+        dirty = []
+        for row in rows:
+            cells, drawn = board.board[row], self.cells[row]
+            if cells[cols.start:cols.stop] == drawn[cols.start:cols.stop]:
+                continue
+            for col in cols:
+                letter = cells[col]
+                if letter == drawn[col]:
+                    continue
+                drawn[col] = letter
+                rect = draw_cell(viewport, row, col, letter).clip(BOARD_AREA)
+                dirty.append(rect)
+                # Repaint, in game order and only inside the cell, the lines through it or its neighbours
+                nearby = set()
+                for r in range(row - 1, row + 2):
+                    for c in range(col - 1, col + 2):
+                        nearby.update(self.lines_by_cell.get((r, c), ()))
+                screen.set_clip(rect)
+                for _, (start_pos, end_pos, player) in sorted(nearby):
+                    draw_sos_line(viewport, start_pos, end_pos, player)
+                screen.set_clip(BOARD_AREA)
+        # New lines are the latest, so they go on top of everything else
+        for _, (start_pos, end_pos, player) in new_lines:
+            if line_is_visible(viewport, rows, cols, start_pos, end_pos):
+                dirty.append(draw_sos_line(viewport, start_pos, end_pos, player).clip(BOARD_AREA))
+        screen.set_clip(None)
+        return dirty
+
+    def _status(self, game: GameLogic) -> Tuple:
+        current_player = game.board.current_player
+        return (current_player, game.players[current_player].__class__.__name__, s_radio.selected,
+                game.board.blue_score, game.board.red_score, game.game_over, game.winner)
+
+    def _draw_status(self, game: GameLogic):
+        current_player_text = render_text(font(), f"Current player: {game.board.current_player}", TEXT)
+        screen.blit(current_player_text, (20, HEIGHT - 60))
+
+        game_mode_text = render_text(font(), f"Game Mode: {game.game_mode}", TEXT)
+        screen.blit(game_mode_text, (WIDTH - game_mode_text.get_width() - 20, HEIGHT - 60))
+
+        new_game_button.draw()
+
+        # Only show letter selection for human players
+        current_player = game.board.current_player
+        current_player_type = (game.players[current_player].__class__.__name__)
+        
+        if current_player_type == "HumanPlayer":
+            # Draw S and O radio buttons
+            letter_label = render_text(font(), "Select letter:", TEXT)
+            screen.blit(letter_label, (50, HEIGHT - 180))
+            s_radio.draw()
+            o_radio.draw()
+
+        # Draw scores for General game mode
+        if game.game_mode == "General":
+            scores = game.get_scores()
+            blue_score = render_text(font(), f"Blue: {scores['Blue']}", (0, 0, 255))
+            red_score = render_text(font(), f"Red: {scores['Red']}", (255, 0, 0))
+            screen.blit(blue_score, (20, 20))
+            screen.blit(red_score, (20, 60))
+
+        # Show winner if game is over
+        if game.game_over:
+            winner_text = render_text(
+                font(), f"Winner: {game.winner}" if game.winner != 'Draw' else "Game Draw!", TEXT
+            )
+            screen.blit(winner_text, (WIDTH // 2 - winner_text.get_width() // 2, 20))
+
+game_view = GameView()
+
+def draw_game(force: bool = False) -> List[pygame.Rect]:
+    return game_view.draw(game_logic, force)
 
 if __name__ == "__main__":
     main()
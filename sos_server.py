@@ -0,0 +1,265 @@
+"""Asyncio server hosting many concurrent SOS games.
+
+Clients speak a line-delimited JSON protocol: every request is one JSON object
+terminated by a newline and every reply is one JSON object on its own line.
+
+    {"op": "new", "size": 3, "mode": "Simple", "blue": "human", "red": "smart_computer"}
+    {"op": "move", "game_id": 7, "row": 0, "col": 1, "letter": "S"}
+    {"op": "state", "game_id": 7}
+    {"op": "close", "game_id": 7}
+
+Replies carry ``"ok": true`` plus the game state, or ``"ok": false`` and an
+``"error"`` message. An optional ``"id"`` field in a request is echoed back.
+Boards range from 3x3 to MAX_BOARD_SIZE x MAX_BOARD_SIZE.
+"""
+from typing import Dict, Optional, Set, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import logging
+
+from database import default_database
+from storage import GameStorage
+from sos_game_logic import GameLogic
+
+VALID_MODES = ("Simple", "General")
+VALID_PLAYER_TYPES = ("human", "simple_computer", "smart_computer")
+# The largest board the UI offers; every game is built on the one shared writer
+# thread, so an unbounded size would let one client stall all sessions
+MAX_BOARD_SIZE = 30
+
+
+class ProtocolError(Exception):
+    """Raised when a client request cannot be served"""
+
+
+def _is_int(value) -> bool:
+    """Check for a JSON integer; true and false are ints to isinstance"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def game_state(game: GameLogic) -> Dict:
+    """Build the JSON-serialisable state of a game"""
+    return {
+        'game_id': game.game_id,
+        'size': game.board.size,
+        'mode': game.game_mode,
+        'board': [row[:] for row in game.board.board],
+        'current_player': game.board.current_player,
+        'scores': game.get_scores(),
+        'sos_lines': [[list(start), list(end), player] for start, end, player in game.board.sos_lines],
+        'game_over': game.game_over,
+        'winner': game.winner
+    }
+
+
+class SOSServer:
+    """Hosts many games over TCP or a Unix socket.
+
+    Game state and database writes are confined to a single writer thread so
+    every session shares one database writer, while computer players search
+    in a separate executor so one slow move never blocks other sessions.
+    """
+    def __init__(self, db: Optional[GameStorage] = None, ai_executor: Optional[Executor] = None):
+        self.db = db if db is not None else default_database()
+        self.ai_executor = ai_executor if ai_executor is not None else ProcessPoolExecutor()
+        self.db_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sos-db-writer")
+        self.games: Dict[int, GameLogic] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._client_tasks: Set[asyncio.Task] = set()
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        """Start listening on a TCP socket"""
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        logging.info(f"SOS server listening on {host}:{port}")
+        return self.server
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        """Start listening on a Unix domain socket"""
+        self.server = await asyncio.start_unix_server(self.handle_client, path)
+        logging.info(f"SOS server listening on {path}")
+        return self.server
+
+    async def close(self):
+        """Stop accepting clients, end the live sessions and release the executors"""
+        if self.server is not None:
+            self.server.close()
+        # Sessions stop their games on the way out, so they must finish while the writer still runs
+        tasks = list(self._client_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for game in list(self.games.values()):
+            await self._on_writer(game.stop)
+        self.games.clear()
+        self.db_writer.shutdown(wait=True)
+        self.db.flush()
+        self.ai_executor.shutdown(wait=True)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one connection until the client disconnects"""
+        owned_games = set()
+        peer = writer.get_extra_info('peername')
+        logging.info(f"Client connected: {peer}")
+        task = asyncio.current_task()
+        self._client_tasks.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.handle_line(line, owned_games)
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logging.info(f"Client {peer} dropped: {e}")
+        except asyncio.CancelledError:
+            # Cancelled by close; ending normally spares the stream callback a cancelled task
+            logging.info(f"Closing session with {peer}: server shutting down")
+        finally:
+            # Games live only as long as the connection that created them
+            for game_id in owned_games:
+                game = self.games.pop(game_id, None)
+                if game is not None:
+                    await self._on_writer(game.stop)
+            writer.close()
+            self._client_tasks.discard(task)
+            logging.info(f"Client disconnected: {peer}")
+
+    async def handle_line(self, line: bytes, owned_games: set) -> Dict:
+        """Decode one request line and dispatch it"""
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise ProtocolError("Malformed JSON")
+            if not isinstance(request, dict):
+                raise ProtocolError("Request must be a JSON object")
+            request_id = request.get('id')
+            reply = await self.dispatch(request, owned_games)
+        except ProtocolError as e:
+            reply = {'ok': False, 'error': str(e)}
+        except Exception as e:
+            logging.error(f"Error handling request: {e}")
+            reply = {'ok': False, 'error': "Internal server error"}
+        if request_id is not None:
+            reply['id'] = request_id
+        return reply
+
+    async def dispatch(self, request: Dict, owned_games: set) -> Dict:
+        """Run a decoded request and return the reply"""
+        op = request.get('op')
+        if op == 'new':
+            game = await self.new_game(request, owned_games)
+        elif op == 'move':
+            game = self._owned_game(request, owned_games)
+            move = self._parse_move(request)
+            if not await self._on_writer(game.make_move, *move):
+                raise ProtocolError(f"Invalid move: {move[2]} at ({move[0]}, {move[1]})")
+            await self.play_computer_turns(game)
+        elif op == 'state':
+            game = self._owned_game(request, owned_games)
+        elif op == 'close':
+            game = self._owned_game(request, owned_games)
+            await self._on_writer(game.stop)
+            owned_games.discard(game.game_id)
+            self.games.pop(game.game_id, None)
+        else:
+            raise ProtocolError(f"Unknown op: {op}")
+        return {'ok': True, 'state': await self._on_writer(game_state, game)}
+
+    async def new_game(self, request: Dict, owned_games: set) -> GameLogic:
+        """Create a game and let computer players make any opening moves"""
+        size = request.get('size', 3)
+        mode = request.get('mode', "Simple")
+        blue = request.get('blue', "human")
+        red = request.get('red', "human")
+        if not _is_int(size) or not 3 <= size <= MAX_BOARD_SIZE:
+            raise ProtocolError(f"Board size must be an integer from 3 to {MAX_BOARD_SIZE}")
+        if mode not in VALID_MODES:
+            raise ProtocolError(f"Invalid game mode: {mode}")
+        if blue not in VALID_PLAYER_TYPES or red not in VALID_PLAYER_TYPES:
+            raise ProtocolError(f"Invalid player type: {blue if blue not in VALID_PLAYER_TYPES else red}")
+
+        game = await self._on_writer(GameLogic, size, mode, blue, red, self.db)
+        self.games[game.game_id] = game
+        owned_games.add(game.game_id)
+        await self.play_computer_turns(game)
+        return game
+
+    async def play_computer_turns(self, game: GameLogic):
+        """Play computer moves until a human is to move or the game ends"""
+        loop = asyncio.get_running_loop()
+        while True:
+            turn = await self._on_writer(self._computer_turn, game)
+            if turn is None:
+                return
+            computer, board = turn
+            move = await loop.run_in_executor(self.ai_executor, computer.make_move, board)
+            if move is None or not await self._on_writer(game.make_move, *move):
+                logging.error(f"Computer produced an invalid move {move} in game {game.game_id}")
+                await self._on_writer(game.stop)
+                raise ProtocolError("Computer player failed to move")
+
+    def _computer_turn(self, game: GameLogic) -> Optional[Tuple]:
+        """Return the computer to move and a board snapshot, or None"""
+        if game.game_over or game.stopped or not game.is_computer_turn():
+            return None
+        if game.board.is_full():
+            game.game_over = True
+            game._determine_winner()
+            return None
+        return game.players[game.board.current_player], game.board.copy()
+
+    def _owned_game(self, request: Dict, owned_games: set) -> GameLogic:
+        game_id = request.get('game_id')
+        if game_id not in owned_games or game_id not in self.games:
+            raise ProtocolError(f"Unknown game: {game_id}")
+        return self.games[game_id]
+
+    @staticmethod
+    def _parse_move(request: Dict) -> Tuple[int, int, str]:
+        row, col, letter = request.get('row'), request.get('col'), request.get('letter')
+        if not _is_int(row) or not _is_int(col) or letter not in ('S', 'O'):
+            raise ProtocolError("A move needs integer row/col and letter 'S' or 'O'")
+        return row, col, letter
+
+    async def _on_writer(self, func, *args):
+        """Run game-state and database work on the shared writer thread"""
+        return await asyncio.get_running_loop().run_in_executor(self.db_writer, func, *args)
+
+
+async def serve(args: argparse.Namespace):
+    server = SOSServer(
+        default_database(args.db),
+        ProcessPoolExecutor(max_workers=args.ai_workers) if args.ai_workers else ProcessPoolExecutor()
+    )
+    listener = await (server.start_unix(args.unix) if args.unix else server.start_tcp(args.host, args.port))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host concurrent SOS games over line-delimited JSON")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host to bind")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to bind")
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--db", default="sos_game.db",
+                        help="Storage shared by all sessions: a database file, log:PATH, memory or null")
+    parser.add_argument("--ai-workers", type=int, default=0, help="Computer player processes (default: CPU count)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""Storage backends for games, moves and SOS lines.
+
+GameStorage is the interface GameLogic, the server and the replay screen
+write to and read from. GameDatabase (SQLite) is the durable default; the
+backends here trade durability or queryability for speed:
+
+    MemoryStorage  keeps everything in dicts, for tests and short simulations
+    NullStorage    drops every write, for simulations that need no record
+    LogStorage     appends one JSON line per write to a file, for cheap durable sinks
+"""
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+from collections import namedtuple
+import itertools
+import json
+import sys
+import threading
+
+GAME_COLUMNS = ('game_id', 'board_size', 'game_mode', 'blue_player_type', 'red_player_type',
+                'winner', 'blue_score', 'red_score', 'timestamp')
+
+# Lightweight row form of query_games, in GAME_COLUMNS order
+GameRow = namedtuple('GameRow', GAME_COLUMNS)
+
+def format_game_rows(rows: List[Tuple], row_format: str) -> List[Any]:
+    """Convert game tuples in GAME_COLUMNS order to the query_games row format"""
+    if row_format == "tuple":
+        return rows
+    if row_format == "namedtuple":
+        return [GameRow._make(row) for row in rows]
+    if row_format == "dict":
+        return [dict(zip(GAME_COLUMNS, row)) for row in rows]
+    raise ValueError(f"Unknown row format: {row_format}")
+
+def _timestamp() -> str:
+    # Same format and UTC clock as SQLite's CURRENT_TIMESTAMP
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def _new_game(game_id: int, board_size: int, game_mode: str, blue_player_type: str,
+              red_player_type: str, timestamp: str) -> Dict:
+    return {'game_id': game_id, 'board_size': board_size, 'game_mode': game_mode,
+            'blue_player_type': blue_player_type, 'red_player_type': red_player_type,
+            'winner': None, 'blue_score': 0, 'red_score': 0, 'timestamp': timestamp}
+
+class GameStorage(ABC):
+    """Interface for game storage backends"""
+
+    @abstractmethod
+    def start_new_game(self, board_size: int, game_mode: str,
+                       blue_player_type: str, red_player_type: str) -> int:
+        """Start a new game and return its ID"""
+        pass
+
+    def start_new_games(self, count: int, board_size: int, game_mode: str,
+                        blue_player_type: str, red_player_type: str) -> List[int]:
+        """Start several games with the same settings and return their IDs"""
+        with self.transaction():
+            return [self.start_new_game(board_size, game_mode, blue_player_type, red_player_type)
+                    for _ in range(count)]
+
+    @abstractmethod
+    def save_move(self, game_id: int, player: str, row: int, col: int,
+                  letter: str, move_number: int):
+        """Save a move"""
+        pass
+
+    @abstractmethod
+    def save_sos_line(self, game_id: int, move_number: int, start_pos: List[int],
+                      end_pos: List[int], player: str):
+        """Save an SOS line"""
+        pass
+
+    @abstractmethod
+    def end_game(self, game_id: int, winner: str, blue_score: int, red_score: int):
+        """Record the final result of a game"""
+        pass
+
+    @abstractmethod
+    def get_recent_games(self, limit: int = 10) -> List[Dict]:
+        """Get the most recent games"""
+        pass
+
+    @abstractmethod
+    def get_game_moves(self, game_id: int) -> List[Dict]:
+        """Get all moves for a specific game"""
+        pass
+
+    @abstractmethod
+    def get_game_sos_lines(self, game_id: int) -> List[Dict]:
+        """Get all SOS lines for a specific game"""
+        pass
+
+    def query_games(self, limit: int = 50, after: Optional[Tuple[str, int]] = None,
+                    board_size: Optional[int] = None, game_mode: Optional[str] = None,
+                    winner: Optional[str] = None, blue_player_type: Optional[str] = None,
+                    red_player_type: Optional[str] = None, since: Optional[str] = None,
+                    until: Optional[str] = None, row_format: str = "dict") -> List[Any]:
+        """Get one page of games, newest first; see GameDatabase.query_games for the arguments.
+
+        This version filters every game in memory, which suits the small
+        unindexed backends; GameDatabase answers from its indexes instead.
+        """
+        format_game_rows([], row_format)  # Reject an unknown format before reading
+        filters = {'board_size': board_size, 'game_mode': game_mode, 'winner': winner,
+                   'blue_player_type': blue_player_type, 'red_player_type': red_player_type}
+        rows = []
+        for game in self.get_recent_games(limit=sys.maxsize):
+            if any(value is not None and game[column] != value for column, value in filters.items()):
+                continue
+            if (since is not None and game['timestamp'] < since) or (until is not None and game['timestamp'] >= until):
+                continue
+            if after is not None and (game['timestamp'], game['game_id']) >= tuple(after):
+                continue
+            rows.append(tuple(game[column] for column in GAME_COLUMNS))
+            if len(rows) == limit:
+                break
+        return format_game_rows(rows, row_format)
+
+    def get_game_replay(self, game_id: int) -> Tuple[List[Dict], List[Dict]]:
+        """Get (moves, sos_lines) for a game; backends that can fetch both at once override this"""
+        return self.get_game_moves(game_id), self.get_game_sos_lines(game_id)
+
+    def save_move_annotations(self, game_id: int, annotations: List[Dict]):
+        """Save the engine annotations of a game (see analysis); backends without a cache drop them"""
+
+    def get_move_annotations(self, game_id: int) -> Optional[List[Dict]]:
+        """Get the saved engine annotations of a game in move order, or None if it was never analysed"""
+        return None
+
+    def transaction(self) -> ContextManager:
+        """Group the enclosed writes; backends without transactions just run them"""
+        return nullcontext()
+
+    def flush(self):
+        """Make every earlier write durable"""
+
+    def close(self):
+        """Release the backend's resources"""
+
+    def __enter__(self) -> 'GameStorage':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class NullStorage(GameStorage):
+    """Discards every write; reads find nothing"""
+    def __init__(self):
+        self._game_ids = itertools.count(1)
+
+    def start_new_game(self, board_size: int, game_mode: str,
+                       blue_player_type: str, red_player_type: str) -> int:
+        # IDs stay unique so callers can still tell games apart
+        return next(self._game_ids)
+
+    def save_move(self, game_id: int, player: str, row: int, col: int,
+                  letter: str, move_number: int):
+        pass
+
+    def save_sos_line(self, game_id: int, move_number: int, start_pos: List[int],
+                      end_pos: List[int], player: str):
+        pass
+
+    def end_game(self, game_id: int, winner: str, blue_score: int, red_score: int):
+        pass
+
+    def get_recent_games(self, limit: int = 10) -> List[Dict]:
+        return []
+
+    def get_game_moves(self, game_id: int) -> List[Dict]:
+        return []
+
+    def get_game_sos_lines(self, game_id: int) -> List[Dict]:
+        return []
+
+class MemoryStorage(GameStorage):
+    """Keeps games, moves and SOS lines in process memory"""
+    def __init__(self):
+        self._games: Dict[int, Dict] = {}
+        self._moves: Dict[int, List[Dict]] = {}
+        self._sos_lines: Dict[int, List[Dict]] = {}
+        self._annotations: Dict[int, List[Dict]] = {}
+        self._lock = threading.Lock()
+        self._game_ids = itertools.count(1)
+
+    def start_new_game(self, board_size: int, game_mode: str,
+                       blue_player_type: str, red_player_type: str) -> int:
+        with self._lock:
+            game_id = next(self._game_ids)
+            self._games[game_id] = _new_game(game_id, board_size, game_mode, blue_player_type,
+                                             red_player_type, _timestamp())
+            self._moves[game_id] = []
+            self._sos_lines[game_id] = []
+        return game_id
+
+    def save_move(self, game_id: int, player: str, row: int, col: int,
+                  letter: str, move_number: int):
+        with self._lock:
+            self._moves.setdefault(game_id, []).append(
+                {'player': player, 'row': row, 'col': col, 'letter': letter, 'move_number': move_number})
+
+    def save_sos_line(self, game_id: int, move_number: int, start_pos: List[int],
+                      end_pos: List[int], player: str):
+        with self._lock:
+            self._sos_lines.setdefault(game_id, []).append(
+                {'move_number': move_number, 'start_pos': list(start_pos),
+                 'end_pos': list(end_pos), 'player': player})
+
+    def end_game(self, game_id: int, winner: str, blue_score: int, red_score: int):
+        with self._lock:
+            if game_id in self._games:
+                self._games[game_id].update(winner=winner, blue_score=blue_score, red_score=red_score)
+
+    def get_recent_games(self, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            games = sorted(self._games.values(), key=lambda game: (game['timestamp'], game['game_id']),
+                           reverse=True)
+            return [dict(game) for game in games[:limit]]
+
+    def get_game_moves(self, game_id: int) -> List[Dict]:
+        with self._lock:
+            moves = sorted(self._moves.get(game_id, []), key=lambda move: move['move_number'])
+            return [dict(move) for move in moves]
+
+    def get_game_sos_lines(self, game_id: int) -> List[Dict]:
+        with self._lock:
+            lines = sorted(self._sos_lines.get(game_id, []), key=lambda line: line['move_number'])
+            return [dict(line) for line in lines]
+
+    def save_move_annotations(self, game_id: int, annotations: List[Dict]):
+        with self._lock:
+            self._annotations[game_id] = [dict(annotation) for annotation in annotations]
+
+    def get_move_annotations(self, game_id: int) -> Optional[List[Dict]]:
+        with self._lock:
+            annotations = self._annotations.get(game_id)
+            return [dict(annotation) for annotation in annotations] if annotations is not None else None
+
+class LogStorage(GameStorage):
+    """Appends every write to a JSON-lines log file.
+
+    Writes are buffered appends with no index, so they are about as cheap as
+    durable storage gets. Reads scan the whole log, which suits occasional
+    replays and offline analysis rather than browsing.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        last_id = 0
+        for record in self._records():
+            if record['op'] == 'start':
+                last_id = max(last_id, record['game_id'])
+        self._game_ids = itertools.count(last_id + 1)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _records(self) -> Iterator[Dict]:
+        try:
+            with open(self.path, encoding='utf-8') as log:
+                for line in log:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def _append(self, record: Dict):
+        with self._lock:
+            self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def start_new_game(self, board_size: int, game_mode: str,
+                       blue_player_type: str, red_player_type: str) -> int:
+        with self._lock:
+            game_id = next(self._game_ids)
+        self._append({'op': 'start', **_new_game(game_id, board_size, game_mode, blue_player_type,
+                                                 red_player_type, _timestamp())})
+        return game_id
+
+    def save_move(self, game_id: int, player: str, row: int, col: int,
+                  letter: str, move_number: int):
+        self._append({'op': 'move', 'game_id': game_id, 'player': player, 'row': row, 'col': col,
+                      'letter': letter, 'move_number': move_number})
+
+    def save_sos_line(self, game_id: int, move_number: int, start_pos: List[int],
+                      end_pos: List[int], player: str):
+        self._append({'op': 'sos_line', 'game_id': game_id, 'move_number': move_number,
+                      'start_pos': list(start_pos), 'end_pos': list(end_pos), 'player': player})
+
+    def end_game(self, game_id: int, winner: str, blue_score: int, red_score: int):
+        self._append({'op': 'end', 'game_id': game_id, 'winner': winner,
+                      'blue_score': blue_score, 'red_score': red_score})
+
+    def get_recent_games(self, limit: int = 10) -> List[Dict]:
+        self.flush()
+        games: Dict[int, Dict] = {}
+        for record in self._records():
+            if record['op'] == 'start':
+                games[record['game_id']] = {key: value for key, value in record.items() if key != 'op'}
+            elif record['op'] == 'end' and record['game_id'] in games:
+                games[record['game_id']].update(winner=record['winner'], blue_score=record['blue_score'],
+                                                red_score=record['red_score'])
+        ordered = sorted(games.values(), key=lambda game: (game['timestamp'], game['game_id']), reverse=True)
+        return ordered[:limit]
+
+    def get_game_moves(self, game_id: int) -> List[Dict]:
+        return self._game_records('move', game_id)
+
+    def get_game_sos_lines(self, game_id: int) -> List[Dict]:
+        return self._game_records('sos_line', game_id)
+
+    def _game_records(self, op: str, game_id: int) -> List[Dict]:
+        self.flush()
+        records = [{key: value for key, value in record.items() if key not in ('op', 'game_id')}
+                   for record in self._records()
+                   if record['op'] == op and record['game_id'] == game_id]
+        return sorted(records, key=lambda record: record['move_number'])
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
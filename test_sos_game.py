@@ -1,7 +1,36 @@
 import unittest
-from sos_game_logic import GameLogic, GameBoard
+import asyncio
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sos_game_logic import COMPUTER_MOVE_DELAY, GameLogic, GameBoard, get_ticks
 from player import SimpleComputerPlayer, AdvancedComputerPlayer
+from database import GameDatabase, GameRow, WriteBehindDatabase, open_storage
+from storage import LogStorage, MemoryStorage, NullStorage
+from sos_server import SOSServer
+from game_manager import GameManager
+import dataset
+import archive
+from retention import apply_retention
+from replay import GamePager, ReplayCache, ReplayTimeline
+from analysis import GameAnalyzer, analyse_moves
+from text_cache import TextCache
+from viewport import BoardViewport
+from shards import SHARD_ID_SPAN, ShardedDatabase, shard_of
+from game_record import encode_moves, decode_moves
+import sqlite3
+from migrations import MIGRATIONS
+from perft import perft
+from engine import ReferenceEngine
+from fuzz import fuzz
 import pygame
+import sos_game_ui
 
 class TestGameLogicInitialization(unittest.TestCase):
 
@@ -33,6 +62,26 @@ class TestGameLogicInitialization(unittest.TestCase):
         game_logic = GameLogic(3, "General")
         self.assertEqual(game_logic.game_mode, "General")
 
+class TestLazyStartup(unittest.TestCase):
+    def _run(self, code):
+        """Run code in a fresh interpreter, so modules this test file imports do not count"""
+        env = dict(os.environ, SDL_VIDEODRIVER="dummy")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), env=env, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.split()[-1]
+
+    def test_logic_import_skips_pygame_and_database(self):
+        """Test that importing the game logic pulls in neither pygame nor the database"""
+        code = "import sys, sos_game_logic; print('pygame' in sys.modules or 'database' in sys.modules)"
+        self.assertEqual(self._run(code), "False")
+
+    def test_ui_import_opens_nothing(self):
+        """Test that importing the UI neither starts the display nor loads fonts"""
+        code = ("import pygame, sos_game_ui as ui; "
+                "print(pygame.display.get_init() or ui.screen is not None or ui.font.cache_info().currsize > 0)")
+        self.assertEqual(self._run(code), "False")
+
 class TestGamePlay(unittest.TestCase):
 
     def test_start_game_4x4_simple(self):
@@ -272,7 +321,7 @@ class TestComputerPlayer(unittest.TestCase):
         
         # Set pending computer move
         game_logic.pending_computer_move = True
-        game_logic.computer_move_timer = pygame.time.get_ticks()
+        game_logic.computer_move_timer = get_ticks()
         
         # Update immediately - should not make move
         game_logic.update()
@@ -283,5 +332,951 @@ class TestComputerPlayer(unittest.TestCase):
         game_logic.update()
         self.assertFalse(game_logic.pending_computer_move)
 
+    def test_computer_move_due_in(self):
+        """Test that the time until the pending computer move counts down, so an idle UI knows when to wake"""
+        game_logic = GameLogic(3, "General", "human", "simple_computer", db="null")
+        self.assertIsNone(game_logic.computer_move_due_in())  # Human to move
+
+        game_logic.make_move(0, 0, 'S')
+        self.assertLessEqual(game_logic.computer_move_due_in(), COMPUTER_MOVE_DELAY)
+        game_logic.computer_move_timer -= COMPUTER_MOVE_DELAY + 1
+        self.assertEqual(game_logic.computer_move_due_in(), 0)
+        game_logic.update()
+        self.assertIsNone(game_logic.computer_move_due_in())
+
+    def test_update_plays_due_moves_within_budget(self):
+        """Test that with no move delay update keeps playing within its time budget, but a delay still paces moves"""
+        turbo = GameLogic(5, "General", "simple_computer", "simple_computer", db="null", move_delay=0)
+        self.assertEqual(turbo.update(), 1)
+        self.assertEqual(turbo.update(10_000), 24)  # Every remaining move
+        self.assertTrue(turbo.game_over)
+        self.assertEqual(turbo.update(10_000), 0)
+
+        paced = GameLogic(5, "General", "simple_computer", "simple_computer", db="null")
+        paced.computer_move_timer -= COMPUTER_MOVE_DELAY
+        self.assertEqual(paced.update(10_000), 1)  # The next move is not due yet
+        self.assertEqual(paced.move_count, 1)
+
+    def test_update_does_not_wait_past_budget_for_executor_moves(self):
+        """Test that a move chosen in an executor is played once ready, without update blocking on it"""
+        thinking = threading.Event()
+
+        class SlowPlayer(SimpleComputerPlayer):
+            def make_move(self, board):
+                thinking.wait(5)
+                return super().make_move(board)
+
+        players = {'Blue': SlowPlayer('Blue'), 'Red': SimpleComputerPlayer('Red')}
+        game = GameLogic(4, "General", "simple_computer", "simple_computer", db="null",
+                         players=players, move_delay=0)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            start = get_ticks()
+            self.assertEqual(game.update(10, executor), 0)
+            self.assertLess(get_ticks() - start, 1000)
+            self.assertTrue(game.pending_computer_move)
+            thinking.set()
+            while not game.game_over:
+                game.update(10_000, executor)
+        self.assertEqual(game.move_count, 16)
+
+class TestGameServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "server.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _run_session(self, requests):
+        """Send requests over TCP to a fresh server and return the replies"""
+        async def session():
+            server = SOSServer(GameDatabase(self.db_path), ThreadPoolExecutor(max_workers=2))
+            listener = await server.start_tcp("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            replies = []
+            for request in requests:
+                if callable(request):
+                    request = request(replies)
+                writer.write(json.dumps(request).encode() + b"\n")
+                await writer.drain()
+                replies.append(json.loads(await reader.readline()))
+            writer.close()
+            await server.close()
+            return replies
+        return asyncio.run(session())
+
+    def test_human_move_gets_computer_reply(self):
+        """Test that a human move is answered by the computer opponent"""
+        replies = self._run_session([
+            {"op": "new", "size": 3, "mode": "General", "red": "simple_computer", "id": 1},
+            lambda r: {"op": "move", "game_id": r[0]['state']['game_id'], "row": 0, "col": 0, "letter": "S"}
+        ])
+        self.assertTrue(replies[0]['ok'])
+        self.assertEqual(replies[0]['id'], 1)
+        state = replies[1]['state']
+        filled = sum(1 for row in state['board'] for cell in row if cell)
+        self.assertEqual(filled, 2)
+        self.assertEqual(state['current_player'], 'Blue')
+
+    def test_ai_vs_ai_game_plays_to_completion(self):
+        """Test that a computer-only game finishes when created"""
+        replies = self._run_session([
+            {"op": "new", "size": 4, "mode": "General", "blue": "simple_computer", "red": "simple_computer"}
+        ])
+        self.assertTrue(replies[0]['state']['game_over'])
+
+    def test_errors_are_reported(self):
+        """Test that bad requests produce error replies without closing the session"""
+        replies = self._run_session([
+            {"op": "move", "game_id": 12345, "row": 0, "col": 0, "letter": "S"},
+            {"op": "new", "mode": "Blitz"},
+            {"op": "new"},
+            lambda r: {"op": "move", "game_id": r[2]['state']['game_id'], "row": 9, "col": 9, "letter": "S"}
+        ])
+        self.assertEqual([reply['ok'] for reply in replies], [False, False, True, False])
+
+    def test_board_size_and_coordinates_are_validated(self):
+        """Test that oversized boards and boolean sizes or coordinates are rejected"""
+        replies = self._run_session([
+            {"op": "new", "size": 100000},
+            {"op": "new", "size": True},
+            {"op": "new", "size": 30},
+            lambda r: {"op": "move", "game_id": r[2]['state']['game_id'], "row": False, "col": 0, "letter": "S"}
+        ])
+        self.assertEqual([reply['ok'] for reply in replies], [False, False, True, False])
+        self.assertIn("30", replies[0]['error'])
+
+    def test_close_with_connected_client(self):
+        """Test that closing the server ends live sessions and stops their games without errors"""
+        async def session():
+            server = SOSServer(GameDatabase(self.db_path), ThreadPoolExecutor(max_workers=2))
+            listener = await server.start_tcp("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(json.dumps({"op": "new"}).encode() + b"\n")
+            await writer.drain()
+            game = server.games[json.loads(await reader.readline())['state']['game_id']]
+            await server.close()
+            self.assertEqual(await reader.read(), b"")  # The server hung up
+            writer.close()
+            return game
+        with self.assertNoLogs(level="ERROR"):
+            game = asyncio.run(session())
+        self.assertTrue(game.stopped)
+
+class TestGameManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.manager = GameManager(GameDatabase(os.path.join(self.tmpdir.name, "manager.db")))
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmpdir.cleanup()
+
+    def test_games_share_resources(self):
+        """Test that managed games share one database and player objects"""
+        games = self.manager.create_games(50, 4, "General", "simple_computer", "smart_computer")
+        self.assertEqual(len({game.game_id for game in games}), 50)
+        self.assertTrue(all(game.db is self.manager.db for game in games))
+        self.assertTrue(all(game.players['Red'] is games[0].players['Red'] for game in games))
+
+    def test_run_finishes_ai_games(self):
+        """Test that stepping plays every computer-only game to the end"""
+        games = self.manager.create_games(20, 3, "General", "simple_computer", "simple_computer")
+        self.assertEqual(self.manager.step(), 20)
+        self.manager.run()
+        self.assertTrue(all(game.game_over for game in games))
+        self.assertEqual(self.manager.pending_games(), [])
+
+    def test_step_answers_human_moves(self):
+        """Test that a step makes exactly one computer reply per waiting game"""
+        game = self.manager.create_game(3, "Simple", "human", "simple_computer")
+        self.assertEqual(self.manager.step(), 0)
+        game.make_move(1, 1, 'S')
+        self.assertEqual(self.manager.step(), 1)
+        self.assertEqual(game.get_current_player(), 'Blue')
+        self.assertFalse(game.pending_computer_move)
+
+class TestPositionDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "positions.npy")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_stored_game_round_trip(self):
+        """Test that a stored game is written as one record per move with its outcome"""
+        db = GameDatabase(os.path.join(self.tmpdir.name, "dataset.db"))
+        game_logic = GameLogic(3, "Simple", db=db)
+        for move in [(0, 0, 'S'), (1, 1, 'S'), (0, 1, 'O'), (2, 2, 'O'), (0, 2, 'S')]:
+            game_logic.make_move(*move)
+
+        count = dataset.write_dataset(self.path, 3, dataset.stored_games(db, 3), chunk_records=2)
+        records = list(dataset.iter_records(self.path))
+        self.assertEqual(count, 5)
+        self.assertEqual(dataset.read_header(self.path), (3, 5))
+        self.assertEqual(records[0]['board'], [['', '', ''], ['', '', ''], ['', '', '']])
+        self.assertEqual(records[4]['board'][0], ['S', 'O', ''])
+        self.assertEqual(records[4]['board'][2], ['', '', 'O'])
+        self.assertEqual((records[4]['row'], records[4]['col'], records[4]['letter']), (0, 2, 'S'))
+        self.assertEqual(records[4]['player'], 'Blue')
+        self.assertTrue(all(record['outcome'] == 1 for record in records))
+
+    def test_simulated_games_are_fixed_width(self):
+        """Test that simulated games produce a file of fixed-width records"""
+        count = dataset.write_dataset(self.path, 4, dataset.simulated_games(10, 4, "General", seed=7))
+        self.assertEqual(count, 160)
+        header_length = len(dataset._npy_header(4, 0))
+        self.assertEqual(header_length % 64, 0)
+        self.assertEqual(os.path.getsize(self.path), header_length + count * dataset.record_size(4))
+
+    def test_seeded_simulation_leaves_global_random_alone(self):
+        """Test that a seed reproduces the same games without reseeding the random module"""
+        random.seed(1)
+        expected = random.random()
+        random.seed(1)
+        games = list(dataset.simulated_games(5, 4, "General", "simple_computer", "smart_computer", seed=7))
+        self.assertEqual(random.random(), expected)
+        self.assertEqual(list(dataset.simulated_games(5, 4, "General", "simple_computer", "smart_computer", seed=7)),
+                         games)
+
+class TestPerft(unittest.TestCase):
+    def test_known_counts_3x3_simple(self):
+        """Test perft counts against hand-computed values"""
+        result = perft(3, "Simple", 3, workers=1)
+        self.assertEqual(result.nodes, [1, 18, 288, 4032])
+        # 8 lines, each completed by Blue on ply 3 in 3! cell orders
+        self.assertEqual(result.terminals, [0, 0, 0, 48])
+        self.assertEqual(result.outcomes, {'Blue': 48, 'Red': 0, 'Draw': 0})
+
+    def test_parallel_matches_serial(self):
+        """Test that splitting the tree across processes gives identical counts"""
+        serial = perft(3, "General", 4, workers=1)
+        parallel = perft(3, "General", 4, workers=2, split_depth=2)
+        self.assertEqual(parallel, serial)
+
+class ExtraTurnEngine(ReferenceEngine):
+    """Engine with a deliberate rule bug: an SOS in a General game grants another turn"""
+    def play(self, row, col, letter):
+        result = super().play(row, col, letter)
+        if result[0] and self.game_mode == "General":
+            self.board.switch_player()
+        return result
+
+class TestDifferentialFuzz(unittest.TestCase):
+    def test_reference_agrees_with_itself(self):
+        """Test that fuzzing the reference against itself finds nothing"""
+        report = fuzz(ReferenceEngine, games=300, workers=2)
+        self.assertIsNone(report.divergence)
+        self.assertEqual(report.games, 300)
+
+    def test_divergence_is_minimized(self):
+        """Test that a rule bug is reported as the shortest sequence that shows it"""
+        report = fuzz(ExtraTurnEngine, games=300, modes=("General",), workers=1)
+        divergence = report.divergence
+        self.assertIsNotNone(divergence)
+        self.assertEqual(len(divergence.moves), 3)
+        self.assertIn("current player", divergence.detail)
+
+class TestGameDatabase(unittest.TestCase):
+    def test_in_memory_round_trip(self):
+        """Test that an in-memory database keeps its data across calls"""
+        with GameDatabase(":memory:") as db:
+            game_id = db.start_new_game(3, "General", "human", "human")
+            db.save_move(game_id, 'Blue', 0, 0, 'S', 1)
+            db.save_sos_line(game_id, 1, [0, 0], [0, 2], 'Blue')
+            db.end_game(game_id, 'Blue', 1, 0)
+            self.assertEqual(db.get_game_moves(game_id)[0]['letter'], 'S')
+            self.assertEqual(db.get_game_sos_lines(game_id)[0]['end_pos'], [0, 2])
+            self.assertEqual(db.get_recent_games()[0]['winner'], 'Blue')
+
+    def test_file_database_uses_one_wal_connection(self):
+        """Test that a file database reuses one WAL-mode connection per thread"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with GameDatabase(os.path.join(tmpdir, "wal.db")) as db:
+                conn = db._connection()
+                db.start_new_game(3, "Simple", "human", "human")
+                self.assertIs(db._connection(), conn)
+                self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+
+    def test_transaction_rolls_back_on_error(self):
+        """Test that a failed transaction leaves no partial writes"""
+        db = GameDatabase(":memory:")
+        game_id = db.start_new_game(3, "Simple", "human", "human")
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                db.save_move(game_id, 'Blue', 0, 0, 'S', 1)
+                raise RuntimeError("abort")
+        self.assertEqual(db.get_game_moves(game_id), [])
+        db.close()
+        with self.assertRaises(Exception):
+            db.get_game_moves(game_id)
+
+class TestWriteBehindDatabase(unittest.TestCase):
+    def test_reads_see_queued_writes(self):
+        """Test that reads flush queued writes first and keep their order"""
+        with WriteBehindDatabase(GameDatabase(":memory:"), max_pending=2, batch_size=3) as db:
+            game_id = db.start_new_game(4, "General", "human", "human")
+            for move_number in range(1, 11):
+                db.save_move(game_id, 'Blue', move_number // 4, move_number % 4, 'S', move_number)
+            db.end_game(game_id, 'Draw', 0, 0)
+            moves = db.get_game_moves(game_id)
+            self.assertEqual([move['move_number'] for move in moves], list(range(1, 11)))
+            self.assertEqual(db.get_recent_games()[0]['winner'], 'Draw')
+
+    def test_transaction_queues_writes_together(self):
+        """Test that a transaction's writes reach the database together, or not at all if it raises"""
+        with WriteBehindDatabase(GameDatabase(":memory:"), batch_size=2) as db:
+            game_id = db.start_new_game(4, "General", "human", "human")
+            with db.transaction():
+                for move_number in range(1, 6):
+                    db.save_move(game_id, 'Blue', 0, move_number % 4, 'S', move_number)
+                db.flush()
+                self.assertEqual(db.db.get_game_moves(game_id), [])
+            self.assertEqual(len(db.get_game_moves(game_id)), 5)
+            with self.assertRaises(RuntimeError):
+                with db.transaction():
+                    db.save_move(game_id, 'Red', 1, 0, 'O', 6)
+                    raise RuntimeError("abort")
+            self.assertEqual(len(db.get_game_moves(game_id)), 5)
+
+    def test_game_saves_each_sos_line_once(self):
+        """Test that a move forming two SOS lines saves both, and later moves save none"""
+        db = WriteBehindDatabase(GameDatabase(":memory:"))
+        game_logic = GameLogic(3, "General", db=db)
+        for move in [(0, 2, 'S'), (2, 0, 'S'), (0, 1, 'O'), (1, 0, 'O'), (0, 0, 'S'), (2, 2, 'S')]:
+            game_logic.make_move(*move)
+        game_logic.stop()
+        lines = db.get_game_sos_lines(game_logic.game_id)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all(line['move_number'] == 5 for line in lines))
+        db.close()
+
+class TestMigrations(unittest.TestCase):
+    def test_legacy_database_is_upgraded_once(self):
+        """Test that a database created before migrations gets versioned and indexed"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "legacy.db")
+            conn = sqlite3.connect(path)
+            conn.execute('''CREATE TABLE games (game_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                board_size INTEGER NOT NULL, game_mode TEXT NOT NULL, blue_player_type TEXT NOT NULL,
+                red_player_type TEXT NOT NULL, winner TEXT, blue_score INTEGER DEFAULT 0,
+                red_score INTEGER DEFAULT 0, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+            conn.execute("INSERT INTO games (board_size, game_mode, blue_player_type, red_player_type) "
+                         "VALUES (3, 'Simple', 'human', 'human')")
+            conn.commit()
+            conn.close()
+
+            with GameDatabase(path) as db:
+                self.assertEqual(db.get_schema_version(), MIGRATIONS[-1][0])
+                self.assertEqual(len(db.get_recent_games()), 1)
+            with GameDatabase(path) as db:
+                rows = db._connection().execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+                self.assertEqual(rows, len(MIGRATIONS))
+
+    def test_move_lookups_use_index(self):
+        """Test that loading a game's moves is an index search, not a table scan"""
+        with GameDatabase(":memory:") as db:
+            plan = db._connection().execute(
+                "EXPLAIN QUERY PLAN SELECT player, row, col, letter, move_number FROM moves "
+                "WHERE game_id = ? ORDER BY move_number", (1,)).fetchall()
+            self.assertIn("idx_moves_game", " ".join(str(step[-1]) for step in plan))
+
+class TestGameHistoryQuery(unittest.TestCase):
+    def test_keyset_pages_cover_every_game_once(self):
+        """Test that paging with after visits all games newest first without repeats"""
+        with GameDatabase(":memory:") as db:
+            game_ids = db.start_new_games(7, 3, "Simple", "human", "computer")
+            seen = []
+            after = None
+            while True:
+                page = db.query_games(limit=3, after=after, row_format="namedtuple")
+                if not page:
+                    break
+                self.assertIsInstance(page[0], GameRow)
+                seen += [row.game_id for row in page]
+                after = (page[-1].timestamp, page[-1].game_id)
+            self.assertEqual(seen, sorted(game_ids, reverse=True))
+
+    def test_filters_combine(self):
+        """Test that every given filter must match"""
+        with GameDatabase(":memory:") as db:
+            blue_win = db.start_new_game(3, "Simple", "human", "human")
+            db.end_game(blue_win, "Blue", 1, 0)
+            red_win = db.start_new_game(3, "General", "human", "human")
+            db.end_game(red_win, "Red", 0, 2)
+            db.start_new_game(5, "Simple", "computer", "human")
+
+            self.assertEqual([g['game_id'] for g in db.query_games(board_size=3, winner="Blue")], [blue_win])
+            self.assertEqual(len(db.query_games(blue_player_type="human", row_format="tuple")), 2)
+            self.assertEqual(db.query_games(game_mode="General", since="1970-01-01 00:00:00")[0]['winner'], "Red")
+            self.assertEqual(db.query_games(until="1970-01-01 00:00:00"), [])
+
+class TestGameStats(unittest.TestCase):
+    def _finish(self, db, size, mode, blue_type, red_type, winner, blue_score=0, red_score=0):
+        game_id = db.start_new_game(size, mode, blue_type, red_type)
+        db.end_game(game_id, winner, blue_score, red_score)
+        return game_id
+
+    def test_end_game_updates_summary_once(self):
+        """Test that ending a game twice counts it once, with its latest result"""
+        with GameDatabase(":memory:") as db:
+            game_id = self._finish(db, 3, "General", "human", "computer", "Blue", 2, 1)
+            db.end_game(game_id, "Red", 1, 2)
+            db.start_new_game(3, "General", "human", "computer")  # Unfinished games are not counted
+            totals = db.get_stats()[0]
+            self.assertEqual((totals['games'], totals['blue_wins'], totals['red_wins']), (1, 0, 1))
+            self.assertEqual((totals['blue_score'], totals['red_score']), (1, 2))
+
+    def test_grouping_and_rebuild(self):
+        """Test grouped totals, and that a rebuild reproduces the incremental counts"""
+        with GameDatabase(":memory:") as db:
+            self._finish(db, 3, "Simple", "computer", "human", "Blue")
+            self._finish(db, 3, "Simple", "human", "human", None)
+            self._finish(db, 5, "General", "computer", "human", "Red", 0, 3)
+            by_blue = db.get_stats(group_by=('blue_player_type',))
+            self.assertEqual([(row['blue_player_type'], row['games']) for row in by_blue],
+                             [('computer', 2), ('human', 1)])
+            self.assertEqual(db.get_stats(board_size=3)[0]['draws'], 1)
+
+            incremental = db.get_stats(group_by=('board_size', 'game_mode'))
+            db.rebuild_stats()
+            self.assertEqual(db.get_stats(group_by=('board_size', 'game_mode')), incremental)
+            with self.assertRaises(ValueError):
+                db.get_stats(group_by=('winner',))
+
+class TestStorageBackends(unittest.TestCase):
+    MOVES = [(0, 0, 'S'), (0, 1, 'O'), (0, 2, 'S')]
+
+    def _play(self, storage):
+        game = GameLogic(3, "General", db=storage)
+        for move in self.MOVES:
+            game.make_move(*move)
+        return game.game_id
+
+    def test_backends_read_back_what_sqlite_does(self):
+        """Test that the memory and log backends store the same records as SQLite"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_path = os.path.join(tmpdir, "games.log")
+            with GameDatabase(":memory:") as sqlite_db, MemoryStorage() as memory, LogStorage(log_path) as log:
+                expected_id = self._play(sqlite_db)
+                expected = (sqlite_db.get_game_moves(expected_id), sqlite_db.get_game_sos_lines(expected_id))
+                for storage in (memory, log):
+                    game_id = self._play(storage)
+                    self.assertEqual((storage.get_game_moves(game_id), storage.get_game_sos_lines(game_id)), expected)
+                    self.assertEqual(storage.get_recent_games()[0]['game_id'], game_id)
+            # A reopened log continues its game IDs
+            with LogStorage(log_path) as log:
+                self.assertEqual(log.start_new_game(3, "Simple", "human", "human"), game_id + 1)
+
+    def test_null_storage_and_specs(self):
+        """Test that the null backend keeps nothing and that specs select backends"""
+        game = GameLogic(3, "Simple", db="null")
+        game.make_move(0, 0, 'S')
+        self.assertIsInstance(game.db, NullStorage)
+        self.assertEqual(game.db.get_game_moves(game.game_id), [])
+
+        self.assertIsInstance(open_storage("memory"), MemoryStorage)
+        with open_storage("sqlite::memory:") as db:
+            self.assertIsInstance(db, GameDatabase)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with WriteBehindDatabase(open_storage("log:" + os.path.join(tmpdir, "g.log"))) as db:
+                game_id = self._play(db)
+                self.assertEqual(len(db.get_game_moves(game_id)), len(self.MOVES))
+
+class TestGameArchive(unittest.TestCase):
+    def _play(self, db, moves, game_mode="General"):
+        game = GameLogic(3, game_mode, db=db)
+        for move in moves:
+            game.make_move(*move)
+        return game.game_id
+
+    def test_export_import_round_trip(self):
+        """Test that imported games match the exported ones under new IDs"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "games.jsonl.gz")
+            with GameDatabase(":memory:") as source, GameDatabase(":memory:", compact=True) as compact:
+                first = self._play(source, [(0, 0, 'S'), (0, 1, 'O'), (0, 2, 'S')], "Simple")
+                second = self._play(source, [(1, 1, 'O')])
+                self._play(compact, [(2, 0, 'S'), (2, 1, 'O'), (2, 2, 'S')])
+                self.assertEqual(archive.export_archive(source, path, chunk_size=1), 2)
+
+                self.assertEqual(archive.import_archive(compact, path), 2)
+                imported = [game['game_id'] for game in compact.query_games(limit=2)]
+                self.assertNotIn(first, imported)
+                for old_id, new_id in zip((second, first), imported):
+                    self.assertEqual(compact.get_game_moves(new_id), source.get_game_moves(old_id))
+                    self.assertEqual(compact.get_game_sos_lines(new_id), source.get_game_sos_lines(old_id))
+                self.assertEqual(compact.get_stats()[0]['games'], 1)  # Only the Simple game finished
+
+    def test_rejects_other_files(self):
+        """Test that a file without the archive header is refused"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "other.gz")
+            with gzip.open(path, 'wt') as other:
+                other.write('{"format": "something else"}\n')
+            with self.assertRaises(ValueError):
+                list(archive.read_archive(path))
+
+class TestRetention(unittest.TestCase):
+    def _finished_games(self, db, count):
+        game_ids = db.start_new_games(count, 3, "Simple", "human", "human")
+        for game_id in game_ids:
+            db.save_move(game_id, 'Blue', 0, 0, 'S', 1)
+            db.end_game(game_id, 'Blue', 0, 0)
+        return game_ids
+
+    def test_keeps_newest_games_and_archives_the_rest(self):
+        """Test that old finished games are archived and deleted while their stats survive a rebuild"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "old.jsonl.gz")
+            with GameDatabase(os.path.join(tmpdir, "games.db")) as db:
+                game_ids = self._finished_games(db, 7)
+                active = db.start_new_game(3, "Simple", "human", "human")
+                report = apply_retention(db, keep_games=3, archive_path=archive_path, batch_size=2)
+
+                self.assertEqual(report.retired, 5)
+                self.assertTrue(report.vacuumed)
+                kept = [game['game_id'] for game in db.query_games()]
+                self.assertEqual(kept, [active] + game_ids[-2:][::-1])
+                self.assertEqual([game['game_id'] for game, _, _ in archive.read_archive(archive_path)], game_ids[:5])
+                self.assertEqual(db.get_game_moves(game_ids[0]), [])
+                db.rebuild_stats()
+                self.assertEqual(db.get_stats()[0]['games'], 7)
+
+    def test_keep_days_spares_recent_games(self):
+        """Test that only games older than the age limit expire"""
+        with GameDatabase(":memory:") as db:
+            old, recent = self._finished_games(db, 2)
+            db._connection().execute("UPDATE games SET timestamp = datetime('now', '-40 days') WHERE game_id = ?", (old,))
+            self.assertEqual(db.expired_game_ids(keep_days=30), [old])
+            self.assertEqual(db.expired_game_ids(keep_games=1, keep_days=30), [old])
+            self.assertEqual(db.expired_game_ids(), [])
+
+    def test_get_game_records_for_sparse_ids(self):
+        """Test that records are read for scattered game IDs, past one IN lookup's worth"""
+        with GameDatabase(":memory:") as db:
+            game_ids = self._finished_games(db, 1201)
+            db.save_move(game_ids[600], 'Red', 1, 1, 'O', 2)
+            wanted = game_ids[::2]
+            records = db.get_game_records(wanted)
+            self.assertEqual([game['game_id'] for game, _, _ in records], wanted)
+            self.assertTrue(all(len(moves) == 1 for _, moves, _ in records[:300]))
+            self.assertEqual(len(records[300][1]), 2)
+
+class TestShardedDatabase(unittest.TestCase):
+    def test_workers_write_disjoint_id_ranges(self):
+        """Test that each shard hands out IDs from its own range and routes writes there"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with ShardedDatabase(tmpdir, shard=0) as first, ShardedDatabase(tmpdir, shard=3) as second:
+                a = GameLogic(3, "Simple", db=first)
+                b = GameLogic(3, "Simple", db=second)
+                for game in (a, b):
+                    for move in [(0, 0, 'S'), (0, 1, 'O'), (0, 2, 'S')]:
+                        game.make_move(*move)
+                self.assertEqual((shard_of(a.game_id), shard_of(b.game_id)), (0, 3))
+                self.assertEqual(b.game_id, 3 * SHARD_ID_SPAN + 1)
+                self.assertEqual(second.writer.get_recent_games(), [game for game in second.get_recent_games()
+                                                                    if shard_of(game['game_id']) == 3])
+
+    def test_reader_merges_all_shards(self):
+        """Test that a reader without a shard sees every shard's games, moves and stats"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            game_ids = []
+            for shard in (1, 2):
+                with open_storage(f"shards:{tmpdir}:{shard}") as db:
+                    for _ in range(3):
+                        game_id = db.start_new_game(3, "Simple", "human", "human")
+                        db.save_move(game_id, 'Blue', 0, 0, 'S', 1)
+                        db.end_game(game_id, 'Blue', 0, 0)
+                        game_ids.append(game_id)
+
+            with open_storage(f"shards:{tmpdir}") as reader:
+                pages = []
+                after = None
+                while True:
+                    page = reader.query_games(limit=4, after=after)
+                    if not page:
+                        break
+                    pages += [game['game_id'] for game in page]
+                    after = (page[-1]['timestamp'], page[-1]['game_id'])
+                self.assertEqual(sorted(pages), sorted(game_ids))
+                self.assertEqual(len(reader.get_game_moves(game_ids[-1])), 1)
+                self.assertEqual(reader.get_stats()[0]['blue_wins'], 6)
+                self.assertEqual(len(list(reader.iter_game_records())), 6)
+                with self.assertRaises(ValueError):
+                    reader.start_new_game(3, "Simple", "human", "human")
+
+class TestReplayTimeline(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryStorage()
+        game = GameLogic(4, "General", db=self.db)
+        moves = [(0, 0, 'S'), (0, 1, 'O'), (0, 2, 'S'), (1, 1, 'S'), (2, 2, 'S'), (1, 2, 'O'),
+                 (3, 3, 'S'), (1, 0, 'O'), (2, 0, 'S'), (3, 0, 'O')]
+        for move in moves:
+            game.make_move(*move)
+        self.game = game
+        self.moves = self.db.get_game_moves(game.game_id)
+        self.sos_lines = self.db.get_game_sos_lines(game.game_id)
+
+    def test_every_position_matches_forward_replay(self):
+        """Test that seeking to any move gives the same board, lines and scores as playing up to it"""
+        for interval in (1, 3, 16):
+            timeline = ReplayTimeline(4, self.moves, self.sos_lines, snapshot_interval=interval)
+            board = GameBoard(4)
+            for index in range(len(self.moves) + 1):
+                if index:
+                    move = self.moves[index - 1]
+                    board.make_move(move['row'], move['col'], move['letter'])
+                position = timeline.position(index)
+                lines = [line for line in self.sos_lines if line['move_number'] <= index]
+                self.assertEqual(position.board.board, board.board)
+                self.assertEqual(len(position.sos_lines), len(lines))
+                self.assertEqual(position.blue_score, sum(line['player'] == 'Blue' for line in lines))
+                self.assertEqual(position.red_score, sum(line['player'] == 'Red' for line in lines))
+
+    def test_seek_is_clamped_and_ends_on_final_scores(self):
+        """Test that out-of-range seeks clamp and the last position has the game's final scores"""
+        timeline = ReplayTimeline(4, self.moves, self.sos_lines, snapshot_interval=4)
+        self.assertEqual(timeline.position(-5).move_index, 0)
+        end = timeline.position(10 ** 6)
+        self.assertEqual(end.move_index, len(self.moves))
+        self.assertEqual((end.blue_score, end.red_score), (self.game.board.blue_score, self.game.board.red_score))
+        self.assertGreater(end.blue_score + end.red_score, 0)
+
+class CountingStorage(MemoryStorage):
+    """MemoryStorage that counts replay loads"""
+    def __init__(self):
+        super().__init__()
+        self.replay_loads = 0
+
+    def get_game_replay(self, game_id):
+        self.replay_loads += 1
+        return super().get_game_replay(game_id)
+
+class TestReplayCache(unittest.TestCase):
+    def _play(self, db, game_mode="General"):
+        game = GameLogic(3, game_mode, db=db)
+        for move in [(0, 0, 'S'), (0, 1, 'O'), (0, 2, 'S'), (1, 1, 'O')]:
+            game.make_move(*move)
+        return {'game_id': game.game_id, 'board_size': 3}
+
+    def test_combined_query_matches_separate_reads(self):
+        """Test that get_game_replay returns what the two separate reads do, in both storage formats"""
+        for compact in (False, True):
+            with GameDatabase(":memory:", compact=compact) as db:
+                game_id = self._play(db)['game_id']
+                self.assertEqual(db.get_game_replay(game_id),
+                                 (db.get_game_moves(game_id), db.get_game_sos_lines(game_id)))
+                self.assertEqual(db.get_game_replay(game_id + 1), ([], []))
+
+    def test_prefetch_and_lru_eviction(self):
+        """Test that prefetched replays are served from the cache and old ones are evicted past the budget"""
+        db = CountingStorage()
+        games = [self._play(db) for _ in range(3)]
+        cache = ReplayCache(db)
+        try:
+            cache.prefetch(games)
+            timelines = [cache.get(game) for game in games]
+            self.assertEqual(db.replay_loads, 3)
+            self.assertIs(cache.get(games[0]), timelines[0])
+            self.assertEqual(db.replay_loads, 3)
+
+            cache.max_bytes = timelines[0].memory_estimate() * 2
+            cache.discard(games[1]['game_id'])
+            cache.get(games[1])  # Reloaded, which evicts the least recently used game
+            self.assertNotIn(games[2]['game_id'], cache)
+            self.assertIn(games[0]['game_id'], cache)
+        finally:
+            cache.close()
+
+    def test_get_does_not_wait_for_queued_prefetches(self):
+        """Test that getting a game queued behind a slow prefetch loads it at once"""
+        release, first_loaded = threading.Event(), threading.Event()
+        db = CountingStorage()
+        games = [self._play(db) for _ in range(3)]
+        first_load = db.get_game_replay
+        def slow_first_load(game_id):
+            if game_id == games[0]['game_id']:
+                release.wait(5)
+                first_loaded.set()
+            return first_load(game_id)
+        db.get_game_replay = slow_first_load
+        cache = ReplayCache(db)
+        try:
+            cache.prefetch(games)
+            timeline = cache.get(games[2])
+            self.assertFalse(first_loaded.is_set())  # Loaded while the first prefetch was still stuck
+            self.assertEqual(len(timeline), 4)
+            self.assertIs(cache.get(games[2]), timeline)
+            release.set()
+            self.assertEqual(len(cache.get(games[0])), 4)
+        finally:
+            release.set()
+            cache.close()
+
+class TestGamePager(unittest.TestCase):
+    def _fill(self, db, count):
+        for i in range(count):
+            game_id = db.start_new_game(3 + i % 2, "Simple" if i % 3 else "General", "Human", "Human")
+            db.end_game(game_id, "Blue" if i % 2 else "Red", 1, 0)
+
+    def test_rows_cover_history_with_bounded_pages(self):
+        """Test that pager rows match the full history in order while only a few pages stay loaded"""
+        with GameDatabase(":memory:") as db:
+            self._fill(db, 53)
+            expected = [game['game_id'] for game in db.get_recent_games(100)]
+            pager = GamePager(db, page_size=5, max_pages=2)
+            self.assertEqual([row.game_id for row in pager.rows(40, 8)], expected[40:48])
+            self.assertIsNone(pager.total)
+            seen = []
+            for start in range(0, 60, 7):
+                seen += [row.game_id for row in pager.rows(start, 7)]
+                self.assertLessEqual(len(pager._pages), 2)
+            self.assertEqual(seen, expected)
+            self.assertEqual(pager.total, 53)
+
+    def test_filters_on_sqlite_and_memory(self):
+        """Test that filtered pages agree between the indexed query and the in-memory fallback"""
+        for db in (GameDatabase(":memory:"), MemoryStorage()):
+            with db:
+                self._fill(db, 20)
+                pager = GamePager(db, page_size=3, filters={'board_size': 4, 'winner': "Blue"})
+                rows = pager.rows(0, 50)
+                self.assertEqual(len(rows), 10)
+                self.assertTrue(all(row.board_size == 4 and row.winner == "Blue" for row in rows))
+                pager.reset({'game_mode': "General"})
+                self.assertEqual(len(pager.rows(0, 50)), 7)
+                pager.reset({})
+                self.assertEqual(len(pager.rows(0, 50)), 20)
+
+class TestGameAnalysis(unittest.TestCase):
+    MOVES = [(0, 0, 'S', 1), (1, 1, 'O', 2), (0, 1, 'S', 3), (2, 2, 'S', 4)]
+
+    def test_annotations_find_missed_sos(self):
+        """Test that a move handing over an SOS is flagged and the missed SOS is the best alternative"""
+        annotations = analyse_moves(3, "General", self.MOVES)
+        self.assertEqual(annotations[0]['swing'], 0)
+        self.assertTrue(annotations[1]['handed_sos'])
+        missed = annotations[2]
+        self.assertEqual((missed['best_row'], missed['best_col'], missed['best_letter']), (2, 2, 'S'))
+        self.assertEqual((missed['value'], missed['best_value'], missed['swing']), (-1, 1, -2))
+        chunked = analyse_moves(3, "General", self.MOVES, 0, 3) + analyse_moves(3, "General", self.MOVES, 3)
+        self.assertEqual(chunked, annotations)
+
+    def test_analysis_runs_once_and_is_saved(self):
+        """Test that background analysis is saved and a later analyzer reads it instead of recomputing"""
+        with GameDatabase(":memory:") as db:
+            game_id = db.start_new_game(3, "General", "Human", "Human")
+            for row, col, letter, move_number in self.MOVES:
+                db.save_move(game_id, "Blue", row, col, letter, move_number)
+            game = {'game_id': game_id, 'board_size': 3, 'game_mode': "General"}
+            moves = db.get_game_moves(game_id)
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                analyzer = GameAnalyzer(db, executor=executor, chunk_moves=1)
+                analyzer.request(game, moves)
+                self.assertTrue(analyzer.wait(game_id, timeout=10))
+                analyzer.close()
+            expected = analyse_moves(3, "General", self.MOVES)
+            self.assertEqual(db.get_move_annotations(game_id), expected)
+            self.assertEqual(list(analyzer.annotations(game_id).values()), expected)
+
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.shutdown()  # Any analysis submitted now would fail
+                cached = GameAnalyzer(db, executor=executor)
+                cached.request(game, moves)
+                self.assertTrue(cached.wait(game_id, timeout=10))
+                self.assertEqual(cached.annotations(game_id), {a['move_number']: a for a in expected})
+                cached.close()
+
+class TestTextCache(unittest.TestCase):
+    def setUp(self):
+        pygame.font.init()
+        self.font = pygame.font.Font(None, 24)
+
+    def test_repeated_text_is_rendered_once(self):
+        """Test that the same font, text and colour share one surface"""
+        cache = TextCache()
+        first = cache.render(self.font, "S", (255, 255, 255))
+        self.assertIs(cache.render(self.font, "S", [255, 255, 255]), first)
+        self.assertIsNot(cache.render(self.font, "S", (255, 0, 0)), first)
+        self.assertIsNot(cache.render(pygame.font.Font(None, 32), "S", (255, 255, 255)), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_least_recently_used_text_is_evicted(self):
+        """Test that the cache stays within its bound and keeps recently used text"""
+        cache = TextCache(max_entries=3)
+        surfaces = {text: cache.render(self.font, text, (0, 0, 0)) for text in ("S", "O", "Blue")}
+        cache.render(self.font, "S", (0, 0, 0))  # Now the most recently used
+        cache.render(self.font, "Red", (0, 0, 0))
+        self.assertEqual(len(cache), 3)
+        self.assertIs(cache.render(self.font, "S", (0, 0, 0)), surfaces["S"])
+        self.assertIsNot(cache.render(self.font, "O", (0, 0, 0)), surfaces["O"])
+
+class TestBoardViewport(unittest.TestCase):
+    def setUp(self):
+        self.area = pygame.Rect(300, 150, 500, 450)
+
+    def test_fitted_board_fills_the_area(self):
+        """Test that a large board fits the area unzoomed and clicks map to the right cells"""
+        viewport = BoardViewport(30, self.area)
+        self.assertEqual(viewport.cell_size, 15)
+        self.assertEqual(viewport.visible_cells(), (range(30), range(30)))
+        self.assertEqual(viewport.cell_at(viewport.cell_center(29, 0)), (29, 0))
+        self.assertEqual(viewport.cell_at(viewport.cell_center(12, 17)), (12, 17))
+        self.assertIsNone(viewport.cell_at((self.area.left - 1, self.area.top)))
+        self.assertFalse(viewport.pan(40, 40))
+
+    def test_zoom_and_pan_keep_clicks_and_culling_consistent(self):
+        """Test that after zooming and panning only the cells in the area are visible and clickable"""
+        viewport = BoardViewport(30, self.area)
+        anchor = viewport.cell_center(10, 10)
+        self.assertTrue(viewport.zoom(4, anchor))
+        self.assertEqual(viewport.cell_size, 60)
+        self.assertEqual(viewport.cell_at(anchor), (10, 10))  # The cell under the anchor stays put
+        self.assertTrue(viewport.pan(-125, 0))
+        rows, cols = viewport.visible_cells()
+        self.assertLess(len(rows) * len(cols), 30 * 30 // 4)
+        for row in range(30):
+            for col in range(30):
+                visible = viewport.cell_rect(row, col).colliderect(self.area)
+                self.assertEqual(viewport.is_visible(row, col), visible)
+                if visible:
+                    center = viewport.cell_rect(row, col).clip(self.area).center
+                    self.assertEqual(viewport.cell_at(center), (row, col))
+        self.assertTrue(viewport.pan(-10000, -10000))  # Stops at the far corner of the board
+        self.assertEqual(viewport.board_rect.bottomright, self.area.bottomright)
+        viewport.reset()
+        self.assertFalse(viewport.zoomed)
+
+class TestGameView(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        sos_game_ui.init_display()
+        self.game = GameLogic(12, "General", db="null")
+        self.view = sos_game_ui.GameView()
+        self.rng = random.Random(7)
+
+    def _assert_matches_full_redraw(self):
+        incremental = pygame.image.tobytes(sos_game_ui.screen, "RGB")
+        self.view.draw(self.game, force=True)
+        self.assertEqual(incremental, pygame.image.tobytes(sos_game_ui.screen, "RGB"))
+
+    def _play(self, count):
+        for _ in range(count):
+            empty = [(row, col) for row in range(12) for col in range(12) if not self.game.board.board[row][col]]
+            self.game.make_move(*self.rng.choice(empty), self.rng.choice('SO'))
+            self.view.draw(self.game)
+            self._assert_matches_full_redraw()
+
+    def test_incremental_frames_match_full_redraws(self):
+        """Test that drawing only the changes gives the same pixels as a full redraw, zoomed and panned too"""
+        self.view.draw(self.game, force=True)
+        self._play(40)
+        viewport = self.view.viewport_for(self.game)
+        self.assertTrue(viewport.zoom(2.5, viewport.cell_center(6, 6)))
+        self.assertTrue(viewport.pan(-30, -20))
+        self.view.draw(self.game)
+        self._assert_matches_full_redraw()
+        self._play(60)
+        self.assertGreater(len(self.game.get_sos_lines()), 5)
+
+class TestCompactStorage(unittest.TestCase):
+    def _play(self, db, game_mode="General"):
+        game = GameLogic(4, game_mode, db=db)
+        for row, col, letter in [(0, 0, 'S'), (1, 1, 'S'), (0, 1, 'O'), (2, 2, 'O'), (0, 2, 'S'), (3, 3, 'S')]:
+            game.make_move(row, col, letter)
+        return game
+
+    def test_record_round_trip(self):
+        """Test that encoded moves decode to the same move rows"""
+        moves = [{'player': 'Blue', 'row': 0, 'col': 2, 'letter': 'S', 'move_number': 1},
+                 {'player': 'Red', 'row': 7, 'col': 7, 'letter': 'O', 'move_number': 2}]
+        record = encode_moves(moves, 8)
+        self.assertEqual(len(record), 1 + 2 * len(moves))
+        self.assertEqual(decode_moves(record, 8), moves)
+
+    def test_compact_game_reads_match_row_format(self):
+        """Test that a compact game reads back the same moves and SOS lines as a row-format game"""
+        with GameDatabase(":memory:") as rows_db, GameDatabase(":memory:", compact=True) as compact_db:
+            row_game = self._play(rows_db)
+            compact_game = self._play(compact_db)
+            self.assertEqual(compact_db.get_game_moves(compact_game.game_id),
+                             rows_db.get_game_moves(row_game.game_id))
+            self.assertEqual(compact_db.get_game_sos_lines(compact_game.game_id),
+                             rows_db.get_game_sos_lines(row_game.game_id))
+            moves = compact_db._connection().execute("SELECT COUNT(*) FROM moves").fetchone()[0]
+            self.assertEqual(moves, 0)
+
+    def test_compact_moves_are_written_in_batches(self):
+        """Test that compact moves are buffered until a flush or the game's end, but reads on the handle see them"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "compact.db")
+            with GameDatabase(path, compact=True) as db, GameDatabase(path) as other:
+                game = GameLogic(4, "General", db=db)
+                game.make_move(0, 0, 'S')
+                game.make_move(0, 1, 'O')
+                self.assertEqual(other.get_game_moves(game.game_id), [])
+                self.assertEqual(len(db.get_game_moves(game.game_id)), 2)  # Written before reading
+                self.assertEqual(len(other.get_game_moves(game.game_id)), 2)
+
+                game.make_move(0, 2, 'S')
+                db.flush()
+                self.assertEqual(len(other.get_game_sos_lines(game.game_id)), 1)
+                game.make_move(3, 3, 'O')
+                db.end_game(game.game_id, 'Blue', 1, 0)
+                self.assertEqual(other.get_game_moves(game.game_id), db.get_game_moves(game.game_id))
+                self.assertEqual(len(other.get_game_moves(game.game_id)), 4)
+
+    def test_existing_games_are_converted(self):
+        """Test that compact_games converts finished row-format games without changing what reads return"""
+        with GameDatabase(":memory:") as db:
+            game = self._play(db)
+            db.end_game(game.game_id, 'Blue', 1, 0)
+            active = self._play(db)
+            moves = db.get_game_moves(game.game_id)
+            sos_lines = db.get_game_sos_lines(game.game_id)
+            self.assertEqual(db.compact_games(), 1)
+            self.assertEqual(db.compact_games(), 0)
+            self.assertEqual(len(db.get_game_moves(active.game_id)), 6)  # Still stored row by row
+            db.save_move(active.game_id, 'Blue', 3, 0, 'S', 7)
+            self.assertEqual(len(db.get_game_moves(active.game_id)), 7)
+            self.assertEqual(db.get_game_moves(game.game_id), moves)
+            self.assertEqual(db.get_game_sos_lines(game.game_id), sos_lines)
+            streamed = {info['game_id']: game_moves for info, game_moves in db.iter_games_with_moves()}
+            self.assertEqual(streamed[game.game_id], [(m['row'], m['col'], m['letter']) for m in moves])
+
+    def test_failed_batch_does_not_duplicate_moves(self):
+        """Test that retrying a failed write-behind batch saves each compact move once"""
+        with WriteBehindDatabase(GameDatabase(":memory:", compact=True)) as db:
+            game_id = db.start_new_game(3, "Simple", "human", "human")
+            with self.assertLogs(level="ERROR"):
+                db._apply([('save_move', (game_id, 'Blue', 0, 0, 'S', 1)),
+                           ('save_move', (game_id, 'Red', 0, 1, 'O', 2)),
+                           ('save_move', (game_id + 1, 'Blue', 0, 0, 'S', 1))])
+            moves = [(m['row'], m['col'], m['letter']) for m in db.get_game_moves(game_id)]
+            self.assertEqual(moves, [(0, 0, 'S'), (0, 1, 'O')])
+
+    def test_failed_end_game_keeps_buffered_moves(self):
+        """Test that a game's unwritten moves survive an end_game that cannot commit"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "compact.db")
+            with GameDatabase(path, compact=True) as db:
+                game = GameLogic(4, "General", db=db)
+                game.make_move(0, 0, 'S')
+                game.make_move(0, 1, 'O')
+                db._connection().execute("PRAGMA busy_timeout=0")
+                locker = sqlite3.connect(path, isolation_level=None)
+                locker.execute("BEGIN IMMEDIATE")
+                with self.assertRaises(sqlite3.OperationalError):
+                    db.end_game(game.game_id, 'Blue', 0, 0)
+                locker.rollback()
+                locker.close()
+                db.end_game(game.game_id, 'Blue', 0, 0)
+                self.assertEqual(len(db.get_game_moves(game.game_id)), 2)
+
 if __name__ == '__main__':
     unittest.main()
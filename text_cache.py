@@ -0,0 +1,51 @@
+"""Shared cache of rendered text surfaces.
+
+The UI draws the same few strings (letters, labels, scores) over and over.
+Rendering text rasterizes every glyph, so the surfaces are kept in one
+bounded cache keyed on (font, text, colour) and shared by every widget and
+screen. Cached surfaces are shared: blit them, never draw on them.
+"""
+from collections import OrderedDict
+from typing import Tuple
+
+import pygame
+
+TEXT_CACHE_SIZE = 512
+
+Color = Tuple[int, int, int]
+
+class TextCache:
+    """LRU cache of antialiased font.render results"""
+    def __init__(self, max_entries: int = TEXT_CACHE_SIZE):
+        self.max_entries = max(1, max_entries)
+        self._surfaces: 'OrderedDict[Tuple[pygame.font.Font, str, Color], pygame.Surface]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+    def render(self, font: pygame.font.Font, text: str, color: Color) -> pygame.Surface:
+        """Get text rendered in font and colour, rendering it only if it is not cached"""
+        key = (font, text, tuple(color))
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        """Drop every cached surface, e.g. after the fonts change"""
+        self._surfaces.clear()
+
+text_cache = TextCache()
+
+def render_text(font: pygame.font.Font, text: str, color: Color) -> pygame.Surface:
+    """Render text through the shared cache"""
+    return text_cache.render(font, text, color)
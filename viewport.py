@@ -0,0 +1,107 @@
+"""Zoom and pan for drawing boards of any size in a fixed screen area.
+
+A BoardViewport maps board cells to screen pixels. At the fitted zoom the
+whole board is shown, as large as the area allows. Zooming in enlarges the
+cells around an anchor point and panning moves the board under the area.
+Drawing code asks for visible_cells so its cost follows what is on screen
+rather than the size of the board.
+"""
+from typing import Optional, Tuple
+
+import pygame
+
+MAX_CELL_SIZE = 120
+ZOOM_STEP = 1.25
+
+class BoardViewport:
+    """Maps between board cells and screen pixels inside area"""
+    def __init__(self, board_size: int, area: pygame.Rect):
+        self.board_size = board_size
+        self.area = pygame.Rect(area)
+        self.fit_cell_size = max(1, min(self.area.width, self.area.height) // board_size)
+        self.reset()
+
+    def reset(self):
+        """Go back to the fitted zoom showing the whole board"""
+        self.cell_size = self.fit_cell_size
+        self.left = self.top = 0
+        self._clamp()
+
+    @property
+    def zoomed(self) -> bool:
+        return self.cell_size > self.fit_cell_size
+
+    @property
+    def board_rect(self) -> pygame.Rect:
+        """Where the whole board is, most of which may be outside the area"""
+        side = self.cell_size * self.board_size
+        return pygame.Rect(self.left, self.top, side, side)
+
+    def _clamp(self):
+        # A board smaller than the area sits centred across and at the top, as
+        # it always has; a larger one may not be panned past its edges
+        side = self.cell_size * self.board_size
+        if side <= self.area.width:
+            self.left = self.area.centerx - side // 2
+        else:
+            self.left = min(self.area.left, max(self.area.right - side, self.left))
+        if side <= self.area.height:
+            self.top = self.area.top
+        else:
+            self.top = min(self.area.top, max(self.area.bottom - side, self.top))
+
+    def zoom(self, factor: float, anchor: Optional[Tuple[int, int]] = None) -> bool:
+        """Scale the cells by factor, keeping the board point under anchor still; returns whether it changed"""
+        cell_size = round(self.cell_size * factor)
+        if factor > 1:
+            cell_size = max(cell_size, self.cell_size + 1)  # Tiny cells would otherwise round back
+        cell_size = max(self.fit_cell_size, min(max(self.fit_cell_size, MAX_CELL_SIZE), cell_size))
+        if cell_size == self.cell_size:
+            return False
+        anchor_x, anchor_y = anchor if anchor is not None else self.area.center
+        board_x = (anchor_x - self.left) / self.cell_size
+        board_y = (anchor_y - self.top) / self.cell_size
+        self.cell_size = cell_size
+        self.left = round(anchor_x - board_x * cell_size)
+        self.top = round(anchor_y - board_y * cell_size)
+        self._clamp()
+        return True
+
+    def pan(self, dx: int, dy: int) -> bool:
+        """Move the board by (dx, dy) pixels; returns whether it moved"""
+        before = (self.left, self.top)
+        self.left += dx
+        self.top += dy
+        self._clamp()
+        return (self.left, self.top) != before
+
+    def cell_at(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """Get the (row, col) shown at a screen position, or None outside the board or the area"""
+        if not self.area.collidepoint(pos):
+            return None
+        col = (pos[0] - self.left) // self.cell_size
+        row = (pos[1] - self.top) // self.cell_size
+        if 0 <= row < self.board_size and 0 <= col < self.board_size:
+            return row, col
+        return None
+
+    def cell_rect(self, row: int, col: int) -> pygame.Rect:
+        return pygame.Rect(self.left + col * self.cell_size, self.top + row * self.cell_size,
+                           self.cell_size, self.cell_size)
+
+    def cell_center(self, row: int, col: int) -> Tuple[int, int]:
+        return (self.left + col * self.cell_size + self.cell_size // 2,
+                self.top + row * self.cell_size + self.cell_size // 2)
+
+    def visible_cells(self) -> Tuple[range, range]:
+        """Get the (rows, cols) at least partly inside the area"""
+        def span(start: int, low: int, high: int) -> range:
+            first = max(0, (low - start) // self.cell_size)
+            last = min(self.board_size, (high - 1 - start) // self.cell_size + 1)
+            return range(first, max(first, last))
+        return (span(self.top, self.area.top, self.area.bottom),
+                span(self.left, self.area.left, self.area.right))
+
+    def is_visible(self, row: int, col: int) -> bool:
+        rows, cols = self.visible_cells()
+        return row in rows and col in cols